@@ -0,0 +1,49 @@
+"""
+Compares mountaineer's SerializerEnumField with the hardware EnumField, which renders
+and validates through lookup tables built once per enum, on lists of enum values the
+size of a large cabinet assignment or switch listing.
+
+Run from a mountaineer checkout with the hardware app installed:
+
+    DJANGO_SETTINGS_MODULE=mountaineer.settings python benchmarks/enum_fields.py [--rows 100000]
+
+For each field the best of `--repeat` runs is reported for rendering members
+(to_representation) and for validating integer values and labels (to_internal_value).
+"""
+import argparse
+import itertools
+import timeit
+
+import django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    django.setup()
+    from mountaineer.core.api import fields as mtnr_fields
+    from mountaineer.hardware import RackDepth, RackOrientation, SwitchInterconnect, SwitchSpeed
+    from mountaineer.hardware.api import fields as hw_fields
+
+    print('{:<20} {:<24} {:>10} {:>10} {:>10}'.format('enum', 'field', 'render ms', 'value ms', 'label ms'))
+    for enum in (RackDepth, RackOrientation, SwitchSpeed, SwitchInterconnect):
+        members = list(itertools.islice(itertools.cycle(enum), args.rows))
+        values = [member.value for member in members]
+        labels = [member.label for member in members]
+        for field in (mtnr_fields.SerializerEnumField(enum=enum), hw_fields.EnumField(enum)):
+            timings = [
+                min(timeit.repeat(lambda: [convert(item) for item in items], number=1, repeat=args.repeat)) * 1000
+                for convert, items in (
+                    (field.to_representation, members),
+                    (field.to_internal_value, values),
+                    (field.to_internal_value, labels),
+                )
+            ]
+            print('{:<20} {:<24} {:>10.1f} {:>10.1f} {:>10.1f}'.format(enum.__name__, type(field).__name__, *timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Measures the memory footprint and lookup speed of mountaineer.hardware.inventory
+with synthetic records, without a database.
+
+Run from a mountaineer checkout with the hardware app installed:
+
+    DJANGO_SETTINGS_MODULE=mountaineer.settings python benchmarks/inventory_memory.py [--devices 1000000]
+
+Records are built the way Inventory.refresh() builds them from values_list() rows, so the
+numbers cover the records and indexes only, not the query results they are loaded from.
+"""
+import argparse
+import timeit
+import tracemalloc
+import uuid
+
+import django
+
+
+def build(devices, per_cabinet=40, per_datacenter=500):
+    from mountaineer.hardware.inventory import CabinetRecord, DatacenterRecord, DeviceRecord, Inventory
+
+    inventory = Inventory()
+    cabinets = devices // per_cabinet + 1
+    for pk in range(cabinets // per_datacenter + 1):
+        inventory.add_datacenter(DatacenterRecord(pk, 'dc{:06d}'.format(pk), 'datacenter {}'.format(pk)))
+    for pk in range(cabinets):
+        inventory.add_cabinet(CabinetRecord(pk, 'cab{:08d}'.format(pk), 'cabinet {}'.format(pk), pk // per_datacenter, 42))
+    for i in range(devices):
+        device_id = uuid.uuid4()
+        inventory.add_device(DeviceRecord(
+            'server', device_id, 'srv{:010d}'.format(i), 'dell', 'r640', 'S{:010d}'.format(i), 'T{:010d}'.format(i), 1, 350
+        ))
+        inventory.place(device_id, i // per_cabinet, i % per_cabinet + 1)
+    return inventory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    args = parser.parse_args()
+
+    django.setup()
+    tracemalloc.start()
+    inventory = build(args.devices)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{} devices: {:.1f} MiB ({:.0f} bytes/device), peak {:.1f} MiB'.format(
+        args.devices, current / 2 ** 20, current / args.devices, peak / 2 ** 20
+    ))
+
+    for name, statement in (
+            ('device_by_serial', lambda: inventory.device_by_serial('S{:010d}'.format(args.devices // 2))),
+            ('cabinet_contents', lambda: inventory.cabinet_contents('cab00000001')),
+            ('datacenter_tree', lambda: inventory.datacenter_tree('dc000000'))):
+        number = args.lookups if name != 'datacenter_tree' else 100
+        seconds = timeit.timeit(statement, number=number)
+        print('{:<18} {:>10.2f} us/call'.format(name, seconds / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Shows SQLite query plans and timings for the hardware hot queries, with and without
+the indexes and constraints from migration 0002_indexes_and_constraints.
+
+Run from a mountaineer checkout with the hardware app installed and SQLite configured:
+
+    DJANGO_SETTINGS_MODULE=mountaineer.settings python benchmarks/query_plans.py [--devices 20000]
+
+A throwaway test database is created and populated; the configured database is not touched.
+"""
+import argparse
+import timeit
+import uuid
+
+import django
+
+
+def populate(devices):
+    from mountaineer.hardware.models import (
+        Cabinet, CabinetAssignment, Datacenter, Device, NetworkDevice, PortAssignment, Server
+    )
+    datacenter = Datacenter.objects.create(name='bench', vendor='bench', address='bench')
+    Cabinet.objects.bulk_create(
+        Cabinet(name='cab{}'.format(i), datacenter=datacenter, rack_units=42, posts=4) for i in range(devices // 40 + 1)
+    )
+    # bulk_create() doesn't set primary keys on SQLite.
+    cabinets = list(Cabinet.objects.order_by('pk'))
+    switch_device = Device.objects.create(kind='networkdevice')
+    NetworkDevice.objects.create(manufacturer='bench', model='sw', serial='sw', ports=devices, speed=1000,
+                                 interconnect=1, device=switch_device)
+    device_rows = [Device(id=uuid.uuid4(), kind='server') for _ in range(devices)]
+    Device.objects.bulk_create(device_rows)
+    Server.objects.bulk_create(
+        Server(manufacturer='bench', model='srv', serial='S{:08d}'.format(i), asset_tag='T{:08d}'.format(i), device=device)
+        for i, device in enumerate(device_rows)
+    )
+    CabinetAssignment.objects.bulk_create(
+        CabinetAssignment(cabinet=cabinets[i // 40], position=i % 40 + 1, device=device)
+        for i, device in enumerate(device_rows)
+    )
+    PortAssignment.objects.bulk_create(
+        PortAssignment(device=switch_device, device_port=i + 1, connected_device=device)
+        for i, device in enumerate(device_rows)
+    )
+    return cabinets, device_rows
+
+
+def hot_queries(cabinets, device_rows):
+    from mountaineer.hardware.models import CabinetAssignment, Device, PortAssignment, Server
+    device = device_rows[len(device_rows) // 2]
+    return [
+        ('uplinks of a device', PortAssignment.objects.filter(connected_device=device).values_list('device_id', 'device_port')),
+        ('cabinet contents by position', CabinetAssignment.objects.filter(cabinet=cabinets[len(cabinets) // 2]).order_by('position')),
+        ('server by serial', Server.objects.filter(serial='S{:08d}'.format(len(device_rows) // 3))),
+        ('server by asset tag', Server.objects.filter(asset_tag='T{:08d}'.format(len(device_rows) // 3))),
+        ('devices of a kind', Device.objects.filter(kind='networkdevice')),
+    ]
+
+
+def explain(connection, queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def report(connection, queries, number):
+    for name, queryset in queries:
+        seconds = timeit.timeit(lambda: list(queryset.all()), number=number) / number
+        print('  {:<32} {:>9.3f} ms  {}'.format(name, seconds * 1000, ' / '.join(explain(connection, queryset))))
+
+
+def drop_hot_indexes(connection):
+    """Reverts the schema to what migration 0001_initial created."""
+    from mountaineer.hardware import models
+    with connection.schema_editor() as editor:
+        for model in (models.Cabinet, models.Device, models.Server, models.PowerDistributionUnit,
+                      models.NetworkDevice, models.PortAssignment):
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+        for model in (models.CabinetAssignment, models.PowerDistributionUnit, models.NetworkDevice):
+            editor.alter_unique_together(model, model._meta.unique_together, [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--devices', type=int, default=20000)
+    parser.add_argument('--number', type=int, default=200, help='executions per timing')
+    args = parser.parse_args()
+
+    django.setup()
+    from django.db import connection, transaction
+    from django.test.utils import setup_test_environment
+    assert connection.vendor == 'sqlite', 'this benchmark reports SQLite query plans'
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        queries = hot_queries(*populate(args.devices))
+        print('with hardware indexes ({} devices):'.format(args.devices))
+        report(connection, queries, args.number)
+        with transaction.atomic():
+            drop_hot_indexes(connection)
+            print('without hardware indexes:')
+            report(connection, queries, args.number)
+            transaction.set_rollback(True)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Measures the import time and memory of the hardware module's entry points, each in a
+fresh interpreter, the way a short-lived management command container pays for them.
+
+Run from a mountaineer checkout with the hardware app installed:
+
+    DJANGO_SETTINGS_MODULE=mountaineer.settings python benchmarks/startup.py [--runs 10]
+
+For each target the median wall time and the memory allocated (tracemalloc) by the import
+are reported, after django.setup() has loaded the app registry.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+TARGETS = (
+    'mountaineer.hardware.admin',
+    'mountaineer.hardware.api.viewsets',
+    'mountaineer.hardware.api.urls_v1',
+    'mountaineer.hardware.api.serializers',
+)
+
+PROBE = '''
+import importlib, json, sys, time, tracemalloc
+import django
+started = time.perf_counter()
+django.setup()
+setup = time.perf_counter() - started
+tracemalloc.start()
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - started
+memory = tracemalloc.get_traced_memory()[0]
+print(json.dumps({"setup": setup, "import": elapsed, "memory": memory,
+                  "serializers": "mountaineer.hardware.api.serializers" in sys.modules}))
+'''
+
+
+def probe(target):
+    output = subprocess.check_output([sys.executable, '-c', PROBE, target])
+    return json.loads(output.decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('targets', nargs='*', default=TARGETS)
+    args = parser.parse_args()
+
+    print('{:<40} {:>10} {:>10} {:>10} {:>12}'.format('module', 'setup ms', 'import ms', 'KiB', 'serializers'))
+    for target in args.targets:
+        results = [probe(target) for _ in range(args.runs)]
+        print('{:<40} {:>10.1f} {:>10.1f} {:>10.0f} {:>12}'.format(
+            target,
+            statistics.median(result['setup'] for result in results) * 1000,
+            statistics.median(result['import'] for result in results) * 1000,
+            statistics.median(result['memory'] for result in results) / 1024,
+            'loaded' if results[0]['serializers'] else 'not loaded',
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 from enumfields import Enum
 
+default_app_config = 'mountaineer.hardware.apps.HardwareConfig'
+
 
 class RackOrientation(Enum):
     FRONT = 1
@@ -86,3 +88,40 @@ class CabinetFastener(Enum):
         M5 = 'M5'
         M6 = 'M6'
         OTHER = 'other'
+
+
+_ENUM_TABLES = {}
+
+
+def enum_table(enum):
+    """
+    Returns a `{value: (name, label)}` lookup table for `enum`, built once per enum.
+    Both the members and their integer values are keys.
+    """
+    try:
+        return _ENUM_TABLES[enum]
+    except KeyError:
+        table = {}
+        for member in enum:
+            table[member] = table[member.value] = (member.name, member.label)
+        _ENUM_TABLES[enum] = table
+        return table
+
+
+_ENUM_INPUTS = {}
+
+
+def enum_inputs(enum):
+    """
+    Returns a `{input: member}` lookup table for `enum`, built once per enum, that accepts
+    each member, its integer value, that value as a string, its name and its label.
+    """
+    try:
+        return _ENUM_INPUTS[enum]
+    except KeyError:
+        table = {}
+        for member in enum:
+            for key in (member.name, member.label, str(member.value), member.value, member):
+                table[key] = member
+        _ENUM_INPUTS[enum] = table
+        return table
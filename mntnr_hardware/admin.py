@@ -1,8 +1,98 @@
 from django.contrib import admin
-from django.apps import apps
+from django.db.models import Q
 
 from mountaineer.hardware import models
+from mountaineer.hardware.models import device_related
 
-for model in apps.get_app_config('hardware').get_models():
-    if model != models.Device:
-        admin.site.register(model)
+
+class AssignmentAdmin(admin.ModelAdmin):
+    """
+    Changelists for the assignment tables select the related cabinet/devices (and their
+    concrete instances) in the page query, and skip the unfiltered COUNT(*). Searches
+    match the slug exactly, so they can use its index instead of a LIKE scan.
+    """
+    show_full_result_count = False
+    search_fields = ('slug',)
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(slug=search_term), False
+
+    def device_name(self, obj):
+        return obj.device.instance.__str__()
+    device_name.short_description = 'device'
+
+
+@admin.register(models.Datacenter)
+class DatacenterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'vendor', 'address', 'slug')
+    search_fields = ('name', 'slug')
+
+
+@admin.register(models.Cabinet)
+class CabinetAdmin(admin.ModelAdmin):
+    list_display = ('name', 'datacenter', 'rack_units', 'posts', 'slug')
+    list_select_related = ('datacenter',)
+    search_fields = ('name', 'slug')
+
+
+@admin.register(models.CabinetAssignment)
+class CabinetAssignmentAdmin(AssignmentAdmin):
+    list_display = ('slug', 'cabinet_name', 'position', 'device_name', 'orientation', 'depth')
+    list_select_related = ['cabinet'] + device_related('device')
+    raw_id_fields = ('cabinet', 'device')
+
+    def cabinet_name(self, obj):
+        return obj.cabinet.name
+    cabinet_name.short_description = 'cabinet'
+    cabinet_name.admin_order_field = 'cabinet__name'
+
+
+@admin.register(models.PortAssignment)
+class PortAssignmentAdmin(AssignmentAdmin):
+    list_display = ('slug', 'device_name', 'device_port', 'connected_device_name')
+    list_select_related = device_related('device') + device_related('connected_device')
+    raw_id_fields = ('device', 'connected_device')
+
+    def connected_device_name(self, obj):
+        return obj.connected_device.instance.__str__()
+    connected_device_name.short_description = 'connected device'
+
+
+class DeviceAdmin(admin.ModelAdmin):
+    """
+    Searches match serial, asset tag or slug exactly, so they can use the indexes on
+    those columns instead of a LIKE scan.
+    """
+    list_display = ('manufacturer', 'model', 'serial', 'asset_tag', 'rack_units', 'draw', 'cabinet_name')
+    list_select_related = ('device__cabinetassignment__cabinet',)
+    search_fields = ('serial', 'asset_tag', 'slug')
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(Q(serial=search_term) | Q(asset_tag=search_term) | Q(slug=search_term)), False
+
+    def cabinet_name(self, obj):
+        cabinet = obj.cabinet
+        return cabinet.name if cabinet else None
+    cabinet_name.short_description = 'cabinet'
+
+
+@admin.register(models.Server)
+class ServerAdmin(DeviceAdmin):
+    list_display = DeviceAdmin.list_display + ('memory', 'cores')
+
+
+@admin.register(models.PowerDistributionUnit)
+class PowerDistributionUnitAdmin(DeviceAdmin):
+    list_display = DeviceAdmin.list_display + ('ports', 'volts', 'amps')
+
+
+@admin.register(models.NetworkDevice)
+class NetworkDeviceAdmin(DeviceAdmin):
+    list_display = DeviceAdmin.list_display + ('ports', 'speed', 'interconnect')
@@ -0,0 +1,155 @@
+"""
+Read-only list serialization built directly from `.values()` rows.
+
+`FastListSerializer` inspects the fields of a regular hardware serializer and
+compiles each one into a set of `.values()` lookups plus a getter, producing the
+same output (and the same rendered JSON) as the serializer without instantiating
+models or going through per-field DRF machinery. Serializers with fields it does
+not know how to compile raise `Unsupported`, and callers fall back to the
+regular serializer.
+"""
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+from mountaineer.hardware.api import fields as hw_fields
+from mountaineer.hardware.models import DEVICE_KINDS, Device
+
+
+# Read-only related fields whose source is a model property rather than a relation.
+RELATED_SOURCES = {
+    'cabinet': 'device__cabinetassignment__cabinet',
+}
+
+# DRF fields whose to_representation() is a no-op for the values the database returns.
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField)
+
+
+class Unsupported(Exception):
+    pass
+
+
+def device_name_getter(prefix):
+    """Compiles `DeviceBase.__str__` of the concrete device behind a Device FK."""
+    keys = [
+        tuple('{}__{}__{}'.format(prefix, kind, attr) for attr in ('slug', 'manufacturer', 'model', 'serial'))
+        for kind in DEVICE_KINDS
+    ]
+
+    def getter(row):
+        for slug, manufacturer, model, serial in keys:
+            if row[slug] is not None:
+                return '{} {} #{}'.format(row[manufacturer], row[model], row[serial])
+
+    return [key for group in keys for key in group], getter
+
+
+def method_device_id(field, compiler):
+    return ['device_id'], lambda row: row['device_id']
+
+
+def method_watts(field, compiler):
+    return ['amps', 'volts'], lambda row: row['amps'] * row['volts']
+
+
+def method_cabinet_name(field, compiler):
+    return ['cabinet__name'], lambda row: row['cabinet__name']
+
+
+def method_device_name(field, compiler):
+    return device_name_getter('device')
+
+
+def method_connected_device_name(field, compiler):
+    return device_name_getter('connected_device')
+
+
+# SerializerMethodFields are compiled by name; they mean the same thing on every hardware serializer.
+METHOD_FIELDS = {
+    'device_id': method_device_id,
+    'watts': method_watts,
+    'cabinet_name': method_cabinet_name,
+    'device_name': method_device_name,
+    'connected_device_name': method_connected_device_name,
+}
+
+
+class FastListSerializer(object):
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self.model = serializer.Meta.model
+        self.context = serializer.context
+        self.request = self.context['request']
+        self.lookups = []
+        self.getters = []
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            lookups, getter = self.compile_field(field)
+            self.lookups.extend(lookup for lookup in lookups if lookup not in self.lookups)
+            self.getters.append((field.field_name, getter))
+
+    def serialize(self, queryset):
+        getters = self.getters
+        return [
+            OrderedDict([(name, getter(row)) for name, getter in getters])
+            for row in queryset.select_related(None).values(*self.lookups)
+        ]
+
+    def url_template(self, field, view_name):
+        # Same format selection as HyperlinkedRelatedField.to_representation.
+        format = self.context.get('format', None)
+        if format and field.format and field.format != format:
+            format = field.format
+        return hw_fields.url_template(self.request, view_name, field.lookup_url_kwarg, format, field.reverse)
+
+    def relation_path(self, source):
+        try:
+            self.model._meta.get_field(source)
+        except FieldDoesNotExist:
+            if source not in RELATED_SOURCES:
+                raise Unsupported(source)
+            return RELATED_SOURCES[source]
+        return source
+
+    def compile_field(self, field):
+        if isinstance(field, serializers.SerializerMethodField):
+            if field.field_name not in METHOD_FIELDS:
+                raise Unsupported(field.field_name)
+            return METHOD_FIELDS[field.field_name](field, self)
+        if isinstance(field, hw_fields.HyperlinkedDeviceField):
+            return self.compile_device_field(field)
+        if isinstance(field, serializers.HyperlinkedIdentityField):
+            return self.compile_link([field.lookup_field], field)
+        if isinstance(field, serializers.HyperlinkedRelatedField):
+            path = self.relation_path(field.source)
+            return self.compile_link(['{}__{}'.format(path, field.lookup_field)], field)
+        if len(field.source_attrs) != 1:
+            raise Unsupported(field.field_name)
+        lookup = field.source
+        if isinstance(field, hw_fields.EnumField):
+            table = field.labels
+            return [lookup], lambda row: table[row[lookup]][1] if row[lookup] is not None else None
+        if type(field) in PASSTHROUGH_FIELDS or isinstance(field, (serializers.EmailField, serializers.URLField)):
+            return [lookup], lambda row: row[lookup]
+        to_representation = field.to_representation
+        return [lookup], lambda row: to_representation(row[lookup]) if row[lookup] is not None else None
+
+    def compile_link(self, lookups, field):
+        lookup = lookups[0]
+        prefix, suffix = self.url_template(field, field.view_name)
+        return lookups, lambda row: '{}{}{}'.format(prefix, row[lookup], suffix) if row[lookup] is not None else None
+
+    def compile_device_field(self, field):
+        links = []
+        for kind in DEVICE_KINDS:
+            view_name = field.model_view_maps[Device._meta.get_field(kind).related_model]
+            links.append(('{}__{}__{}'.format(field.source, kind, field.lookup_field), self.url_template(field, view_name)))
+
+        def getter(row):
+            for lookup, (prefix, suffix) in links:
+                if row[lookup] is not None:
+                    return '{}{}{}'.format(prefix, row[lookup], suffix)
+
+        return [lookup for lookup, _ in links], getter
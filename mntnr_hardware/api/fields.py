@@ -4,9 +4,63 @@ from rest_framework import serializers
 from rest_framework.compat import NoReverseMatch
 from rest_framework.reverse import reverse
 
+from mountaineer.hardware import enum_inputs, enum_table
+
+
+COMPACT_QUERY_PARAM = 'compact'
+URL_PLACEHOLDER = 'mntnr-lookup-placeholder'
+
+
+def compact_requested(context):
+    """
+    Returns True if the request in the serializer context asked for compact output, i.e.
+    slugs/UUIDs instead of hyperlinks and integer values instead of enum labels.
+    """
+    request = context.get('request')
+    if request is None:
+        return False
+    params = getattr(request, 'query_params', request.GET)
+    return params.get(COMPACT_QUERY_PARAM, '').lower() in ('1', 'true', 'yes')
+
+
+def url_template(request, view_name, lookup_url_kwarg, format=None, reverse=reverse):
+    """
+    Returns a `(prefix, suffix)` pair such that `prefix + lookup_value + suffix` is the
+    URL of `view_name` for that lookup value. Each view name is reversed once per
+    request; the result is cached on the request object.
+    """
+    templates = getattr(request, '_hardware_url_templates', None)
+    if templates is None:
+        templates = request._hardware_url_templates = {}
+    key = (view_name, lookup_url_kwarg, format)
+    if key not in templates:
+        url = reverse(view_name, kwargs={lookup_url_kwarg: URL_PLACEHOLDER}, request=request, format=format)
+        templates[key] = tuple(url.split(URL_PLACEHOLDER, 1))
+    return templates[key]
+
+
+class TemplatedUrlMixin(object):
+    """
+    Builds hyperlinks from a per-request URL template instead of calling `reverse()`
+    for every object. Lookup values must already be URL-safe (e.g. slugs).
+    """
+    def get_url(self, obj, view_name, request, format):
+        if hasattr(obj, 'pk') and obj.pk in (None, ''):
+            return None
+        prefix, suffix = url_template(request, view_name, self.lookup_url_kwarg, format, self.reverse)
+        return '{}{}{}'.format(prefix, getattr(obj, self.lookup_field), suffix)
+
+
+class HyperlinkedIdentityField(TemplatedUrlMixin, serializers.HyperlinkedIdentityField):
+    pass
+
+
+class HyperlinkedRelatedField(TemplatedUrlMixin, serializers.HyperlinkedRelatedField):
+    pass
+
 
 # This displays the URL to the child of a Device. Could use some work, but functional for now.
-class HyperlinkedDeviceField(serializers.HyperlinkedRelatedField):
+class HyperlinkedDeviceField(TemplatedUrlMixin, serializers.HyperlinkedRelatedField):
     def __init__(self, **kwargs):
         self.lookup_field = kwargs.pop('lookup_field', self.lookup_field)
         self.lookup_url_kwarg = kwargs.pop('lookup_url_kwarg', self.lookup_field)
@@ -20,7 +74,9 @@ class HyperlinkedDeviceField(serializers.HyperlinkedRelatedField):
         super(serializers.HyperlinkedRelatedField, self).__init__(**kwargs)
 
     def to_representation(self, value):
-        view_name = self.model_view_maps[type(value.instance)]
+        # Device.type reads the stored discriminator, so the concrete instance is only
+        # loaded (if it wasn't select_related already) for its slug.
+        view_name = self.model_view_maps[value.type]
         assert 'request' in self.context, (
             "`%s` requires the request in the serializer"
             " context. Add `context={'request': request}` when instantiating "
@@ -68,3 +124,29 @@ class HyperlinkedDeviceField(serializers.HyperlinkedRelatedField):
 
     def to_interal_value(self, data):
         pass
+
+
+class EnumField(serializers.Field):
+    """
+    Renders enum members as their labels, and accepts members, integer values (also as
+    strings), names or labels. Both directions are single lookups in tables built once
+    per enum (see `enum_table` and `enum_inputs`).
+    """
+    default_error_messages = {
+        'invalid_choice': '"{input}" is not a valid choice.'
+    }
+
+    def __init__(self, enum, **kwargs):
+        self.enum = enum
+        self.labels = enum_table(enum)
+        self.inputs = enum_inputs(enum)
+        super(EnumField, self).__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self.labels[value][1]
+
+    def to_internal_value(self, data):
+        try:
+            return self.inputs[data]
+        except (KeyError, TypeError):
+            self.fail('invalid_choice', input=data)
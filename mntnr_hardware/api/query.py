@@ -0,0 +1,290 @@
+"""
+Nested reads: a field-selection tree rooted at datacenters or cabinets, resolved
+level by level. Each relation in the tree is loaded for all of its parents at
+once, with one query per model type, the way a GraphQL dataloader batches,
+instead of following hyperlinks or `Cabinet.devices` object by object.
+
+A selection maps field names to `true` for values, or to a nested selection
+for relations:
+
+    {"name": true, "cabinets": {"name": true, "devices": {"serial": true, "ports": {"device_port": true}}}}
+
+Devices are polymorphic: fields that don't apply to a device's kind (e.g.
+`memory` on a switch) are null, and `position`, `orientation` and `depth` are
+only set on devices selected through `cabinet.devices`.
+"""
+from collections import OrderedDict, defaultdict
+
+from rest_framework.exceptions import ValidationError
+
+from mountaineer.hardware import (
+    CabinetAttachmentMethod, CabinetFastener, RackDepth, RackOrientation, SwitchInterconnect, SwitchSpeed, enum_table
+)
+from mountaineer.hardware.models import (
+    DEVICE_KINDS, Cabinet, CabinetAssignment, Datacenter, Device, PortAssignment
+)
+
+# Deepest relation nesting accepted in a selection.
+MAX_DEPTH = 8
+
+
+def enum_label(enum):
+    table = enum_table(enum)
+    return lambda value: table[value][1]
+
+
+class Node(object):
+    """
+    A type in the selection tree. `scalars` maps field names to `(lookup, convert)`,
+    where `convert` (if any) turns non-null database values into API values, and
+    `relations` maps field names to Relations.
+    """
+    def __init__(self, name, scalars):
+        self.name = name
+        self.scalars = scalars
+        self.relations = {}
+
+
+class Relation(object):
+    """
+    `load(rows, names)` loads the related rows for every parent row at once, with
+    the scalar fields `names`, and returns `{parent row id: [child rows]}`.
+    """
+    def __init__(self, node, load, many=True):
+        self.node = node
+        self.load = load
+        self.many = many
+
+
+def fields(*names):
+    return OrderedDict((name, (name, None)) for name in names)
+
+
+DATACENTER = Node('datacenter', fields('slug', 'name', 'vendor', 'address', 'noc_phone', 'noc_email', 'noc_url'))
+
+CABINET = Node('cabinet', fields('slug', 'name', 'rack_units', 'posts'))
+CABINET.scalars.update([
+    ('depth', ('depth', str)),
+    ('width', ('width', str)),
+    ('attachment', ('attachment', enum_label(CabinetAttachmentMethod))),
+    ('fasteners', ('fasteners', enum_label(CabinetFastener))),
+    # Filled in by load_power().
+    ('power', (None, None)),
+    ('power_allocated', (None, None)),
+    ('power_unallocated', (None, None)),
+])
+
+DEVICE = Node('device', fields(
+    'slug', 'manufacturer', 'model', 'serial', 'asset_id', 'asset_tag', 'rack_units', 'draw',
+    'memory', 'cores', 'ports', 'volts', 'amps'
+))
+DEVICE.scalars.update([
+    ('speed', ('speed', enum_label(SwitchSpeed))),
+    ('interconnect', ('interconnect', enum_label(SwitchInterconnect))),
+    # Set from the Device and its cabinet assignment rather than loaded as columns.
+    ('device_id', (None, None)),
+    ('kind', (None, None)),
+    ('position', (None, None)),
+    ('orientation', (None, enum_label(RackOrientation))),
+    ('depth', (None, enum_label(RackDepth))),
+])
+
+PORT = Node('port', fields('slug', 'device_port'))
+
+
+def load_values(queryset, node, names, *keys):
+    """`.values()` rows of `queryset` with `keys` plus the columns behind the scalar fields `names`."""
+    lookups = [(name, node.scalars[name][0]) for name in names if node.scalars[name][0] is not None]
+    for row in queryset.values(*(keys + tuple(lookup for _, lookup in lookups))):
+        yield row, dict((name, row[lookup]) for name, lookup in lookups)
+
+
+def group(pairs):
+    grouped = defaultdict(list)
+    for key, row in pairs:
+        grouped[key].append(row)
+    return grouped
+
+
+def load_devices(device_ids, names):
+    """`{device_id: row}` with one query per concrete device model."""
+    rows, remaining = {}, set(device_ids)
+    for kind in DEVICE_KINDS:
+        if not remaining:
+            break
+        model = Device._meta.get_field(kind).related_model
+        columns = set(field.name for field in model._meta.get_fields())
+        available = [name for name in names if DEVICE.scalars[name][0] in columns]
+        for values, row in load_values(model.objects.filter(device_id__in=remaining), DEVICE, available, 'device_id'):
+            row.update(_id=values['device_id'], device_id=values['device_id'], kind=kind)
+            rows[values['device_id']] = row
+        remaining.difference_update(rows)
+    return rows
+
+
+def load_power(rows, names):
+    if not set(names).intersection(('power', 'power_allocated', 'power_unallocated')):
+        return
+    power = Cabinet.objects.compute_power(row['_id'] for row in rows)
+    for row in rows:
+        row.update(power[row['_id']])
+
+
+def datacenter_cabinets(rows, names):
+    cabinets = load_values(
+        Cabinet.objects.filter(datacenter_id__in=[row['_id'] for row in rows]).order_by('name'),
+        CABINET, names, 'pk', 'datacenter_id'
+    )
+    children = [
+        (values['datacenter_id'], dict(row, _id=values['pk'], _datacenter_id=values['datacenter_id']))
+        for values, row in cabinets
+    ]
+    load_power([row for _, row in children], names)
+    return group(children)
+
+
+def cabinet_datacenter(rows, names):
+    datacenters = {
+        values['pk']: dict(row, _id=values['pk'])
+        for values, row in load_values(
+            Datacenter.objects.filter(pk__in=set(row['_datacenter_id'] for row in rows)), DATACENTER, names, 'pk'
+        )
+    }
+    return group((row['_id'], datacenters[row['_datacenter_id']]) for row in rows)
+
+
+def cabinet_devices(rows, names):
+    assignments = list(CabinetAssignment.objects.filter(cabinet_id__in=[row['_id'] for row in rows]).order_by(
+        'position'
+    ).values_list('cabinet_id', 'device_id', 'position', 'orientation', 'depth'))
+    devices = load_devices([assignment[1] for assignment in assignments], names)
+    children = []
+    for cabinet_id, device_id, position, orientation, depth in assignments:
+        if device_id in devices:
+            row = devices[device_id]
+            row.update(position=position, orientation=orientation, depth=depth)
+            children.append((cabinet_id, row))
+    return group(children)
+
+
+def device_cabinet(rows, names):
+    assignments = dict(CabinetAssignment.objects.filter(
+        device_id__in=[row['_id'] for row in rows]
+    ).values_list('device_id', 'cabinet_id'))
+    cabinets = {
+        values['pk']: dict(row, _id=values['pk'], _datacenter_id=values['datacenter_id'])
+        for values, row in load_values(
+            Cabinet.objects.filter(pk__in=set(assignments.values())), CABINET, names, 'pk', 'datacenter_id'
+        )
+    }
+    load_power(list(cabinets.values()), names)
+    return group((row['_id'], cabinets[assignments[row['_id']]]) for row in rows if row['_id'] in assignments)
+
+
+def device_ports(field):
+    """Port assignments whose `field` ('device' or 'connected_device') is one of the parent devices."""
+    def load(rows, names):
+        ports = load_values(
+            PortAssignment.objects.filter(**{field + '_id__in': [row['_id'] for row in rows]}).order_by('device_port'),
+            PORT, names, 'pk', 'device_id', 'connected_device_id'
+        )
+        return group(
+            (values[field + '_id'], dict(row, _id=values['pk'], _device_id=values['device_id'],
+                                         _connected_device_id=values['connected_device_id']))
+            for values, row in ports
+        )
+    return load
+
+
+def port_device(key):
+    def load(rows, names):
+        devices = load_devices(set(row[key] for row in rows), names)
+        return group((row['_id'], devices[row[key]]) for row in rows if row[key] in devices)
+    return load
+
+
+DATACENTER.relations['cabinets'] = Relation(CABINET, datacenter_cabinets)
+CABINET.relations['datacenter'] = Relation(DATACENTER, cabinet_datacenter, many=False)
+CABINET.relations['devices'] = Relation(DEVICE, cabinet_devices)
+DEVICE.relations['cabinet'] = Relation(CABINET, device_cabinet, many=False)
+# Cables plugged into this device's ports, and the ports this device is plugged into.
+DEVICE.relations['ports'] = Relation(PORT, device_ports('device'))
+DEVICE.relations['connections'] = Relation(PORT, device_ports('connected_device'))
+PORT.relations['device'] = Relation(DEVICE, port_device('_device_id'), many=False)
+PORT.relations['connected_device'] = Relation(DEVICE, port_device('_connected_device_id'), many=False)
+
+ROOTS = {
+    'datacenter': (DATACENTER, Datacenter),
+    'cabinet': (CABINET, Cabinet),
+}
+
+
+def check(node, selection, path, depth=0):
+    """Raises ValidationError for unknown fields or malformed selections."""
+    if not isinstance(selection, dict) or not selection:
+        raise ValidationError({'fields': ['{}: expected a non-empty object.'.format(path)]})
+    if depth > MAX_DEPTH:
+        raise ValidationError({'fields': ['{}: selections are limited to {} levels.'.format(path, MAX_DEPTH)]})
+    for name, sub in selection.items():
+        field_path = '{}.{}'.format(path, name)
+        if name in node.relations:
+            check(node.relations[name].node, sub, field_path, depth + 1)
+        elif name not in node.scalars:
+            raise ValidationError({'fields': ['{}: unknown field.'.format(field_path)]})
+        elif sub is not True:
+            raise ValidationError({'fields': ['{}: expected true.'.format(field_path)]})
+
+
+def resolve(node, rows, selection):
+    """Output dicts for `rows`, with each relation in `selection` loaded once for all of them."""
+    names = [name for name in selection if name in node.scalars]
+    related = {}
+    for name, sub in selection.items():
+        if name not in node.relations:
+            continue
+        relation = node.relations[name]
+        loaded = relation.load(rows, [field for field in sub if field in relation.node.scalars])
+        # Rows shared between parents (e.g. a device behind several ports) are resolved once.
+        children = list(OrderedDict((id(child), child) for group in loaded.values() for child in group).values())
+        outputs = dict(zip(map(id, children), resolve(relation.node, children, sub)))
+        related[name] = (relation.many, loaded, outputs)
+
+    results = []
+    for row in rows:
+        item = OrderedDict()
+        for name in selection:
+            if name in related:
+                many, loaded, outputs = related[name]
+                items = [outputs[id(child)] for child in loaded.get(row['_id'], ())]
+                item[name] = items if many else (items[0] if items else None)
+            else:
+                convert = node.scalars[name][1]
+                value = row.get(name)
+                item[name] = convert(value) if convert is not None and value is not None else value
+        results.append(item)
+    return results
+
+
+def run(root, selection, slugs=None):
+    """
+    Resolves `selection` for the `root` objects ('datacenter' or 'cabinet') with `slugs`,
+    or all of them. Runs one query for the roots plus one per model type per level.
+    """
+    if root not in ROOTS:
+        raise ValidationError({'root': ['Must be one of: {}.'.format(', '.join(sorted(ROOTS)))]})
+    node, model = ROOTS[root]
+    check(node, selection, root)
+    queryset = model.objects.order_by('name')
+    if slugs is not None:
+        queryset = queryset.filter(slug__in=slugs)
+    keys = ('pk', 'datacenter_id') if model is Cabinet else ('pk',)
+    names = [name for name in selection if name in node.scalars]
+    rows = []
+    for values, row in load_values(queryset, node, names, *keys):
+        row['_id'] = values['pk']
+        if model is Cabinet:
+            row['_datacenter_id'] = values['datacenter_id']
+        rows.append(row)
+    if model is Cabinet:
+        load_power(rows, names)
+    return resolve(node, rows, selection)
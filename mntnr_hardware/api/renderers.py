@@ -0,0 +1,63 @@
+import gzip
+import json
+
+from django.utils.cache import patch_vary_headers
+from rest_framework import renderers
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class MsgpackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        assert msgpack, 'MsgpackRenderer requires msgpack to be installed'
+        if data is None:
+            return b''
+        # Reuse DRF's JSON encoder hook so UUIDs, decimals and datetimes render the same as in JSON.
+        return msgpack.packb(data, default=encoders.JSONEncoder().default, use_bin_type=True)
+
+
+def ndjson_line(row):
+    return json.dumps(row, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class GzipNDJSONRenderer(renderers.BaseRenderer):
+    """
+    Renders one JSON document per line, gzip-compressed when the client accepts it.
+    List responses produce one line per row; anything else is a single line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+    render_style = 'binary'
+    compresslevel = 6
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        rows = data if isinstance(data, list) else [data]
+        body = b''.join(ndjson_line(row) for row in rows)
+        request = renderer_context.get('request')
+        response = renderer_context.get('response')
+        if request is None or response is None:
+            return body
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response['Content-Encoding'] = 'gzip'
+            body = gzip.compress(body, self.compresslevel)
+        return body
+
+
+HARDWARE_RENDERER_CLASSES = list(api_settings.DEFAULT_RENDERER_CLASSES) + [GzipNDJSONRenderer]
+if msgpack is not None:
+    HARDWARE_RENDERER_CLASSES.append(MsgpackRenderer)
@@ -1,13 +1,17 @@
+from collections import OrderedDict
+
+from django.db import models
 from rest_framework import serializers
+from rest_framework.fields import SkipField
 
-from mountaineer.core.api import fields as mtnr_fields
 from mountaineer.core.utils import slug
+from mountaineer.hardware import identity
 from mountaineer.hardware import (
     RackDepth, RackOrientation, SwitchSpeed, SwitchInterconnect, CabinetAttachmentMethod, CabinetFastener
 )
 from mountaineer.hardware.api import fields as hw_fields
 from mountaineer.hardware.models import (
-    Cabinet, CabinetAssignment, Datacenter, NetworkDevice, PortAssignment, PowerDistributionUnit, Server
+    Cabinet, CabinetAssignment, Datacenter, DerivedMetric, Device, NetworkDevice, PortAssignment, PowerDistributionUnit, Server
 )
 
 
@@ -18,7 +22,38 @@ MODEL_VIEW_MAPS = {
 }
 
 
-class DeviceIdModelSerializer(serializers.HyperlinkedModelSerializer):
+class CompactModelSerializer(serializers.HyperlinkedModelSerializer):
+    """
+    Hyperlinked serializer that can also render a compact representation (see
+    `hw_fields.compact_requested`): hyperlinks become slugs or device UUIDs and
+    enums become their integer values.
+    """
+    def to_representation(self, instance):
+        if not hw_fields.compact_requested(self.context):
+            return super(CompactModelSerializer, self).to_representation(instance)
+        ret = OrderedDict()
+        for field in self._readable_fields:
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            if attribute is None:
+                ret[field.field_name] = None
+            else:
+                ret[field.field_name] = self.to_compact_representation(field, attribute)
+        return ret
+
+    def to_compact_representation(self, field, value):
+        if isinstance(field, hw_fields.HyperlinkedDeviceField):
+            return str(value.pk)
+        if isinstance(field, serializers.HyperlinkedRelatedField):
+            return getattr(value, field.lookup_field)
+        if isinstance(field, hw_fields.EnumField):
+            return getattr(value, 'value', value)
+        return field.to_representation(value)
+
+
+class DeviceIdModelSerializer(CompactModelSerializer):
     device_id = serializers.SerializerMethodField()
 
     def get_device_id(self, obj):
@@ -28,30 +63,48 @@ class DeviceIdModelSerializer(serializers.HyperlinkedModelSerializer):
             return
 
 
-class DatacenterSerializer(serializers.HyperlinkedModelSerializer):
-    url = serializers.HyperlinkedIdentityField(view_name='api_v1:hardware:datacenter-detail', lookup_field='slug')
-    slug = serializers.CharField(read_only=True, default=slug.slugid_nice())
+class DatacenterSerializer(CompactModelSerializer):
+    url = hw_fields.HyperlinkedIdentityField(view_name='api_v1:hardware:datacenter-detail', lookup_field='slug')
+    slug = serializers.CharField(read_only=True, default=slug.slugid_nice)
 
     class Meta:
         model = Datacenter
-        fields = '__all__'
+        exclude = ('modified',)
+
+
+class CabinetListSerializer(serializers.ListSerializer):
+    """
+    Reads cabinet power from up-to-date derived metrics where available, and computes
+    the rest with one query instead of several per cabinet.
+    """
+    def to_representation(self, data):
+        cabinets = list(data.all() if isinstance(data, models.Manager) else data)
+        power = Cabinet.objects.power_summaries(cabinet.pk for cabinet in cabinets)
+        for cabinet in cabinets:
+            cabinet.__dict__.setdefault('power_summary', power[cabinet.pk])
+        return super(CabinetListSerializer, self).to_representation(cabinets)
+
+
+class CabinetPowerRequestSerializer(serializers.Serializer):
+    slugs = serializers.ListField(child=serializers.CharField(), allow_empty=True)
 
 
-class CabinetSerializer(serializers.HyperlinkedModelSerializer):
-    url = serializers.HyperlinkedIdentityField(view_name='api_v1:hardware:cabinet-detail', lookup_field='slug')
-    slug = serializers.CharField(read_only=True, default=slug.slugid_nice())
-    datacenter = serializers.HyperlinkedRelatedField(
+class CabinetSerializer(CompactModelSerializer):
+    url = hw_fields.HyperlinkedIdentityField(view_name='api_v1:hardware:cabinet-detail', lookup_field='slug')
+    slug = serializers.CharField(read_only=True, default=slug.slugid_nice)
+    datacenter = hw_fields.HyperlinkedRelatedField(
         queryset=Datacenter.objects.all(), view_name='api_v1:hardware:datacenter-detail', lookup_field='slug'
     )
-    attachment = mtnr_fields.SerializerEnumField(enum=CabinetAttachmentMethod)
-    fasteners = mtnr_fields.SerializerEnumField(enum=CabinetFastener)
+    attachment = hw_fields.EnumField(CabinetAttachmentMethod, required=False, allow_null=True)
+    fasteners = hw_fields.EnumField(CabinetFastener, required=False, allow_null=True)
     power = serializers.SerializerMethodField()
     power_allocated = serializers.SerializerMethodField()
     power_unallocated = serializers.SerializerMethodField()
 
     class Meta:
         model = Cabinet
-        fields = '__all__'
+        exclude = ('modified',)
+        list_serializer_class = CabinetListSerializer
 
     def get_power(self, obj):
         return obj.power
@@ -63,75 +116,89 @@ class CabinetSerializer(serializers.HyperlinkedModelSerializer):
         return obj.power_unallocated
 
 
-class CabinetAssignmentSerializer(serializers.HyperlinkedModelSerializer):
-    url = serializers.HyperlinkedIdentityField(
+class CabinetAssignmentSerializer(CompactModelSerializer):
+    url = hw_fields.HyperlinkedIdentityField(
         view_name='api_v1:hardware:cabinetassignment-detail', lookup_field='slug'
     )
-    slug = serializers.CharField(read_only=True, default=slug.slugid_nice())
-    cabinet = serializers.HyperlinkedRelatedField(
+    slug = serializers.CharField(read_only=True, default=slug.slugid_nice)
+    cabinet = hw_fields.HyperlinkedRelatedField(
         queryset=Cabinet.objects.all(), view_name='api_v1:hardware:cabinet-detail', lookup_field='slug'
     )
     cabinet_name = serializers.SerializerMethodField()
     device = hw_fields.HyperlinkedDeviceField(lookup_field='slug', read_only=True, model_view_maps=MODEL_VIEW_MAPS)
     device_id = serializers.UUIDField()
     device_name = serializers.SerializerMethodField()
-    depth = mtnr_fields.SerializerEnumField(enum=RackDepth)
-    orientation = mtnr_fields.SerializerEnumField(enum=RackOrientation)
+    position = serializers.IntegerField(min_value=0, required=False, allow_null=True)
+    depth = hw_fields.EnumField(RackDepth, required=False, allow_null=True)
+    orientation = hw_fields.EnumField(RackOrientation, required=False, allow_null=True)
 
     class Meta:
         model = CabinetAssignment
-        fields = '__all__'
+        exclude = ('modified',)
+        # (cabinet, position) is only unique for placed devices; see validate().
+        validators = []
+
+    def validate(self, attrs):
+        cabinet = attrs.get('cabinet', getattr(self.instance, 'cabinet', None))
+        position = attrs.get('position', getattr(self.instance, 'position', None))
+        if position is not None:
+            taken = CabinetAssignment.objects.filter(cabinet=cabinet, position=position)
+            if self.instance is not None:
+                taken = taken.exclude(pk=self.instance.pk)
+            if taken.exists():
+                raise serializers.ValidationError({'position': ['This position is already occupied.']})
+        return attrs
 
     def get_cabinet_name(self, obj):
-        return obj.cabinet.name
+        return identity.lookup((Cabinet, obj.cabinet_id), lambda: obj.cabinet).name
 
     def get_device_name(self, obj):
-        return obj.device.instance.__str__()
+        return identity.lookup((Device, obj.device_id), lambda: obj.device.instance).__str__()
 
 
 class ServerSerializer(DeviceIdModelSerializer):
-    url = serializers.HyperlinkedIdentityField(view_name='api_v1:hardware:server-detail', lookup_field='slug')
-    cabinet = serializers.HyperlinkedRelatedField(
+    url = hw_fields.HyperlinkedIdentityField(view_name='api_v1:hardware:server-detail', lookup_field='slug')
+    cabinet = hw_fields.HyperlinkedRelatedField(
         view_name='api_v1:hardware:cabinet-detail', lookup_field='slug', read_only=True
     )
 
     class Meta:
         model = Server
-        exclude = ('device',)
+        exclude = ('device', 'modified')
 
 
 class PduSerializer(DeviceIdModelSerializer):
-    url = serializers.HyperlinkedIdentityField(
+    url = hw_fields.HyperlinkedIdentityField(
         view_name='api_v1:hardware:powerdistributionunit-detail', lookup_field='slug'
     )
     watts = serializers.SerializerMethodField()
-    cabinet = serializers.HyperlinkedRelatedField(
+    cabinet = hw_fields.HyperlinkedRelatedField(
         view_name='api_v1:hardware:cabinet-detail', lookup_field='slug', read_only=True
     )
 
     class Meta:
         model = PowerDistributionUnit
-        exclude = ('device',)
+        exclude = ('device', 'modified')
 
     def get_watts(self, obj):
         return obj.watts
 
 
 class NetworkDeviceSerializer(DeviceIdModelSerializer):
-    url = serializers.HyperlinkedIdentityField(view_name='api_v1:hardware:networkdevice-detail', lookup_field='slug')
-    speed = mtnr_fields.SerializerEnumField(enum=SwitchSpeed)
-    interconnect = mtnr_fields.SerializerEnumField(enum=SwitchInterconnect)
-    cabinet = serializers.HyperlinkedRelatedField(
+    url = hw_fields.HyperlinkedIdentityField(view_name='api_v1:hardware:networkdevice-detail', lookup_field='slug')
+    speed = hw_fields.EnumField(SwitchSpeed)
+    interconnect = hw_fields.EnumField(SwitchInterconnect)
+    cabinet = hw_fields.HyperlinkedRelatedField(
         view_name='api_v1:hardware:cabinet-detail', lookup_field='slug', read_only=True
     )
 
     class Meta:
         model = NetworkDevice
-        exclude = ('device',)
+        exclude = ('device', 'modified')
 
 
 class PortAssignmentSerializer(DeviceIdModelSerializer):
-    url = serializers.HyperlinkedIdentityField(view_name='api_v1:hardware:portassignment-detail', lookup_field='slug')
+    url = hw_fields.HyperlinkedIdentityField(view_name='api_v1:hardware:portassignment-detail', lookup_field='slug')
     device = hw_fields.HyperlinkedDeviceField(lookup_field='slug', read_only=True, model_view_maps=MODEL_VIEW_MAPS)
     device_id = serializers.UUIDField()
     device_name = serializers.SerializerMethodField()
@@ -146,7 +213,64 @@ class PortAssignmentSerializer(DeviceIdModelSerializer):
         fields = '__all__'
 
     def get_device_name(self, obj):
-        return obj.device.instance.__str__()
+        return identity.lookup((Device, obj.device_id), lambda: obj.device.instance).__str__()
 
     def get_connected_device_name(self, obj):
-        return obj.connected_device.instance.__str__()
+        return identity.lookup((Device, obj.connected_device_id), lambda: obj.connected_device.instance).__str__()
+
+
+class DerivedMetricSerializer(serializers.ModelSerializer):
+    metrics = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DerivedMetric
+        fields = ('kind', 'key', 'metrics', 'computed')
+
+    def get_metrics(self, obj):
+        return obj.metrics
+
+
+class ElevationSerializer(serializers.BaseSerializer):
+    """
+    Read-only representation of an `elevation.Elevation`. Devices are listed once
+    under `devices`; `units` refers to them by device id.
+    """
+    def device_url(self, instance):
+        prefix, suffix = hw_fields.url_template(self.context['request'], MODEL_VIEW_MAPS[type(instance)], 'slug')
+        return '{}{}{}'.format(prefix, instance.slug, suffix)
+
+    def connection(self, instance, port):
+        return {'url': self.device_url(instance), 'name': instance.__str__(), 'port': port}
+
+    def device(self, device):
+        instance = device.instance
+        return OrderedDict([
+            ('url', self.device_url(instance)),
+            ('device_id', str(instance.device_id)),
+            ('type', instance._meta.model_name),
+            ('name', instance.__str__()),
+            ('position', device.position),
+            ('rack_units', device.rack_units),
+            ('orientation', device.orientation.label if device.orientation else None),
+            ('depth', device.depth.label if device.depth else None),
+            ('draw', instance.draw),
+            ('pdus', [self.connection(pdu, port) for pdu, port in device.pdus]),
+            ('uplinks', [self.connection(switch, port) for switch, port in device.uplinks]),
+        ])
+
+    def to_representation(self, elevation):
+        cabinet = elevation.cabinet
+        prefix, suffix = hw_fields.url_template(self.context['request'], 'api_v1:hardware:cabinet-detail', 'slug')
+        return OrderedDict([
+            ('cabinet', '{}{}{}'.format(prefix, cabinet.slug, suffix)),
+            ('slug', cabinet.slug),
+            ('name', cabinet.name),
+            ('rack_units', cabinet.rack_units),
+            ('devices', [self.device(device) for device in elevation.devices]),
+            ('units', [
+                {'unit': unit, 'device_id': str(device.instance.device_id) if device else None}
+                for unit, device in enumerate(elevation.units, start=1)
+            ]),
+            ('unplaced', [str(device.instance.device_id) for device in elevation.unplaced]),
+            ('conflicts', [str(device.instance.device_id) for device in elevation.conflicts]),
+        ])
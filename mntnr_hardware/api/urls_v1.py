@@ -9,6 +9,7 @@ router = routers.SimpleRouter()
 router.register(r'cabinets', viewsets.CabinetModelViewSet)
 router.register(r'cabinet-assignments', viewsets.CabinetAssignmentModelViewSet)
 router.register(r'datacenters', viewsets.DatacenterModelViewSet)
+router.register(r'metrics', viewsets.DerivedMetricViewSet)
 router.register(r'network', viewsets.NetDeviceModelViewSet)
 router.register(r'pdus', viewsets.PduModelViewSet)
 router.register(r'port-assignments', viewsets.PortAssignmentModelViewSet)
@@ -17,5 +18,8 @@ router.register(r'servers', viewsets.ServerModelViewSet)
 
 urlpatterns = [
     url(r'^$', views.api_root, name='hardware-root'),
+    url(r'^reports/fabric/$', views.fabric, name='hardware-fabric-report'),
+    url(r'^query/$', views.query, name='hardware-query'),
+    url(r'^devices/(?P<device_id>[0-9a-fA-F-]{32,36})/trace/$', views.device_trace, name='hardware-device-trace'),
     url(r'^', include(router.urls, namespace='hardware')),
 ]
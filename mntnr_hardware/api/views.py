@@ -1,7 +1,21 @@
+import uuid
+
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 
+from mountaineer.hardware import trace
+from mountaineer.hardware.api import fields as hw_fields
+from mountaineer.hardware.api import query as nested
+from mountaineer.hardware.models import Datacenter, Device
+from mountaineer.hardware.reports.fabric import fabric_report
+
+# Upper bound for `?depth=` on traces.
+MAX_TRACE_DEPTH = 32
+
 
 @api_view(['GET'])
 def api_root(request, format=None):
@@ -9,8 +23,77 @@ def api_root(request, format=None):
         'cabinets': reverse('api_v1:hardware:cabinet-list', request=request, format=format),
         'cabinet-assignments': reverse('api_v1:hardware:cabinetassignment-list', request=request, format=format),
         'datacenters': reverse('api_v1:hardware:datacenter-list', request=request, format=format),
+        'metrics': reverse('api_v1:hardware:derivedmetric-list', request=request, format=format),
         'network': reverse('api_v1:hardware:networkdevice-list', request=request, format=format),
         'pdus': reverse('api_v1:hardware:powerdistributionunit-list', request=request, format=format),
         'port-assignments': reverse('api_v1:hardware:portassignment-list', request=request, format=format),
         'servers': reverse('api_v1:hardware:server-list', request=request, format=format),
+        'fabric-report': reverse('api_v1:hardware-fabric-report', request=request, format=format),
+        'query': reverse('api_v1:hardware-query', request=request, format=format),
     })
+
+
+@api_view(['GET'])
+def fabric(request, format=None):
+    """Switch fabric capacity, optionally limited to `?datacenter=<slug>`."""
+    datacenter = None
+    if request.query_params.get('datacenter'):
+        datacenter = get_object_or_404(Datacenter, slug=request.query_params['datacenter'])
+    return Response(fabric_report(datacenter))
+
+
+@api_view(['GET'])
+def device_trace(request, device_id, format=None):
+    """
+    The PDUs (`?kind=power`) or switches (`?kind=network`, the default) upstream of a
+    device, up to `?depth=` hops (default 8), ordered by depth.
+    """
+    kind = request.query_params.get('kind', 'network')
+    if kind not in trace.TRACE_KINDS:
+        raise ValidationError({'kind': ['Must be one of: {}.'.format(', '.join(sorted(trace.TRACE_KINDS)))]})
+    try:
+        depth = int(request.query_params.get('depth', 8))
+    except ValueError:
+        depth = 0
+    if not 1 <= depth <= MAX_TRACE_DEPTH:
+        raise ValidationError({'depth': ['Must be an integer between 1 and {}.'.format(MAX_TRACE_DEPTH)]})
+    try:
+        # The URL pattern admits strings that aren't UUIDs, e.g. all hyphens.
+        device_id = uuid.UUID(device_id)
+    except ValueError:
+        raise Http404
+    device = get_object_or_404(Device, pk=device_id)
+    hops = trace.trace(device.pk, kind, depth)
+    instances = Device.objects.instances(set([device.pk]).union(hop.device_id for hop in hops))
+
+    def describe(device_id):
+        instance = instances.get(device_id)
+        if instance is None:
+            return {'device_id': device_id, 'url': None, 'kind': None, 'name': None}
+        view_name = 'api_v1:hardware:{}-detail'.format(instance._meta.model_name)
+        prefix, suffix = hw_fields.url_template(request, view_name, 'slug', format)
+        return {
+            'device_id': device_id, 'url': '{}{}{}'.format(prefix, instance.slug, suffix),
+            'kind': instance._meta.model_name, 'name': str(instance),
+        }
+
+    return Response({
+        'device': describe(device.pk),
+        'kind': kind,
+        'hops': [
+            dict(describe(hop.device_id), depth=hop.depth, port=hop.port, connected_device_id=hop.connected_device_id)
+            for hop in hops
+        ],
+    })
+
+
+@api_view(['POST'])
+def query(request, format=None):
+    """
+    Nested read of `{"root": "datacenter"|"cabinet", "slugs": [...], "fields": {...}}`; see
+    api/query.py for the selection format. Without `slugs`, every root object is returned.
+    """
+    slugs = request.data.get('slugs')
+    if slugs is not None and (not isinstance(slugs, list) or not all(isinstance(slug, str) for slug in slugs)):
+        raise ValidationError({'slugs': ['Expected a list of slugs.']})
+    return Response(nested.run(request.data.get('root'), request.data.get('fields'), slugs))
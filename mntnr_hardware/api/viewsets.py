@@ -1,48 +1,173 @@
-from rest_framework.viewsets import ModelViewSet
-
-from mountaineer.hardware.api.serializers import (
-    CabinetSerializer, CabinetAssignmentSerializer, DatacenterSerializer, NetworkDeviceSerializer,
-    PduSerializer, PortAssignmentSerializer, ServerSerializer
-)
+import codecs
+from importlib import import_module
+
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import detail_route, list_route
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+
+from mountaineer.hardware import audit
+from mountaineer.hardware.api import fastpath
+from mountaineer.hardware.api import fields as hw_fields
+from mountaineer.hardware.api.renderers import HARDWARE_RENDERER_CLASSES, GzipNDJSONRenderer, ndjson_line
+from mountaineer.hardware.elevation import build_elevations
 from mountaineer.hardware.models import (
-    Cabinet, CabinetAssignment, Datacenter, NetworkDevice, PortAssignment, PowerDistributionUnit, Server
+    Cabinet, CabinetAssignment, Datacenter, DerivedMetric, NetworkDevice, PortAssignment, PowerDistributionUnit, Server, device_related
 )
+from mountaineer.hardware.simulation import Simulation, SimulationError
+
+
+def serializer(name):
+    """The class `name` from api/serializers.py, which is imported on first use."""
+    return getattr(import_module('mountaineer.hardware.api.serializers'), name)
 
 
-class SlugModelViewSet(ModelViewSet):
+class LazySerializerMixin(object):
+    """
+    Takes `serializer_class` as the name of a class in api/serializers.py, so that importing
+    the viewsets (and the URLconf, which system checks import) doesn't build the serializers.
+    """
+    def get_serializer_class(self):
+        if isinstance(self.serializer_class, str):
+            return serializer(self.serializer_class)
+        return super(LazySerializerMixin, self).get_serializer_class()
+
+
+class SlugModelViewSet(LazySerializerMixin, ModelViewSet):
     lookup_field = 'slug'
+    renderer_classes = HARDWARE_RENDERER_CLASSES
+    # Serve unpaginated, non-compact lists from .values() rows (see api/fastpath.py).
+    fast_list = False
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_list and self.paginator is None and not hw_fields.compact_requested({'request': request}):
+            try:
+                reader = fastpath.FastListSerializer(self.get_serializer())
+            except fastpath.Unsupported:
+                pass
+            else:
+                return Response(reader.serialize(self.filter_queryset(self.get_queryset())))
+        return super(SlugModelViewSet, self).list(request, *args, **kwargs)
 
 
 class DatacenterModelViewSet(SlugModelViewSet):
     queryset = Datacenter.objects.all()
-    serializer_class = DatacenterSerializer
+    serializer_class = 'DatacenterSerializer'
+    fast_list = True
+
+    @detail_route(methods=['post'])
+    def audit(self, request, slug=None):
+        """
+        Streams the differences between the `scan` CSV (an uploaded file or a string, see
+        audit.read_scan) and this datacenter's inventory as newline-delimited JSON.
+        """
+        datacenter = self.get_object()
+        scan = request.data.get('scan')
+        if scan is None:
+            raise ValidationError({'scan': ['This field is required.']})
+        if isinstance(scan, str):
+            lines = scan.splitlines()
+        elif hasattr(scan, 'read'):
+            lines = codecs.iterdecode(scan, 'utf-8')
+        else:
+            raise ValidationError({'scan': ['Expected a CSV file or string.']})
+        try:
+            scan = audit.read_scan(lines)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValidationError({'scan': [str(e)]})
+        # Load the snapshot before streaming starts; the diff itself doesn't touch the database.
+        snapshot = audit.take_snapshot(datacenter)
+        rows = (ndjson_line(row) for row in audit.diff(snapshot, scan))
+        return StreamingHttpResponse(rows, content_type=GzipNDJSONRenderer.media_type)
+
+    @detail_route(methods=['post'])
+    def simulate(self, request, slug=None):
+        """
+        Applies the hypothetical `{"operations": [...]}` (see simulation.py) to an in-memory
+        copy of this datacenter and returns the resulting violations. Nothing is written.
+        """
+        operations = request.data.get('operations')
+        if not isinstance(operations, list):
+            raise ValidationError({'operations': ['Expected a list of operations.']})
+        simulation = Simulation.load(self.get_object())
+        try:
+            simulation.apply(operations)
+        except SimulationError as e:
+            raise ValidationError({'operations': [str(e)]})
+        return Response(simulation.report())
 
 
 class CabinetModelViewSet(SlugModelViewSet):
-    queryset = Cabinet.objects.all()
-    serializer_class = CabinetSerializer
+    queryset = Cabinet.objects.select_related('datacenter')
+    serializer_class = 'CabinetSerializer'
+
+    @detail_route(methods=['get'])
+    def elevation(self, request, slug=None):
+        cabinet = self.get_object()
+        elevations = build_elevations([cabinet])
+        return Response(serializer('ElevationSerializer')(elevations[cabinet.pk], context=self.get_serializer_context()).data)
+
+    @list_route(methods=['get'])
+    def elevations(self, request):
+        """Elevations for the comma-separated cabinet slugs in `?slugs=`, in the order given."""
+        slugs = [slug for slug in request.query_params.get('slugs', '').split(',') if slug]
+        cabinets = {cabinet.slug: cabinet for cabinet in self.filter_queryset(self.get_queryset()).filter(slug__in=slugs)}
+        elevations = build_elevations(cabinets.values())
+        ordered = [elevations[cabinets[slug].pk] for slug in slugs if slug in cabinets]
+        return Response(serializer('ElevationSerializer')(ordered, many=True, context=self.get_serializer_context()).data)
+
+    @list_route(methods=['post'])
+    def power(self, request):
+        """Power, allocated and unallocated watts for each cabinet slug in `{"slugs": [...]}`."""
+        params = serializer('CabinetPowerRequestSerializer')(data=request.data)
+        params.is_valid(raise_exception=True)
+        cabinets = dict(
+            self.filter_queryset(self.get_queryset()).filter(slug__in=params.validated_data['slugs']).values_list('pk', 'slug')
+        )
+        power = Cabinet.objects.compute_power(cabinets)
+        return Response({slug: power[pk] for pk, slug in cabinets.items()})
 
 
 class CabinetAssignmentModelViewSet(SlugModelViewSet):
-    queryset = CabinetAssignment.objects.all()
-    serializer_class = CabinetAssignmentSerializer
+    queryset = CabinetAssignment.objects.select_related('cabinet', *device_related('device'))
+    serializer_class = 'CabinetAssignmentSerializer'
+    fast_list = True
 
 
 class ServerModelViewSet(SlugModelViewSet):
-    queryset = Server.objects.all()
-    serializer_class = ServerSerializer
+    queryset = Server.objects.select_related('device__cabinetassignment__cabinet')
+    serializer_class = 'ServerSerializer'
+    fast_list = True
 
 
 class PduModelViewSet(SlugModelViewSet):
-    queryset = PowerDistributionUnit.objects.all()
-    serializer_class = PduSerializer
+    queryset = PowerDistributionUnit.objects.select_related('device__cabinetassignment__cabinet')
+    serializer_class = 'PduSerializer'
+    fast_list = True
 
 
 class NetDeviceModelViewSet(SlugModelViewSet):
-    queryset = NetworkDevice.objects.all()
-    serializer_class = NetworkDeviceSerializer
+    queryset = NetworkDevice.objects.select_related('device__cabinetassignment__cabinet')
+    serializer_class = 'NetworkDeviceSerializer'
+    fast_list = True
 
 
 class PortAssignmentModelViewSet(SlugModelViewSet):
-    queryset = PortAssignment.objects.all()
-    serializer_class = PortAssignmentSerializer
\ No newline at end of file
+    queryset = PortAssignment.objects.select_related(*(device_related('device') + device_related('connected_device')))
+    serializer_class = 'PortAssignmentSerializer'
+    fast_list = True
+
+
+class DerivedMetricViewSet(LazySerializerMixin, ReadOnlyModelViewSet):
+    """Metrics stored by the hardware_metrics_worker command, optionally filtered by `?kind=` and `?key=`."""
+    queryset = DerivedMetric.objects.all()
+    serializer_class = 'DerivedMetricSerializer'
+    renderer_classes = HARDWARE_RENDERER_CLASSES
+
+    def get_queryset(self):
+        queryset = super(DerivedMetricViewSet, self).get_queryset()
+        for param in ('kind', 'key'):
+            if param in self.request.query_params:
+                queryset = queryset.filter(**{param: self.request.query_params[param]})
+        return queryset
\ No newline at end of file
@@ -2,4 +2,9 @@ from django.apps import AppConfig
 
 
 class HardwareConfig(AppConfig):
-    name = 'hardware'
+    name = 'mountaineer.hardware'
+    label = 'hardware'
+
+    def ready(self):
+        # Connect the signal handlers that feed the DirtyObject queue.
+        from mountaineer.hardware import signals  # noqa: F401
@@ -0,0 +1,106 @@
+"""
+Inventory audits: comparing a physical scan of a datacenter with the database.
+
+`take_snapshot` loads a datacenter's device placements and cabling in two
+queries as sorted tuples. `diff` hash-joins a snapshot with a scan read by
+`read_scan` and yields one dict per discrepancy as it is found, so results can
+be streamed back while the rest of the diff is still running.
+"""
+import csv
+from collections import namedtuple
+
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+
+from mountaineer.hardware.models import DEVICE_KINDS, CabinetAssignment, PortAssignment
+
+# devices: (cabinet name, position, serial, device id), ordered by cabinet and position.
+# cables: (serial, port, connected serial), ordered by serial and port.
+Snapshot = namedtuple('Snapshot', ['devices', 'cables'])
+
+# devices: (cabinet name, position, serial); cables: (serial, port, connected serial).
+Scan = namedtuple('Scan', ['devices', 'cables'])
+
+SCAN_COLUMNS = ('kind', 'cabinet', 'position', 'serial', 'port', 'connected_serial')
+
+
+def serial_of(field):
+    """The serial of the concrete device behind the Device FK `field`."""
+    return Coalesce(*['{}__{}__serial'.format(field, kind) for kind in DEVICE_KINDS])
+
+
+def take_snapshot(datacenter):
+    """
+    Snapshot of the devices placed in `datacenter` and of every cable with at
+    least one end on one of them.
+    """
+    placed = CabinetAssignment.objects.filter(cabinet__datacenter=datacenter)
+    devices = placed.annotate(serial=serial_of('device')).order_by('cabinet__name', 'position').values_list(
+        'cabinet__name', 'position', 'serial', 'device_id'
+    )
+    device_ids = placed.values('device_id')
+    cables = PortAssignment.objects.filter(
+        Q(device_id__in=device_ids) | Q(connected_device_id__in=device_ids)
+    ).annotate(
+        serial=serial_of('device'), connected_serial=serial_of('connected_device')
+    ).order_by('serial', 'device_port').values_list('serial', 'device_port', 'connected_serial')
+    return Snapshot(list(devices), list(cables))
+
+
+def read_scan(lines):
+    """
+    Reads a CSV scan with the columns in SCAN_COLUMNS. `device` rows give the
+    cabinet and (optional) position a serial was found at; `cable` rows give the
+    serial of a switch or PDU, a port on it and the serial of the device patched
+    into that port. Raises ValueError for malformed rows or CSV.
+    """
+    reader = csv.DictReader(lines)
+    devices, cables = [], []
+    try:
+        missing = {'kind', 'serial'}.difference(reader.fieldnames or ())
+        if missing:
+            raise ValueError('Scan is missing columns: {}'.format(', '.join(sorted(missing))))
+        for row in reader:
+            try:
+                if row['kind'] == 'device':
+                    devices.append((row['cabinet'], int(row['position']) if row.get('position') else None, row['serial']))
+                elif row['kind'] == 'cable':
+                    cables.append((row['serial'], int(row['port']), row['connected_serial']))
+                else:
+                    raise ValueError('unknown kind {!r}'.format(row['kind']))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError('Line {}: {}'.format(reader.line_num, e))
+    except csv.Error as e:
+        raise ValueError('Line {}: {}'.format(reader.line_num, e))
+    return Scan(devices, cables)
+
+
+def location(cabinet, position):
+    return {'cabinet': cabinet, 'position': position}
+
+
+def diff(snapshot, scan):
+    """
+    Yields `moved`, `missing` and `unknown` devices, keyed by serial, followed by
+    `mispatched` ports, where the device found patched into a port differs from
+    the one recorded (either side may be None).
+    """
+    found = {serial: (cabinet, position) for cabinet, position, serial in scan.devices}
+    for cabinet, position, serial, device_id in snapshot.devices:
+        where = found.pop(serial, None)
+        if where is None:
+            yield {'status': 'missing', 'serial': serial, 'device': device_id,
+                   'expected': location(cabinet, position), 'found': None}
+        elif where != (cabinet, position):
+            yield {'status': 'moved', 'serial': serial, 'device': device_id,
+                   'expected': location(cabinet, position), 'found': location(*where)}
+    for serial, where in found.items():
+        yield {'status': 'unknown', 'serial': serial, 'device': None, 'expected': None, 'found': location(*where)}
+
+    expected = {(serial, port): connected for serial, port, connected in snapshot.cables}
+    for serial, port, connected in scan.cables:
+        recorded = expected.pop((serial, port), None)
+        if recorded != connected:
+            yield {'status': 'mispatched', 'serial': serial, 'port': port, 'expected': recorded, 'found': connected}
+    for (serial, port), recorded in expected.items():
+        yield {'status': 'mispatched', 'serial': serial, 'port': port, 'expected': recorded, 'found': None}
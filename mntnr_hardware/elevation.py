@@ -0,0 +1,96 @@
+"""
+Rack elevations: what sits in each unit of a cabinet, and what each device is
+plugged into. Elevations for any number of cabinets are assembled from a fixed
+number of queries, instead of walking `Cabinet.devices` and each device's
+`pdus`/`uplinks`.
+"""
+from mountaineer.hardware.models import (
+    CabinetAssignment, Device, NetworkDevice, PortAssignment, PowerDistributionUnit
+)
+
+
+class ElevationDevice(object):
+    __slots__ = ('instance', 'position', 'orientation', 'depth', 'pdus', 'uplinks')
+
+    def __init__(self, instance, position, orientation, depth):
+        self.instance = instance
+        self.position = position
+        self.orientation = orientation
+        self.depth = depth
+        self.pdus = []
+        self.uplinks = []
+
+    @property
+    def rack_units(self):
+        return self.instance.rack_units or 1
+
+    @property
+    def units(self):
+        if self.position is None:
+            return range(0)
+        return range(self.position, self.position + self.rack_units)
+
+
+class Elevation(object):
+    """
+    `units` holds one entry per rack unit, bottom (unit 1) first: the ElevationDevice
+    occupying that unit, or None. Devices without a position are listed in `unplaced`;
+    devices overlapping an occupied unit, extending past the top of the cabinet, or
+    with a negative height are listed in `conflicts`.
+    """
+    def __init__(self, cabinet):
+        self.cabinet = cabinet
+        self.devices = []
+        self.units = [None] * cabinet.rack_units
+        self.unplaced = []
+        self.conflicts = []
+
+    def place(self, device):
+        self.devices.append(device)
+        if device.position is None:
+            self.unplaced.append(device)
+            return
+        units = list(device.units)
+        if not units or units[0] < 1 or units[-1] > len(self.units) or any(self.units[unit - 1] for unit in units):
+            self.conflicts.append(device)
+            return
+        for unit in units:
+            self.units[unit - 1] = device
+
+
+def build_elevations(cabinets):
+    """
+    Returns a `{cabinet.pk: Elevation}` dict for `cabinets`, in at most five queries:
+    cabinet assignments, port assignments, and the concrete devices on either end.
+    """
+    elevations = {cabinet.pk: Elevation(cabinet) for cabinet in cabinets}
+    assignments = list(
+        CabinetAssignment.objects.filter(cabinet_id__in=list(elevations)).order_by('position').values_list(
+            'cabinet_id', 'device_id', 'position', 'orientation', 'depth'
+        )
+    )
+    device_ids = {assignment[1] for assignment in assignments}
+    ports = list(
+        PortAssignment.objects.filter(connected_device_id__in=device_ids).order_by('device_port').values_list(
+            'connected_device_id', 'device_id', 'device_port'
+        )
+    )
+    instances = Device.objects.instances(device_ids.union(port[1] for port in ports))
+
+    placed = {}
+    for cabinet_id, device_id, position, orientation, depth in assignments:
+        instance = instances.get(device_id)
+        if instance is None:
+            continue
+        device = placed[device_id] = ElevationDevice(instance, position, orientation, depth)
+        elevations[cabinet_id].place(device)
+
+    for connected_device_id, device_id, port in ports:
+        device, upstream = placed.get(connected_device_id), instances.get(device_id)
+        if device is None or upstream is None:
+            continue
+        if isinstance(upstream, PowerDistributionUnit):
+            device.pdus.append((upstream, port))
+        elif isinstance(upstream, NetworkDevice):
+            device.uplinks.append((upstream, port))
+    return elevations
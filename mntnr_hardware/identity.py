@@ -0,0 +1,58 @@
+"""
+A request-scoped identity map, so each device, concrete instance and cabinet is
+loaded at most once per request no matter how many rows refer to it.
+
+`IdentityMapMiddleware` installs a map for every request; `identity_map()` does the
+same for management commands and other code outside the request cycle. Outside a
+map, `lookup()` simply calls the loader.
+"""
+import threading
+from contextlib import contextmanager
+
+
+_local = threading.local()
+
+
+class IdentityMap(object):
+    def __init__(self):
+        self.objects = {}
+
+    def get(self, key, loader):
+        try:
+            return self.objects[key]
+        except KeyError:
+            obj = self.objects[key] = loader()
+            return obj
+
+    def add(self, key, obj):
+        self.objects.setdefault(key, obj)
+        return self.objects[key]
+
+    def clear(self):
+        self.objects.clear()
+
+
+def current():
+    return getattr(_local, 'identity_map', None)
+
+
+@contextmanager
+def identity_map():
+    """Installs a new identity map for the current thread, unless one is active already."""
+    active = current()
+    if active is not None:
+        yield active
+        return
+    _local.identity_map = IdentityMap()
+    try:
+        yield _local.identity_map
+    finally:
+        _local.identity_map = None
+
+
+def lookup(key, loader):
+    """Returns the object stored under `key` in the active map, loading it on first use."""
+    active = current()
+    if active is None:
+        return loader()
+    return active.get(key, loader)
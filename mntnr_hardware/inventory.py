@@ -0,0 +1,274 @@
+"""
+Optional in-process read model of the datacenter -> cabinet -> device hierarchy.
+
+An `Inventory` loads datacenters, cabinets, cabinet assignments and the device
+tables into compact `__slots__` records, and answers `device_by_serial`,
+`cabinet_contents` and `datacenter_tree` from memory. `refresh()` reloads only
+rows whose `modified` timestamp changed since the last load, and every
+`sweep_every` refreshes also sweeps the id columns to drop rows that were deleted.
+
+`modified` is set by the writer's clock when it saves, not when it commits, so a
+row saved just before a refresh starts may only become visible after that refresh
+has read past it. Each refresh therefore re-reads an `overlap` window before its
+watermark; reloading a row that didn't change is harmless.
+
+Processes that want one can start a shared, periodically refreshed instance
+with `start()` and read it with `get()`.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from mountaineer.hardware.models import DEVICE_KINDS, Cabinet, CabinetAssignment, Datacenter, Device
+
+
+logger = logging.getLogger(__name__)
+
+DEVICE_FIELDS = ('device_id', 'slug', 'manufacturer', 'model', 'serial', 'asset_tag', 'rack_units', 'draw')
+
+
+class DatacenterRecord(object):
+    __slots__ = ('pk', 'slug', 'name')
+
+    def __init__(self, pk, slug, name):
+        self.pk, self.slug, self.name = pk, slug, name
+
+
+class CabinetRecord(object):
+    __slots__ = ('pk', 'slug', 'name', 'datacenter_id', 'rack_units')
+
+    def __init__(self, pk, slug, name, datacenter_id, rack_units):
+        self.pk, self.slug, self.name, self.datacenter_id, self.rack_units = pk, slug, name, datacenter_id, rack_units
+
+
+class DeviceRecord(object):
+    __slots__ = ('kind',) + DEVICE_FIELDS
+
+    def __init__(self, kind, device_id, slug, manufacturer, model, serial, asset_tag, rack_units, draw):
+        self.kind, self.device_id, self.slug = kind, device_id, slug
+        self.manufacturer, self.model, self.serial, self.asset_tag = manufacturer, model, serial, asset_tag
+        self.rack_units, self.draw = rack_units, draw
+
+
+class Inventory(object):
+    def __init__(self, overlap=timedelta(minutes=5), sweep_every=10):
+        self.lock = threading.RLock()
+        self.overlap = overlap
+        self.sweep_every = sweep_every
+        self.refreshes = 0
+        self.loaded_at = None
+        self.datacenters = {}
+        self.cabinets = {}
+        self.devices = {}
+        # device_id -> (cabinet_id, position)
+        self.placements = {}
+        self.datacenter_slugs = {}
+        self.cabinet_slugs = {}
+        self.serials = {}
+        self.datacenter_cabinets = {}
+        self.cabinet_devices = {}
+
+    def refresh(self, sweep=False):
+        """
+        Loads everything on the first call, and only what changed on later calls. Deleted
+        rows are dropped every `sweep_every` calls, or on this one if `sweep` is true.
+        """
+        since = self.loaded_at
+        if since is not None:
+            since -= self.overlap
+        sweep = since is not None and (sweep or (self.refreshes + 1) % self.sweep_every == 0)
+        # Taken before reading, so rows modified while the queries run are picked up again next time.
+        started = timezone.now()
+
+        def changed(queryset):
+            return queryset if since is None else queryset.filter(modified__gte=since)
+
+        datacenters = list(changed(Datacenter.objects.all()).values_list('pk', 'slug', 'name'))
+        cabinets = list(changed(Cabinet.objects.all()).values_list('pk', 'slug', 'name', 'datacenter_id', 'rack_units'))
+        devices = [
+            (kind, list(changed(Device._meta.get_field(kind).related_model.objects.filter(device__isnull=False))
+                        .values_list(*DEVICE_FIELDS)))
+            for kind in DEVICE_KINDS
+        ]
+        placements = list(changed(CabinetAssignment.objects.all()).values_list('device_id', 'cabinet_id', 'position'))
+        if sweep:
+            existing = (
+                set(Datacenter.objects.values_list('pk', flat=True)),
+                set(Cabinet.objects.values_list('pk', flat=True)),
+                set(Device.objects.values_list('pk', flat=True)),
+                set(CabinetAssignment.objects.values_list('device_id', flat=True)),
+            )
+
+        with self.lock:
+            for row in datacenters:
+                self.add_datacenter(DatacenterRecord(*row))
+            for row in cabinets:
+                self.add_cabinet(CabinetRecord(*row))
+            for kind, rows in devices:
+                for row in rows:
+                    self.add_device(DeviceRecord(kind, *row))
+            for device_id, cabinet_id, position in placements:
+                self.place(device_id, cabinet_id, position)
+            if sweep:
+                self.sweep(*existing)
+            self.loaded_at = started
+            self.refreshes += 1
+
+    def add_datacenter(self, record):
+        old = self.datacenters.get(record.pk)
+        if old is not None:
+            self.datacenter_slugs.pop(old.slug, None)
+        self.datacenters[record.pk] = record
+        self.datacenter_slugs[record.slug] = record.pk
+        self.datacenter_cabinets.setdefault(record.pk, set())
+
+    def add_cabinet(self, record):
+        old = self.cabinets.get(record.pk)
+        if old is not None:
+            self.cabinet_slugs.pop(old.slug, None)
+            self.datacenter_cabinets.get(old.datacenter_id, set()).discard(record.pk)
+        self.cabinets[record.pk] = record
+        self.cabinet_slugs[record.slug] = record.pk
+        self.datacenter_cabinets.setdefault(record.datacenter_id, set()).add(record.pk)
+        self.cabinet_devices.setdefault(record.pk, set())
+
+    def add_device(self, record):
+        old = self.devices.get(record.device_id)
+        if old is not None:
+            self.serials.get(old.serial, set()).discard(record.device_id)
+        self.devices[record.device_id] = record
+        self.serials.setdefault(record.serial, set()).add(record.device_id)
+
+    def place(self, device_id, cabinet_id, position):
+        self.unplace(device_id)
+        self.placements[device_id] = (cabinet_id, position)
+        self.cabinet_devices.setdefault(cabinet_id, set()).add(device_id)
+
+    def unplace(self, device_id):
+        placement = self.placements.pop(device_id, None)
+        if placement is not None:
+            self.cabinet_devices.get(placement[0], set()).discard(device_id)
+
+    def sweep(self, datacenter_ids, cabinet_ids, device_ids, placed_device_ids):
+        """Drops records whose rows no longer exist."""
+        for device_id in set(self.placements).difference(placed_device_ids):
+            self.unplace(device_id)
+        for device_id in set(self.devices).difference(device_ids):
+            record = self.devices.pop(device_id)
+            self.serials.get(record.serial, set()).discard(device_id)
+        for pk in set(self.cabinets).difference(cabinet_ids):
+            record = self.cabinets.pop(pk)
+            self.cabinet_slugs.pop(record.slug, None)
+            self.cabinet_devices.pop(pk, None)
+            self.datacenter_cabinets.get(record.datacenter_id, set()).discard(pk)
+        for pk in set(self.datacenters).difference(datacenter_ids):
+            record = self.datacenters.pop(pk)
+            self.datacenter_slugs.pop(record.slug, None)
+            self.datacenter_cabinets.pop(pk, None)
+
+    def device_by_serial(self, serial, manufacturer=None, model=None):
+        """
+        The device with `serial`, or None. Serials are only unique per manufacturer and
+        model, so pass those to pick between devices that share one.
+        """
+        with self.lock:
+            for device_id in self.serials.get(serial, ()):
+                record = self.devices[device_id]
+                if manufacturer in (None, record.manufacturer) and model in (None, record.model):
+                    return record
+
+    def location(self, device_id):
+        """`(CabinetRecord, position)` for a placed device, or None."""
+        with self.lock:
+            placement = self.placements.get(device_id)
+            if placement is None:
+                return None
+            return self.cabinets.get(placement[0]), placement[1]
+
+    def cabinet_contents(self, slug):
+        """`[(position, DeviceRecord)]` for the cabinet with `slug`, ordered by position, unplaced devices last."""
+        with self.lock:
+            pk = self.cabinet_slugs.get(slug)
+            if pk is None:
+                return None
+            contents = [
+                (self.placements[device_id][1], self.devices[device_id])
+                for device_id in self.cabinet_devices.get(pk, ()) if device_id in self.devices
+            ]
+        return sorted(contents, key=lambda item: (item[0] is None, item[0] or 0, item[1].slug))
+
+    def datacenter_tree(self, slug):
+        """The datacenter with `slug` as nested dicts of its cabinets and their devices, or None."""
+        with self.lock:
+            pk = self.datacenter_slugs.get(slug)
+            if pk is None:
+                return None
+            datacenter = self.datacenters[pk]
+            cabinets = sorted((self.cabinets[cabinet_id] for cabinet_id in self.datacenter_cabinets.get(pk, ())),
+                              key=lambda cabinet: cabinet.name)
+        return {
+            'slug': datacenter.slug,
+            'name': datacenter.name,
+            'cabinets': [
+                {
+                    'slug': cabinet.slug,
+                    'name': cabinet.name,
+                    'rack_units': cabinet.rack_units,
+                    'devices': [
+                        {'position': position, 'slug': device.slug, 'kind': device.kind, 'serial': device.serial,
+                         'device_id': device.device_id}
+                        for position, device in self.cabinet_contents(cabinet.slug)
+                    ],
+                }
+                for cabinet in cabinets
+            ],
+        }
+
+
+class Refresher(threading.Thread):
+    """Daemon thread that refreshes `inventory` every `interval` seconds until stopped."""
+    daemon = True
+
+    def __init__(self, inventory, interval):
+        super(Refresher, self).__init__(name='hardware-inventory-refresh')
+        self.inventory = inventory
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            close_old_connections()
+            try:
+                self.inventory.refresh()
+            except Exception:
+                logger.exception('Refreshing the hardware inventory failed')
+        connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+_inventory = None
+_refresher = None
+_start_lock = threading.Lock()
+
+
+def start(interval=60):
+    """Loads the shared inventory, if that hasn't happened yet, and refreshes it every `interval` seconds."""
+    global _inventory, _refresher
+    with _start_lock:
+        if _inventory is None:
+            inventory = Inventory()
+            inventory.refresh()
+            _inventory = inventory
+            _refresher = Refresher(_inventory, interval)
+            _refresher.start()
+        return _inventory
+
+
+def get():
+    """The shared inventory loaded by `start()`, or None if it wasn't started in this process."""
+    return _inventory
@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mountaineer.hardware.models import Datacenter
+from mountaineer.hardware.reports.fabric import fabric_report
+
+
+class Command(BaseCommand):
+    help = 'Reports switch fabric capacity, oversubscription and free-port headroom'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--datacenter', help='Limit the report to the datacenter with this slug')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        datacenter = None
+        if options['datacenter']:
+            try:
+                datacenter = Datacenter.objects.get(slug=options['datacenter'])
+            except Datacenter.DoesNotExist:
+                raise CommandError('No datacenter with slug {}'.format(options['datacenter']))
+        report = fabric_report(datacenter)
+        if options['json']:
+            self.stdout.write(json.dumps(report, default=str, indent=2))
+            return
+        self.stdout.write('{:<24} {:>10} {:>6} {:>6} {:>12} {:>12} {:>8}'.format(
+            'switch', 'speed', 'ports', 'free', 'down Mbps', 'up Mbps', 'ratio'))
+        for row in report['switches']:
+            self.stdout.write('{:<24} {:>10} {:>6} {:>6} {:>12} {:>12} {:>8}'.format(
+                row['slug'], row['speed'], row['ports'], row['ports_free'], row['downlink_mbps'],
+                row['uplink_mbps'], row['oversubscription'] if row['oversubscription'] is not None else '-'))
+        for totals in report['interconnects']:
+            self.stdout.write('{interconnect}: {switches} switches, {ports_free}/{ports} ports free, '
+                              '{free_mbps} Mbps headroom'.format(**totals))
@@ -0,0 +1,39 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from mountaineer.hardware import metrics
+
+
+class Command(BaseCommand):
+    help = 'Recomputes derived hardware metrics for objects queued by writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of worker threads or processes')
+        parser.add_argument('--processes', action='store_true', help='Use a process pool instead of threads')
+        parser.add_argument('--batch-size', type=int, default=500, help='Dirty objects claimed per batch')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Objects recomputed per task')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+
+    def handle(self, *args, **options):
+        if options['processes']:
+            # Spawned rather than forked, so workers never inherit the parent's database connections.
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=options['workers'])
+        with executor:
+            while True:
+                started = time.time()
+                done = metrics.process_batch(options['batch_size'], options['chunk_size'], executor)
+                if done:
+                    self.stdout.write('recomputed {} objects in {:.2f}s'.format(done, time.time() - started))
+                    continue
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
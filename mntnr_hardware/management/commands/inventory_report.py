@@ -0,0 +1,56 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from mountaineer.hardware.reports.inventory import inventory_report
+
+COLUMNS = (
+    ('rack_units_used', 'RU used'), ('rack_units', 'RU'), ('power_allocated', 'alloc W'), ('power', 'power W'),
+    ('powerdistributionunit_ports_used', 'pdu used'), ('powerdistributionunit_ports', 'pdu ports'),
+    ('networkdevice_ports_used', 'sw used'), ('networkdevice_ports', 'sw ports'), ('orphans', 'orphans'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Reports power, port utilization, rack occupancy and orphaned devices for every datacenter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--datacenter', action='append', help='Limit the report to the datacenter with this slug '
+                                                                   '(may be repeated)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes; 1 runs every datacenter in this process')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['workers'] == 1:
+            report = inventory_report(options['datacenter'])
+        else:
+            # Spawned rather than forked, so workers never inherit the parent's database connections.
+            with ProcessPoolExecutor(max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=django.setup) as executor:
+                report = inventory_report(options['datacenter'], executor)
+        if options['datacenter'] and len(report['datacenters']) != len(set(options['datacenter'])):
+            found = set(row['datacenter'] for row in report['datacenters'])
+            raise CommandError('No datacenter with slug {}'.format(
+                ', '.join(sorted(set(options['datacenter']) - found))))
+        if options['json']:
+            self.stdout.write(json.dumps(report, default=str, indent=2))
+            return
+
+        template = '{:<24}' + ' {:>10}' * len(COLUMNS) + ' {:>8}'
+        self.stdout.write(template.format('datacenter', *[label for _, label in COLUMNS] + ['seconds']))
+        for row in report['datacenters']:
+            self.stdout.write(template.format(
+                row['datacenter'] or '(unplaced)', *[row['totals'][key] for key, _ in COLUMNS] +
+                ['{:.2f}'.format(row['seconds'])]
+            ))
+        self.stdout.write(template.format('total', *[report['totals'][key] for key, _ in COLUMNS] + ['']))
+        for orphan in report['orphans']:
+            self.stdout.write('orphaned {kind} {slug} ({reason}) in {datacenter}'.format(
+                **dict(orphan, datacenter=orphan['datacenter'] or 'no datacenter')))
@@ -0,0 +1,195 @@
+"""
+Derived hardware metrics (cabinet power and occupancy, device port utilization,
+datacenter totals), recomputed in the background instead of on every read.
+
+Writes only mark the affected objects dirty (`mark_dirty`, called from the signal
+handlers in signals.py). The hardware_metrics_worker command calls
+`process_batch` to recompute dirty objects in batches and store the results as
+DerivedMetric rows, which the API reads.
+"""
+import json
+from collections import defaultdict
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from mountaineer.hardware.models import (
+    CHUNK_SIZE, DEVICE_KINDS, Cabinet, CabinetAssignment, Datacenter, DerivedMetric, Device, DirtyObject, PortAssignment,
+    chunked
+)
+
+
+def supports_upsert():
+    """Whether the database has `INSERT ... ON CONFLICT DO UPDATE` (PostgreSQL 9.5+, SQLite 3.24+)."""
+    if connection.vendor == 'postgresql':
+        return connection.pg_version >= 90500
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 24, 0)
+    return False
+
+
+def upsert_dirty(kind, keys, marked):
+    """Queues `keys`, or marks them again if they're queued already, in one statement."""
+    qn = connection.ops.quote_name
+    marked = DirtyObject._meta.get_field('marked').get_db_prep_value(marked, connection)
+    sql = 'INSERT INTO {table} ({kind}, {key}, {marked}) VALUES {rows} ON CONFLICT ({kind}, {key}) DO UPDATE SET {marked} = excluded.{marked}'.format(
+        table=qn(DirtyObject._meta.db_table), kind=qn('kind'), key=qn('key'), marked=qn('marked'),
+        rows=', '.join(['(%s, %s, %s)'] * len(keys)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [param for key in keys for param in (kind, key, marked)])
+
+
+def mark_dirty(kind, keys):
+    """
+    Queues the objects with primary keys `keys` for recomputation, with one upsert per
+    chunk of keys where the database supports it. Elsewhere it costs a single UPDATE
+    when they are all queued already, which is the common case for repeated writes.
+    """
+    now = timezone.now()
+    keys = set(str(key) for key in keys if key is not None)
+    if supports_upsert():
+        # Three parameters per key.
+        for chunk in chunked(keys, CHUNK_SIZE // 3):
+            upsert_dirty(kind, chunk, now)
+        return
+    for chunk in chunked(keys):
+        queued = DirtyObject.objects.filter(kind=kind, key__in=chunk)
+        if queued.update(marked=now) == len(chunk):
+            continue
+        missing = set(chunk).difference(queued.values_list('key', flat=True))
+        try:
+            with transaction.atomic():
+                DirtyObject.objects.bulk_create(DirtyObject(kind=kind, key=key, marked=now) for key in missing)
+        except IntegrityError:
+            # Some were queued concurrently by another writer; queue the rest one at a time.
+            for key in missing:
+                DirtyObject.objects.update_or_create(kind=kind, key=key, defaults={'marked': now})
+
+
+def cabinet_metrics(keys):
+    cabinet_ids = [Cabinet._meta.pk.to_python(key) for key in keys]
+    power = Cabinet.objects.compute_power(cabinet_ids)
+    units = ['device__{}__rack_units'.format(kind) for kind in DEVICE_KINDS]
+    occupancy = {
+        cabinet_id: (used or 0, devices)
+        for cabinet_id, used, devices in CabinetAssignment.objects.filter(cabinet_id__in=cabinet_ids).order_by().values(
+            'cabinet_id'
+        ).annotate(units=Sum(Coalesce(*units)), devices=Count('pk')).values_list('cabinet_id', 'units', 'devices')
+    }
+    cabinets = Cabinet.objects.filter(pk__in=cabinet_ids).values_list('pk', 'rack_units', 'datacenter_id')
+    results = {}
+    for pk, rack_units, datacenter_id in cabinets:
+        used, devices = occupancy.get(pk, (0, 0))
+        results[pk] = dict(
+            power[pk], rack_units=rack_units, rack_units_used=used, rack_units_free=max(rack_units - used, 0),
+            devices=devices, datacenter=datacenter_id
+        )
+    mark_dirty('datacenter', set(result['datacenter'] for result in results.values()))
+    return results
+
+
+def device_metrics(keys):
+    device_ids = [Device._meta.pk.to_python(key) for key in keys]
+    used = dict(
+        PortAssignment.objects.filter(device_id__in=device_ids).order_by().values('device_id').annotate(
+            used=Count('pk')
+        ).values_list('device_id', 'used')
+    )
+    connections = dict(
+        PortAssignment.objects.filter(connected_device_id__in=device_ids).order_by().values(
+            'connected_device_id'
+        ).annotate(connections=Count('pk')).values_list('connected_device_id', 'connections')
+    )
+    results = {}
+    for instance in Device.objects.instances(device_ids).values():
+        data = {'kind': instance._meta.model_name, 'connections': connections.get(instance.device_id, 0)}
+        ports = getattr(instance, 'ports', None)
+        if ports is not None:
+            ports_used = used.get(instance.device_id, 0)
+            data.update(ports=ports, ports_used=ports_used, ports_free=max(ports - ports_used, 0))
+        results[instance.device_id] = data
+    return results
+
+
+def datacenter_metrics(keys):
+    datacenter_ids = [Datacenter._meta.pk.to_python(key) for key in keys]
+    cabinets = defaultdict(list)
+    for pk, datacenter_id, rack_units in Cabinet.objects.filter(datacenter_id__in=datacenter_ids).values_list(
+            'pk', 'datacenter_id', 'rack_units'):
+        cabinets[datacenter_id].append((pk, rack_units))
+    power = Cabinet.objects.compute_power(pk for members in cabinets.values() for pk, _ in members)
+    results = {}
+    for datacenter_id in datacenter_ids:
+        members = cabinets.get(datacenter_id, [])
+        totals = {'cabinets': len(members), 'rack_units': sum(rack_units for _, rack_units in members)}
+        for name in ('power', 'power_allocated', 'power_unallocated'):
+            totals[name] = sum(power[pk][name] for pk, _ in members)
+        results[datacenter_id] = totals
+    return results
+
+
+RECOMPUTE = {
+    'cabinet': cabinet_metrics,
+    'device': device_metrics,
+    'datacenter': datacenter_metrics,
+}
+
+
+def recompute(kind, keys):
+    """Recomputes and stores the metrics of `keys`, dropping rows for objects that no longer exist."""
+    results = RECOMPUTE[kind](keys)
+    computed = timezone.now()
+    with transaction.atomic():
+        DerivedMetric.objects.filter(kind=kind, key__in=keys).delete()
+        DerivedMetric.objects.bulk_create(
+            DerivedMetric(kind=kind, key=str(pk), data=json.dumps(data, default=str), computed=computed)
+            for pk, data in results.items()
+        )
+    return len(keys)
+
+
+def claim(batch_size):
+    """Returns `(claimed_at, {kind: [keys]})` for up to `batch_size` of the oldest dirty objects."""
+    claimed_at = timezone.now()
+    batches = defaultdict(list)
+    for kind, key in DirtyObject.objects.filter(marked__lte=claimed_at).order_by('marked').values_list(
+            'kind', 'key')[:batch_size]:
+        batches[kind].append(key)
+    return claimed_at, batches
+
+
+def release(claimed_at, kind, keys):
+    """Removes queue entries that weren't marked again while they were being recomputed."""
+    DirtyObject.objects.filter(kind=kind, key__in=keys, marked__lte=claimed_at).delete()
+
+
+def process_batch(batch_size=500, chunk_size=100, executor=None):
+    """
+    Recomputes one batch of dirty objects, split into chunks of `chunk_size` keys. The
+    chunks run on `executor` (a concurrent.futures executor) if given. Returns the
+    number of objects recomputed.
+    """
+    claimed_at, batches = claim(batch_size)
+    tasks = [
+        (kind, keys[i:i + chunk_size])
+        for kind, keys in batches.items()
+        for i in range(0, len(keys), chunk_size)
+    ]
+    if executor is None:
+        done = [recompute(kind, keys) for kind, keys in tasks]
+    else:
+        done = list(executor.map(recompute_task, tasks))
+    for kind, keys in tasks:
+        release(claimed_at, kind, keys)
+    return sum(done)
+
+
+def recompute_task(task):
+    """Executor entry point: recomputes one chunk on this thread's or process's own connection."""
+    try:
+        return recompute(*task)
+    finally:
+        connection.close()
@@ -0,0 +1,11 @@
+from mountaineer.hardware import identity
+
+
+class IdentityMapMiddleware(object):
+    """Scopes a hardware identity map (see identity.py) to each request."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity.identity_map():
+            return self.get_response(request)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import uuid
+
+from django.db import migrations, models
+import django.db.models.deletion
+import enumfields.fields
+
+import mountaineer.core.utils.slug
+import mountaineer.hardware
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Datacenter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.CharField(default=mountaineer.core.utils.slug.slugid_nice, max_length=22, unique=True)),
+                ('name', models.CharField(max_length=256)),
+                ('vendor', models.CharField(max_length=256)),
+                ('address', models.CharField(max_length=256)),
+                ('noc_phone', models.CharField(blank=True, max_length=24)),
+                ('noc_email', models.EmailField(blank=True, max_length=254)),
+                ('noc_url', models.URLField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Cabinet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.CharField(default=mountaineer.core.utils.slug.slugid_nice, max_length=22, unique=True)),
+                ('name', models.CharField(max_length=256)),
+                ('rack_units', models.PositiveIntegerField(help_text='Height of rack in Rack Units')),
+                ('posts', models.PositiveIntegerField(help_text='Number of posts in the rack (usually 4, sometimes 2)')),
+                ('depth', models.DecimalField(blank=True, decimal_places=3, help_text='Distance from front to rear post (inches)', max_digits=6, null=True)),
+                ('width', models.DecimalField(blank=True, decimal_places=3, help_text='Width (inches, usually 19.0)', max_digits=6, null=True)),
+                ('attachment', enumfields.fields.EnumIntegerField(blank=True, enum=mountaineer.hardware.CabinetAttachmentMethod, help_text='Hardware attachment method', null=True)),
+                ('fasteners', enumfields.fields.EnumIntegerField(blank=True, enum=mountaineer.hardware.CabinetFastener, help_text='Hardware fasteners in use', null=True)),
+                ('datacenter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hardware.Datacenter')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Device',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(blank=True, editable=False, help_text='Model name of the concrete device, e.g. server', max_length=32)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CabinetAssignment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.CharField(default=mountaineer.core.utils.slug.slugid_nice, max_length=22, unique=True)),
+                ('position', models.PositiveIntegerField(blank=True, null=True)),
+                ('orientation', enumfields.fields.EnumIntegerField(blank=True, enum=mountaineer.hardware.RackOrientation, null=True)),
+                ('depth', enumfields.fields.EnumIntegerField(blank=True, enum=mountaineer.hardware.RackDepth, null=True)),
+                ('cabinet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hardware.Cabinet')),
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='hardware.Device')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Server',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.CharField(default=mountaineer.core.utils.slug.slugid_nice, max_length=22, unique=True)),
+                ('manufacturer', models.CharField(max_length=128)),
+                ('model', models.CharField(max_length=128)),
+                ('serial', models.CharField(max_length=256)),
+                ('asset_id', models.CharField(blank=True, help_text='ID in external asset database, if any.', max_length=64)),
+                ('asset_tag', models.CharField(blank=True, help_text='Asset tag, if any.', max_length=128)),
+                ('rack_units', models.IntegerField(blank=True, help_text='Height of the device, in Rack Units', null=True)),
+                ('draw', models.PositiveIntegerField(blank=True, help_text='Power draw of the device, in Watts', null=True)),
+                ('device', models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='hardware.Device')),
+                ('memory', models.PositiveIntegerField(blank=True, help_text='Physical RAM in MiB', null=True)),
+                ('cores', models.PositiveIntegerField(blank=True, help_text='Number of CPU cores', null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PowerDistributionUnit',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.CharField(default=mountaineer.core.utils.slug.slugid_nice, max_length=22, unique=True)),
+                ('manufacturer', models.CharField(max_length=128)),
+                ('model', models.CharField(max_length=128)),
+                ('serial', models.CharField(max_length=256)),
+                ('asset_id', models.CharField(blank=True, help_text='ID in external asset database, if any.', max_length=64)),
+                ('asset_tag', models.CharField(blank=True, help_text='Asset tag, if any.', max_length=128)),
+                ('rack_units', models.IntegerField(blank=True, help_text='Height of the device, in Rack Units', null=True)),
+                ('draw', models.PositiveIntegerField(blank=True, help_text='Power draw of the device, in Watts', null=True)),
+                ('device', models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='hardware.Device')),
+                ('ports', models.PositiveIntegerField(help_text='Number of ports available on the device')),
+                ('volts', models.PositiveIntegerField(help_text='Rated output voltage')),
+                ('amps', models.PositiveIntegerField(help_text='Rated output amperage')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NetworkDevice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.CharField(default=mountaineer.core.utils.slug.slugid_nice, max_length=22, unique=True)),
+                ('manufacturer', models.CharField(max_length=128)),
+                ('model', models.CharField(max_length=128)),
+                ('serial', models.CharField(max_length=256)),
+                ('asset_id', models.CharField(blank=True, help_text='ID in external asset database, if any.', max_length=64)),
+                ('asset_tag', models.CharField(blank=True, help_text='Asset tag, if any.', max_length=128)),
+                ('rack_units', models.IntegerField(blank=True, help_text='Height of the device, in Rack Units', null=True)),
+                ('draw', models.PositiveIntegerField(blank=True, help_text='Power draw of the device, in Watts', null=True)),
+                ('device', models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='hardware.Device')),
+                ('ports', models.PositiveIntegerField(help_text='Number of ports available on the device')),
+                ('speed', enumfields.fields.EnumIntegerField(enum=mountaineer.hardware.SwitchSpeed)),
+                ('interconnect', enumfields.fields.EnumIntegerField(enum=mountaineer.hardware.SwitchInterconnect)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PortAssignment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.CharField(default=mountaineer.core.utils.slug.slugid_nice, max_length=22, unique=True)),
+                ('device_port', models.PositiveIntegerField()),
+                ('connected_device', models.ForeignKey(help_text='The device being connected.', on_delete=django.db.models.deletion.CASCADE, related_name='connected_device', to='hardware.Device')),
+                ('device', models.ForeignKey(help_text='The device (e.g. switch or pdu) being connected to.', on_delete=django.db.models.deletion.CASCADE, to='hardware.Device')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='server',
+            unique_together=set([('manufacturer', 'model', 'serial')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='portassignment',
+            unique_together=set([('device', 'device_port')]),
+        ),
+    ]
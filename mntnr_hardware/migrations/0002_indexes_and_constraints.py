@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hardware', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='cabinetassignment',
+            unique_together=set([('cabinet', 'position')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='powerdistributionunit',
+            unique_together=set([('manufacturer', 'model', 'serial')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='networkdevice',
+            unique_together=set([('manufacturer', 'model', 'serial')]),
+        ),
+        migrations.AddIndex(
+            model_name='cabinet',
+            index=models.Index(fields=['datacenter', 'name'], name='hardware_cabinet_dc_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['kind'], name='hardware_device_kind_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='server',
+            index=models.Index(fields=['serial'], name='hardware_server_serial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='server',
+            index=models.Index(fields=['asset_tag'], name='hardware_server_asset_tag_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='powerdistributionunit',
+            index=models.Index(fields=['serial'], name='hardware_pdu_serial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='powerdistributionunit',
+            index=models.Index(fields=['asset_tag'], name='hardware_pdu_asset_tag_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='networkdevice',
+            index=models.Index(fields=['serial'], name='hardware_netdev_serial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='networkdevice',
+            index=models.Index(fields=['asset_tag'], name='hardware_netdev_asset_tag_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='portassignment',
+            index=models.Index(fields=['connected_device', 'device'], name='hardware_port_connected_idx'),
+        ),
+    ]
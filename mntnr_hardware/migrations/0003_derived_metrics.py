@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hardware', '0002_indexes_and_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DerivedMetric',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('cabinet', 'cabinet'), ('device', 'device'), ('datacenter', 'datacenter')], max_length=16)),
+                ('key', models.CharField(help_text='Primary key of the object the metrics describe', max_length=64)),
+                ('data', models.TextField(help_text='JSON-encoded metrics')),
+                ('computed', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DirtyObject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('cabinet', 'cabinet'), ('device', 'device'), ('datacenter', 'datacenter')], max_length=16)),
+                ('key', models.CharField(help_text='Primary key of the stale object', max_length=64)),
+                ('marked', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='dirtyobject',
+            unique_together=set([('kind', 'key')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='derivedmetric',
+            unique_together=set([('kind', 'key')]),
+        ),
+    ]
@@ -1,13 +1,62 @@
+import json
 import uuid
+from collections import Counter
 
 from django.utils.functional import cached_property
 from enumfields import EnumIntegerField
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
 
+from mountaineer.hardware import identity
 from mountaineer.hardware import CabinetAttachmentMethod, CabinetFastener, RackDepth, RackOrientation, SwitchInterconnect, SwitchSpeed
 from mountaineer.core.models import SlugModel
 
 
+# Reverse relation names from Device to each concrete device model.
+DEVICE_KINDS = ('server', 'powerdistributionunit', 'networkdevice')
+
+
+# Keeps id__in lists below SQLite's limit on query parameters.
+CHUNK_SIZE = 500
+
+
+def device_related(field):
+    """select_related() paths that load a Device FK together with its concrete instance."""
+    return [field] + ['{}__{}'.format(field, kind) for kind in DEVICE_KINDS]
+
+
+def chunked(items, size=CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class LoadedValuesMixin(models.Model):
+    """
+    Remembers the values `tracked_fields` had when the instance was loaded or last saved,
+    in `_loaded_values`, so signal handlers can tell what a save changes without
+    querying for the stored row.
+    """
+    tracked_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(LoadedValuesMixin, cls).from_db(db, field_names, values)
+        # Deferred fields aren't in __dict__; reading them here would cost a query each.
+        instance._loaded_values = {
+            field: instance.__dict__[field] for field in cls.tracked_fields if field in instance.__dict__
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        super(LoadedValuesMixin, self).save(*args, **kwargs)
+        self._loaded_values = {field: getattr(self, field) for field in self.tracked_fields}
+
+
 class Datacenter(SlugModel):
     name = models.CharField(max_length=256)
     vendor = models.CharField(max_length=256)
@@ -15,12 +64,48 @@ class Datacenter(SlugModel):
     noc_phone = models.CharField(max_length=24, blank=True)
     noc_email = models.EmailField(blank=True)
     noc_url = models.URLField(blank=True)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
        return 'datacenter: {}'.format(self.name)
 
 
-class Cabinet(SlugModel):
+class CabinetManager(models.Manager):
+    def compute_power(self, cabinet_ids):
+        """
+        Returns `{cabinet_id: {'power': ..., 'power_allocated': ..., 'power_unallocated': ...}}`
+        for every id in `cabinet_ids` from a single grouped query. The values mean the same
+        as the Cabinet properties of those names.
+        """
+        cabinet_ids = list(cabinet_ids)
+        draws = ['device__{}__draw'.format(kind) for kind in DEVICE_KINDS]
+        totals = CabinetAssignment.objects.filter(cabinet_id__in=cabinet_ids).order_by().values('cabinet_id').annotate(
+            power=Sum(F('device__powerdistributionunit__amps') * F('device__powerdistributionunit__volts')),
+            power_allocated=Sum(Coalesce(*draws)),
+        )
+        results = {pk: {'power': 0, 'power_allocated': 0, 'power_unallocated': 0} for pk in cabinet_ids}
+        for row in totals:
+            power, allocated = row['power'] or 0, row['power_allocated'] or 0
+            results[row['cabinet_id']] = {
+                'power': power, 'power_allocated': allocated, 'power_unallocated': power - allocated
+            }
+        return results
+
+    def power_summaries(self, cabinet_ids):
+        """
+        Like `compute_power`, but reads the up-to-date derived metrics (see metrics.py)
+        of cabinets that have them and only computes the rest.
+        """
+        cabinet_ids = list(cabinet_ids)
+        derived = DerivedMetric.objects.fresh('cabinet', cabinet_ids)
+        results = self.compute_power(pk for pk in cabinet_ids if str(pk) not in derived)
+        for pk in cabinet_ids:
+            if str(pk) in derived:
+                results[pk] = {name: derived[str(pk)][name] for name in ('power', 'power_allocated', 'power_unallocated')}
+        return results
+
+
+class Cabinet(LoadedValuesMixin, SlugModel):
     name = models.CharField(max_length=256)
     datacenter = models.ForeignKey('Datacenter')
     rack_units = models.PositiveIntegerField(help_text='Height of rack in Rack Units')
@@ -31,32 +116,32 @@ class Cabinet(SlugModel):
                                 help_text='Width (inches, usually 19.0)')
     attachment = EnumIntegerField(CabinetAttachmentMethod, null=True, blank=True, help_text='Hardware attachment method')
     fasteners = EnumIntegerField(CabinetFastener, null=True, blank=True, help_text='Hardware fasteners in use')
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = CabinetManager()
+    tracked_fields = ('datacenter_id',)
+
+    class Meta:
+        indexes = [models.Index(fields=['datacenter', 'name'], name='hardware_cabinet_dc_name_idx')]
 
     def __str__(self):
         return 'cabinet: {}'.format(self.name)
 
+    @cached_property
+    def power_summary(self):
+        return Cabinet.objects.power_summaries([self.pk])[self.pk]
+
     @cached_property
     def power(self):
-        watts = 0
-        assignments = CabinetAssignment.objects.filter(cabinet=self)
-        pdus = [assign.device.instance for assign in assignments if assign.device.type == PowerDistributionUnit]
-        for pdu in pdus:
-            watts += pdu.watts
-        return watts
+        return self.power_summary['power']
 
     @cached_property
     def power_unallocated(self):
-        return self.power - self.power_allocated
+        return self.power_summary['power_unallocated']
 
     @cached_property
     def power_allocated(self):
-        draw = 0
-        assignments = CabinetAssignment.objects.filter(cabinet=self)
-        for assign in assignments:
-            device = assign.device.instance
-            if device.draw:
-                draw += device.draw
-        return draw
+        return self.power_summary['power_allocated']
 
     @cached_property
     def devices(self):
@@ -64,12 +149,19 @@ class Cabinet(SlugModel):
         return [(assign.device.instance, assign.position) for assign in assignments]
 
 
-class CabinetAssignment(SlugModel):
+class CabinetAssignment(LoadedValuesMixin, SlugModel):
     cabinet = models.ForeignKey('Cabinet')
     position = models.PositiveIntegerField(blank=True, null=True)
     orientation = EnumIntegerField(RackOrientation, blank=True, null=True)
     depth = EnumIntegerField(RackDepth, blank=True, null=True)
     device = models.OneToOneField('Device')
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    tracked_fields = ('cabinet_id',)
+
+    class Meta:
+        # Also serves cabinet lookups ordered by position (elevations, Cabinet.devices).
+        unique_together = ('cabinet', 'position')
 
     def __str__(self):
         return '{}: {} in position {}'.format(
@@ -79,6 +171,48 @@ class CabinetAssignment(SlugModel):
         )
 
 
+class DeviceManager(models.Manager):
+    def instances(self, device_ids):
+        """
+        Maps Device ids to their concrete instances using one query per device model,
+        rather than resolving `Device.instance` one device at a time.
+        """
+        remaining = set(device_ids)
+        instances = {}
+        for kind in DEVICE_KINDS:
+            if not remaining:
+                break
+            model = self.model._meta.get_field(kind).related_model
+            for instance in model.objects.filter(device_id__in=remaining):
+                instances[instance.device_id] = instance
+            remaining.difference_update(instances)
+        return instances
+
+    def decommission(self, devices):
+        """
+        Deletes devices, their concrete rows and all of their cabinet and port assignments
+        with one set-based ORM delete per chunk of devices, instead of deleting each device
+        on its own. Cascades and signal handlers run as for `QuerySet.delete()`. Accepts
+        concrete devices, Device objects or Device ids. Returns `(total, {model label: count})`
+        like `QuerySet.delete()`.
+        """
+        device_ids = set()
+        for device in devices:
+            if isinstance(device, DeviceBase):
+                device_ids.add(device.device_id)
+            else:
+                device_ids.add(getattr(device, 'pk', device))
+        device_ids.discard(None)
+
+        using = self._db or router.db_for_write(self.model)
+        deleted = Counter()
+        with transaction.atomic(using=using):
+            for chunk in chunked(device_ids):
+                deleted.update(self.model.objects.using(using).filter(pk__in=chunk).delete()[1])
+        deleted = {label: count for label, count in deleted.items() if count}
+        return sum(deleted.values()), deleted
+
+
 class Device(models.Model):
     """
     To avoid using generic foreign keys, each of our devices will have a OneToOne
@@ -86,24 +220,44 @@ class Device(models.Model):
     model inheritance, but without the automatic joins added by the Django ORM.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=32, blank=True, editable=False,
+                            help_text='Model name of the concrete device, e.g. server')
+
+    objects = DeviceManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['kind'], name='hardware_device_kind_idx')]
 
     def __str__(self):
-        for attr in ['server', 'powerdistributionunit', 'networkdevice']:
-            if hasattr(self, attr):
-                return getattr(self, attr).__str__()
+        instance = self.instance
+        if instance is not None:
+            return instance.__str__()
         return 'device {}'.format(self.id)
 
+    @property
+    def kinds(self):
+        """
+        The reverse relations that may hold the concrete device. Devices created before
+        `kind` was recorded have to probe all of them.
+        """
+        return (self.kind,) if self.kind else DEVICE_KINDS
+
     @cached_property
     def instance(self):
-        for attr in ['server', 'powerdistributionunit', 'networkdevice']:
+        return identity.lookup((Device, self.pk), self._load_instance)
+
+    def _load_instance(self):
+        for attr in self.kinds:
             if hasattr(self, attr):
                 return getattr(self, attr)
 
     @cached_property
     def type(self):
-        for attr in ['server', 'powerdistributionunit', 'networkdevice']:
-            if hasattr(self, attr):
-                return type(getattr(self, attr))
+        if self.kind:
+            return self._meta.get_field(self.kind).related_model
+        instance = self.instance
+        if instance is not None:
+            return type(instance)
 
 
 class DeviceBase(models.Model):
@@ -115,6 +269,7 @@ class DeviceBase(models.Model):
     rack_units = models.IntegerField(blank=True, null=True, help_text='Height of the device, in Rack Units')
     draw = models.PositiveIntegerField(blank=True, null=True, help_text='Power draw of the device, in Watts')
     device = models.OneToOneField('Device', on_delete=models.CASCADE, null=True, blank=True, editable=False)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         abstract = True
@@ -125,22 +280,23 @@ class DeviceBase(models.Model):
 
     @cached_property
     def cabinet(self):
-        try:
-            return self.device.cabinetassignment.cabinet
-        except CabinetAssignment.DoesNotExist:
-            return None
+        location = self.location
+        return location[0] if location else None
 
-    def delete(self, *args, **kwargs):
-        self.device.delete()
-        super(DeviceBase, self).delete(*args, **kwargs)
+    def delete(self, using=None, keep_parents=False):
+        if self.device_id is None:
+            return super(DeviceBase, self).delete(using=using, keep_parents=keep_parents)
+        deleted = Device.objects.db_manager(using).decommission([self])
+        self.pk = None
+        return deleted
 
     @cached_property
     def location(self):
         try:
             assignment = self.device.cabinetassignment
-            return assignment.cabinet, assignment.position
         except CabinetAssignment.DoesNotExist:
             return None
+        return identity.lookup((Cabinet, assignment.cabinet_id), lambda: assignment.cabinet), assignment.position
 
     @cached_property
     def pdus(self):
@@ -148,9 +304,15 @@ class DeviceBase(models.Model):
         return [(assign.device.instance, assign.device_port) for assign in assignments if assign.device.type == PowerDistributionUnit]
 
     def save(self, *args, **kwargs):
-        if not self.device:
-            self.device = Device.objects.create()
-        super(DeviceBase, self).save(*args, **kwargs)
+        if self.device_id is not None:
+            return super(DeviceBase, self).save(*args, **kwargs)
+        if self._state.adding and not args:
+            # Go straight to INSERT rather than trying an UPDATE first when the primary key has a default.
+            kwargs.setdefault('force_insert', True)
+        # The Device id is generated client-side, so creating it needs no extra round trip to read it back.
+        with transaction.atomic(using=kwargs.get('using')):
+            self.device = Device.objects.create(kind=self._meta.model_name)
+            super(DeviceBase, self).save(*args, **kwargs)
 
     @cached_property
     def uplinks(self):
@@ -162,6 +324,12 @@ class Server(DeviceBase, SlugModel):
     memory = models.PositiveIntegerField(blank=True, null=True, help_text='Physical RAM in MiB')
     cores = models.PositiveIntegerField(blank=True, null=True, help_text='Number of CPU cores')
 
+    class Meta(DeviceBase.Meta):
+        indexes = [
+            models.Index(fields=['serial'], name='hardware_server_serial_idx'),
+            models.Index(fields=['asset_tag'], name='hardware_server_asset_tag_idx'),
+        ]
+
 
 class PortDeviceMixin(models.Model):
     ports = models.PositiveIntegerField(help_text='Number of ports available on the device')
@@ -190,6 +358,14 @@ class PowerDistributionUnit(PortDeviceMixin, DeviceBase, SlugModel):
     volts = models.PositiveIntegerField(help_text='Rated output voltage')
     amps = models.PositiveIntegerField(help_text='Rated output amperage')
 
+    # Declared explicitly: Meta is otherwise inherited from PortDeviceMixin alone, which
+    # drops DeviceBase's unique_together.
+    class Meta(DeviceBase.Meta):
+        indexes = [
+            models.Index(fields=['serial'], name='hardware_pdu_serial_idx'),
+            models.Index(fields=['asset_tag'], name='hardware_pdu_asset_tag_idx'),
+        ]
+
     @cached_property
     def watts(self):
         return self.amps * self.volts
@@ -199,6 +375,12 @@ class NetworkDevice(PortDeviceMixin, DeviceBase, SlugModel):
     speed = EnumIntegerField(SwitchSpeed)
     interconnect = EnumIntegerField(SwitchInterconnect)
 
+    class Meta(DeviceBase.Meta):
+        indexes = [
+            models.Index(fields=['serial'], name='hardware_netdev_serial_idx'),
+            models.Index(fields=['asset_tag'], name='hardware_netdev_asset_tag_idx'),
+        ]
+
 
 class PortAssignment(SlugModel):
     device = models.ForeignKey('Device', help_text='The device (e.g. switch or pdu) being connected to.')
@@ -207,11 +389,56 @@ class PortAssignment(SlugModel):
 
     class Meta:
         unique_together = ('device', 'device_port')
+        # pdus/uplinks/trace lookups filter on the connected device and read the other end.
+        indexes = [models.Index(fields=['connected_device', 'device'], name='hardware_port_connected_idx')]
 
     def __str__(self):
         return '{} port {} < {}'.format(self.device, self.device_port, self.connected_device.instance)
 
     def save(self, *args, **kwargs):
-        if self.device_port not in self.device.instance.ports_available:
+        # Checked with a fresh query: ports_available is cached on the (possibly shared) device instance.
+        in_use = PortAssignment.objects.filter(device_id=self.device_id, device_port=self.device_port).exclude(pk=self.pk)
+        if not 1 <= self.device_port <= self.device.instance.ports or in_use.exists():
             raise RuntimeError('Requested port is unavailable')
         super(PortAssignment, self).save(*args, **kwargs)
+
+
+METRIC_KINDS = (('cabinet', 'cabinet'), ('device', 'device'), ('datacenter', 'datacenter'))
+
+
+class DirtyObject(models.Model):
+    """
+    Queue entry for an object whose derived metrics are stale. Entries are added by the
+    signal handlers in signals.py and consumed by the hardware_metrics_worker command.
+    """
+    kind = models.CharField(max_length=16, choices=METRIC_KINDS)
+    key = models.CharField(max_length=64, help_text='Primary key of the stale object')
+    marked = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('kind', 'key')
+
+
+class DerivedMetricManager(models.Manager):
+    def fresh(self, kind, keys):
+        """Returns `{key: data}` for the metrics of `keys` that aren't waiting to be recomputed."""
+        keys = [str(key) for key in keys]
+        stale = DirtyObject.objects.filter(kind=kind, key__in=keys).values('key')
+        rows = self.filter(kind=kind, key__in=keys).exclude(key__in=stale).values_list('key', 'data')
+        return {key: json.loads(data) for key, data in rows}
+
+
+class DerivedMetric(models.Model):
+    kind = models.CharField(max_length=16, choices=METRIC_KINDS)
+    key = models.CharField(max_length=64, help_text='Primary key of the object the metrics describe')
+    data = models.TextField(help_text='JSON-encoded metrics')
+    computed = models.DateTimeField()
+
+    objects = DerivedMetricManager()
+
+    class Meta:
+        unique_together = ('kind', 'key')
+
+    @cached_property
+    def metrics(self):
+        return json.loads(self.data)
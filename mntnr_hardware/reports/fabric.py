@@ -0,0 +1,81 @@
+"""
+Network fabric capacity: per-switch downlink vs uplink bandwidth, oversubscription
+and free ports, plus free-port headroom per interconnect type.
+
+Works over flat lists built from two `values_list()` queries (switches and
+switch-side port assignments) in a single pass, without instantiating models.
+
+A port assignment from switch A (the device being connected to) to device B is a
+downlink of A. When B is also a switch it is an uplink of B, running at the slower
+of the two switches' speeds, and it occupies one of B's ports as well.
+"""
+from mountaineer.hardware import SwitchInterconnect, SwitchSpeed, enum_table
+from mountaineer.hardware.models import NetworkDevice, PortAssignment
+
+
+def enum_value(value):
+    return getattr(value, 'value', value)
+
+
+def fabric_report(datacenter=None):
+    switches = NetworkDevice.objects.all()
+    links = PortAssignment.objects.filter(device__networkdevice__isnull=False)
+    if datacenter is not None:
+        switches = switches.filter(device__cabinetassignment__cabinet__datacenter=datacenter)
+        links = links.filter(device__networkdevice__in=switches)
+
+    device_ids, slugs, ports, speeds, interconnects = [], [], [], [], []
+    for device_id, slug, port_count, speed, interconnect in switches.values_list(
+            'device_id', 'slug', 'ports', 'speed', 'interconnect'):
+        device_ids.append(device_id)
+        slugs.append(slug)
+        ports.append(port_count)
+        speeds.append(enum_value(speed))
+        interconnects.append(enum_value(interconnect))
+    index = {device_id: i for i, device_id in enumerate(device_ids)}
+
+    count = len(device_ids)
+    used, uplinks, downlink, uplink = [0] * count, [0] * count, [0] * count, [0] * count
+    for upstream_id, downstream_id in links.values_list('device_id', 'connected_device_id').iterator():
+        i = index.get(upstream_id)
+        if i is None:
+            continue
+        used[i] += 1
+        j = index.get(downstream_id)
+        if j is None:
+            downlink[i] += speeds[i]
+        else:
+            speed = min(speeds[i], speeds[j])
+            downlink[i] += speed
+            uplink[j] += speed
+            uplinks[j] += 1
+
+    speed_labels, interconnect_labels = enum_table(SwitchSpeed), enum_table(SwitchInterconnect)
+    rows = []
+    headroom = {}
+    for i in range(count):
+        free = max(ports[i] - used[i] - uplinks[i], 0)
+        rows.append({
+            'device_id': device_ids[i],
+            'slug': slugs[i],
+            'speed': speed_labels[speeds[i]][1],
+            'interconnect': interconnect_labels[interconnects[i]][1],
+            'ports': ports[i],
+            'ports_used': used[i] + uplinks[i],
+            'ports_free': free,
+            'downlink_mbps': downlink[i],
+            'uplink_mbps': uplink[i],
+            'oversubscription': round(downlink[i] / uplink[i], 3) if uplink[i] else None,
+        })
+        totals = headroom.setdefault(interconnects[i], {'switches': 0, 'ports': 0, 'ports_free': 0, 'free_mbps': 0})
+        totals['switches'] += 1
+        totals['ports'] += ports[i]
+        totals['ports_free'] += free
+        totals['free_mbps'] += free * speeds[i]
+
+    return {
+        'switches': rows,
+        'interconnects': [
+            dict(interconnect=interconnect_labels[value][1], **totals) for value, totals in sorted(headroom.items())
+        ],
+    }
@@ -0,0 +1,174 @@
+"""
+Estate-wide inventory report: cabinet power, PDU and switch port utilization, rack
+occupancy and orphaned devices, partitioned by datacenter.
+
+Each partition is computed by `partition_report` from three `values_list()`
+queries, without instantiating models, so partitions can run side by side on a
+process pool (each worker on its own database connection) and be merged by
+`merge`. Devices that aren't placed in any cabinet belong to no datacenter and
+are reported by a partition of their own.
+
+A placed device is orphaned when no port assignment references it at either end;
+an unplaced device is always orphaned.
+"""
+import time
+from collections import OrderedDict
+
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+
+from mountaineer.hardware.models import DEVICE_KINDS, Cabinet, CabinetAssignment, Datacenter, Device, PortAssignment
+from mountaineer.hardware.simulation import device_kind
+
+PORT_KINDS = ('powerdistributionunit', 'networkdevice')
+
+
+def coalesce(prefix, attr):
+    return Coalesce(*['{}{}__{}'.format(prefix, kind, attr) for kind in DEVICE_KINDS])
+
+
+def empty_totals():
+    totals = OrderedDict((key, 0) for key in (
+        'cabinets', 'rack_units', 'rack_units_used', 'power', 'power_allocated', 'power_unallocated', 'orphans'
+    ))
+    for kind in PORT_KINDS:
+        totals[kind + '_ports'] = totals[kind + '_ports_used'] = 0
+    return totals
+
+
+def partition_report(datacenter_id):
+    """
+    The report for the datacenter with pk `datacenter_id`, or for unplaced devices
+    when it is None, as `{'cabinets': [...], 'orphans': [...], 'totals': {...}}`.
+    """
+    if datacenter_id is None:
+        orphans = Device.objects.filter(cabinetassignment__isnull=True).annotate(
+            device_slug=coalesce('', 'slug'),
+            device_ports=Coalesce('powerdistributionunit__ports', 'networkdevice__ports'),
+            device_amps=F('powerdistributionunit__amps'),
+        ).values_list('pk', 'kind', 'device_slug', 'device_ports', 'device_amps')
+        totals = empty_totals()
+        rows = [
+            {'device_id': pk, 'slug': slug, 'kind': device_kind(kind, ports, amps), 'reason': 'unplaced'}
+            for pk, kind, slug, ports, amps in orphans if slug is not None
+        ]
+        totals['orphans'] = len(rows)
+        return {'cabinets': [], 'orphans': rows, 'totals': totals}
+
+    cabinets = OrderedDict()
+    for pk, slug, rack_units in Cabinet.objects.filter(datacenter_id=datacenter_id).order_by('name').values_list(
+            'pk', 'slug', 'rack_units'):
+        cabinets[pk] = {
+            'slug': slug, 'rack_units': rack_units, 'units': set(), 'power': 0, 'power_allocated': 0,
+        }
+
+    assignments = CabinetAssignment.objects.filter(cabinet__datacenter_id=datacenter_id)
+    placed = assignments.annotate(
+        device_slug=coalesce('device__', 'slug'), device_draw=coalesce('device__', 'draw'),
+        device_units=coalesce('device__', 'rack_units'),
+        device_ports=Coalesce('device__powerdistributionunit__ports', 'device__networkdevice__ports'),
+        device_watts=F('device__powerdistributionunit__amps') * F('device__powerdistributionunit__volts'),
+    ).values_list(
+        'cabinet_id', 'device_id', 'position', 'device__kind',
+        'device_slug', 'device_draw', 'device_units', 'device_ports', 'device_watts'
+    )
+    devices = OrderedDict()
+    for cabinet_id, device_id, position, kind, slug, draw, units, ports, watts in placed:
+        if slug is None:
+            continue
+        cabinet = cabinets[cabinet_id]
+        cabinet['power'] += watts or 0
+        cabinet['power_allocated'] += draw or 0
+        if position is not None:
+            cabinet['units'].update(
+                unit for unit in range(position, position + (units or 1)) if 1 <= unit <= cabinet['rack_units']
+            )
+        devices[device_id] = (slug, device_kind(kind, ports, watts), ports)
+
+    device_ids = assignments.values('device_id')
+    connected, used_ports = set(), {}
+    for device_id, port, connected_device_id in PortAssignment.objects.filter(
+            Q(device_id__in=device_ids) | Q(connected_device_id__in=device_ids)
+    ).values_list('device_id', 'device_port', 'connected_device_id'):
+        connected.update((device_id, connected_device_id))
+        used_ports.setdefault(device_id, set()).add(port)
+
+    totals = empty_totals()
+    rows = []
+    for cabinet in cabinets.values():
+        used = len(cabinet.pop('units'))
+        cabinet.update(
+            rack_units_used=used, rack_units_free=cabinet['rack_units'] - used,
+            power_unallocated=cabinet['power'] - cabinet['power_allocated'],
+        )
+        rows.append(cabinet)
+        totals['cabinets'] += 1
+        for key in ('rack_units', 'rack_units_used', 'power', 'power_allocated', 'power_unallocated'):
+            totals[key] += cabinet[key]
+
+    orphans = []
+    for device_id, (slug, kind, ports) in devices.items():
+        if kind in PORT_KINDS and ports is not None:
+            totals[kind + '_ports'] += ports
+            totals[kind + '_ports_used'] += len(used_ports.get(device_id, ()))
+        if device_id not in connected:
+            orphans.append({'device_id': device_id, 'slug': slug, 'kind': kind, 'reason': 'unconnected'})
+    totals['orphans'] = len(orphans)
+    return {'cabinets': rows, 'orphans': orphans, 'totals': totals}
+
+
+def timed_partition(datacenter_id):
+    started = time.perf_counter()
+    report = partition_report(datacenter_id)
+    report['seconds'] = time.perf_counter() - started
+    return report
+
+
+def partition_task(datacenter_id):
+    """Executor entry point: runs one partition on this process's own connection."""
+    try:
+        return timed_partition(datacenter_id)
+    finally:
+        connection.close()
+
+
+def merge(partitions):
+    """
+    Combines `[(datacenter slug or None, partition report)]` into one report with
+    per-datacenter rows, estate totals and every orphaned device.
+    """
+    totals = empty_totals()
+    datacenters, orphans = [], []
+    for slug, report in partitions:
+        for key, value in report['totals'].items():
+            totals[key] += value
+        for orphan in report['orphans']:
+            orphans.append(dict(orphan, datacenter=slug))
+        datacenters.append({
+            'datacenter': slug, 'seconds': report['seconds'], 'totals': report['totals'], 'cabinets': report['cabinets']
+        })
+    return {'datacenters': datacenters, 'totals': totals, 'orphans': orphans}
+
+
+def inventory_report(datacenters=None, executor=None):
+    """
+    Reports on the datacenters with slugs in `datacenters`, or on every datacenter
+    plus the unplaced devices. Partitions run on `executor` (a concurrent.futures
+    executor) if given, otherwise one after another in this process.
+    """
+    queryset = Datacenter.objects.order_by('name')
+    if datacenters is not None:
+        queryset = queryset.filter(slug__in=datacenters)
+    ids, slugs = [], []
+    for pk, slug in queryset.values_list('pk', 'slug'):
+        ids.append(pk)
+        slugs.append(slug)
+    if datacenters is None:
+        ids.append(None)
+        slugs.append(None)
+    if executor is None:
+        reports = [timed_partition(pk) for pk in ids]
+    else:
+        reports = list(executor.map(partition_task, ids))
+    return merge(zip(slugs, reports))
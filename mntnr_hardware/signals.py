@@ -0,0 +1,68 @@
+"""
+Signal handlers that queue derived-metric recomputation (see metrics.py) when
+hardware rows change. Bulk operations that bypass signals mark objects dirty
+themselves. Connected by HardwareConfig.ready().
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from mountaineer.hardware.metrics import mark_dirty
+from mountaineer.hardware.models import (
+    Cabinet, CabinetAssignment, NetworkDevice, PortAssignment, PowerDistributionUnit, Server
+)
+
+
+def previous(instance, field):
+    """
+    The value of `field` currently stored for `instance`, or None if it isn't saved yet.
+    Comes from the values recorded by LoadedValuesMixin; only instances that were
+    neither loaded nor saved with `field` (e.g. deferred) query for it.
+    """
+    if instance.pk is None:
+        return None
+    loaded = getattr(instance, '_loaded_values', {})
+    if field in loaded:
+        return loaded[field]
+    return type(instance).objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender=Cabinet, dispatch_uid='hardware_cabinet_dirty_pre_save')
+def cabinet_saving(sender, instance, **kwargs):
+    instance._previous_datacenter_id = previous(instance, 'datacenter_id')
+
+
+@receiver(post_save, sender=Cabinet, dispatch_uid='hardware_cabinet_dirty_save')
+@receiver(post_delete, sender=Cabinet, dispatch_uid='hardware_cabinet_dirty_delete')
+def cabinet_changed(sender, instance, **kwargs):
+    # A cabinet moved to another datacenter changes the old datacenter's metrics too.
+    mark_dirty('cabinet', [instance.pk])
+    mark_dirty('datacenter', [instance.datacenter_id, getattr(instance, '_previous_datacenter_id', None)])
+
+
+@receiver(pre_save, sender=CabinetAssignment, dispatch_uid='hardware_cabinetassignment_dirty_pre_save')
+def cabinet_assignment_saving(sender, instance, **kwargs):
+    instance._previous_cabinet_id = previous(instance, 'cabinet_id')
+
+
+@receiver(post_save, sender=CabinetAssignment, dispatch_uid='hardware_cabinetassignment_dirty_save')
+@receiver(post_delete, sender=CabinetAssignment, dispatch_uid='hardware_cabinetassignment_dirty_delete')
+def cabinet_assignment_changed(sender, instance, **kwargs):
+    mark_dirty('cabinet', [instance.cabinet_id, getattr(instance, '_previous_cabinet_id', None)])
+    mark_dirty('device', [instance.device_id])
+
+
+@receiver(post_save, sender=PortAssignment, dispatch_uid='hardware_portassignment_dirty_save')
+@receiver(post_delete, sender=PortAssignment, dispatch_uid='hardware_portassignment_dirty_delete')
+def port_assignment_changed(sender, instance, **kwargs):
+    mark_dirty('device', [instance.device_id, instance.connected_device_id])
+
+
+def device_changed(sender, instance, **kwargs):
+    # A device's draw and rack units feed its cabinet's power and occupancy.
+    mark_dirty('device', [instance.device_id])
+    mark_dirty('cabinet', CabinetAssignment.objects.filter(device_id=instance.device_id).values_list('cabinet_id', flat=True))
+
+
+for model in (Server, PowerDistributionUnit, NetworkDevice):
+    post_save.connect(device_changed, sender=model, dispatch_uid='hardware_{}_dirty_save'.format(model._meta.model_name))
+    post_delete.connect(device_changed, sender=model, dispatch_uid='hardware_{}_dirty_delete'.format(model._meta.model_name))
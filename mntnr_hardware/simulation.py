@@ -0,0 +1,276 @@
+"""
+What-if capacity planning: add, move and remove devices in an in-memory copy of
+a datacenter and report the resulting power, rack unit and port violations,
+without writing to the database.
+
+`Simulation.load` reads the datacenter's cabinets, placed devices and cabling
+in three queries. Each operation then updates only the cabinets and devices it
+touches, and `violations()` checks only those, so a plan costs time in
+proportion to its size rather than the datacenter's.
+
+Operations are dicts:
+
+    {"op": "add", "device": {"id": "new-1", "kind": "server", "draw": 350, "rack_units": 1},
+     "cabinet": "<slug>", "position": 12, "connections": [{"device": "<pdu slug>", "port": 4}]}
+    {"op": "move", "device": "<slug>", "cabinet": "<slug>", "position": 20}
+    {"op": "remove", "device": "<slug>"}
+
+Added devices are referred to by their `id` in later operations. PDUs take
+`volts` and `amps`, PDUs and switches take `ports`, and a connection without a
+`port` takes the lowest free one.
+"""
+from collections import defaultdict
+
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+
+from mountaineer.hardware.models import DEVICE_KINDS, Cabinet, CabinetAssignment, PortAssignment
+
+
+class SimulationError(ValueError):
+    pass
+
+
+class SimCabinet(object):
+    __slots__ = ('slug', 'name', 'rack_units', 'power', 'allocated', 'units', 'overflow')
+
+    def __init__(self, slug, name, rack_units):
+        self.slug, self.name, self.rack_units = slug, name, rack_units
+        self.power = self.allocated = 0
+        # Keys of the devices occupying each unit, bottom (unit 1) first.
+        self.units = [[] for _ in range(rack_units)]
+        # Keys of devices extending past the top or bottom of the cabinet.
+        self.overflow = set()
+
+    def metrics(self):
+        used = sum(1 for occupants in self.units if occupants)
+        return {
+            'power': self.power, 'power_allocated': self.allocated, 'power_unallocated': self.power - self.allocated,
+            'rack_units_used': used, 'rack_units_free': self.rack_units - used,
+        }
+
+
+class SimDevice(object):
+    __slots__ = ('key', 'kind', 'draw', 'rack_units', 'ports', 'watts', 'cabinet', 'position', 'used_ports', 'uplinks')
+
+    def __init__(self, key, kind, draw=None, rack_units=None, ports=None, watts=None):
+        self.key, self.kind = key, kind
+        self.draw, self.rack_units, self.ports, self.watts = draw or 0, rack_units or 1, ports, watts or 0
+        self.cabinet = self.position = None
+        # port -> keys of the devices plugged into it (more than one is a conflict).
+        self.used_ports = defaultdict(list)
+        # (upstream key, port) for each port this device is plugged into.
+        self.uplinks = []
+
+    def units(self):
+        if self.position is None:
+            return range(0)
+        return range(self.position, self.position + self.rack_units)
+
+
+def device_kind(kind, ports, watts):
+    """The device's kind, inferred for devices created before Device.kind was recorded."""
+    if kind:
+        return kind
+    if watts is not None:
+        return 'powerdistributionunit'
+    return 'networkdevice' if ports is not None else 'server'
+
+
+class Simulation(object):
+    def __init__(self):
+        self.cabinets = {}
+        self.devices = {}
+        self.touched_cabinets = set()
+        self.touched_devices = set()
+
+    @classmethod
+    def load(cls, datacenter):
+        simulation = cls()
+        cabinets = {}
+        for pk, slug, name, rack_units in Cabinet.objects.filter(datacenter=datacenter).values_list(
+                'pk', 'slug', 'name', 'rack_units'):
+            cabinets[pk] = simulation.cabinets[slug] = SimCabinet(slug, name, rack_units)
+
+        def coalesce(attr):
+            return Coalesce(*['device__{}__{}'.format(kind, attr) for kind in DEVICE_KINDS])
+
+        assignments = CabinetAssignment.objects.filter(cabinet__datacenter=datacenter)
+        placed = assignments.annotate(
+            device_slug=coalesce('slug'), device_draw=coalesce('draw'), device_units=coalesce('rack_units'),
+            device_ports=Coalesce('device__powerdistributionunit__ports', 'device__networkdevice__ports'),
+            device_watts=F('device__powerdistributionunit__amps') * F('device__powerdistributionunit__volts'),
+        ).values_list(
+            'device_id', 'cabinet_id', 'position', 'device__kind',
+            'device_slug', 'device_draw', 'device_units', 'device_ports', 'device_watts'
+        )
+        keys = {}
+        for device_id, cabinet_id, position, kind, slug, draw, units, ports, watts in placed:
+            if slug is None:
+                continue
+            device = SimDevice(slug, device_kind(kind, ports, watts), draw, units, ports, watts)
+            simulation.devices[slug] = keys[device_id] = device
+            simulation.place(device, cabinets[cabinet_id], position)
+
+        # A subquery rather than the ids themselves, which could exceed SQLite's parameter limit.
+        device_ids = assignments.values('device_id')
+        cables = PortAssignment.objects.filter(
+            Q(device_id__in=device_ids) | Q(connected_device_id__in=device_ids)
+        ).values_list('device_id', 'device_port', 'connected_device_id')
+        for device_id, port, connected_device_id in cables:
+            upstream, downstream = keys.get(device_id), keys.get(connected_device_id)
+            if upstream is not None:
+                upstream.used_ports[port].append(downstream.key if downstream else None)
+            if downstream is not None:
+                downstream.uplinks.append((upstream.key if upstream else None, port))
+        simulation.touched_cabinets.clear()
+        return simulation
+
+    def device(self, key):
+        try:
+            return self.devices[key]
+        except (KeyError, TypeError):
+            raise SimulationError('Unknown device {!r}'.format(key))
+
+    def cabinet(self, slug):
+        try:
+            return self.cabinets[slug]
+        except (KeyError, TypeError):
+            raise SimulationError('Unknown cabinet {!r}'.format(slug))
+
+    def place(self, device, cabinet, position):
+        device.cabinet, device.position = cabinet, position
+        cabinet.allocated += device.draw
+        cabinet.power += device.watts
+        for unit in device.units():
+            if 1 <= unit <= cabinet.rack_units:
+                cabinet.units[unit - 1].append(device.key)
+            else:
+                cabinet.overflow.add(device.key)
+        self.touched_cabinets.add(cabinet.slug)
+
+    def unplace(self, device):
+        cabinet = device.cabinet
+        if cabinet is None:
+            return
+        cabinet.allocated -= device.draw
+        cabinet.power -= device.watts
+        for unit in device.units():
+            if 1 <= unit <= cabinet.rack_units:
+                cabinet.units[unit - 1].remove(device.key)
+        cabinet.overflow.discard(device.key)
+        device.cabinet = device.position = None
+        self.touched_cabinets.add(cabinet.slug)
+
+    def connect(self, device, upstream, port=None):
+        if upstream.ports is None:
+            raise SimulationError('{!r} has no ports'.format(upstream.key))
+        if port is None:
+            port = next((port for port in range(1, upstream.ports + 1) if not upstream.used_ports.get(port)), None)
+            if port is None:
+                # Recorded on port 0 so the device shows up as a port violation.
+                port = 0
+        upstream.used_ports[port].append(device.key)
+        device.uplinks.append((upstream.key, port))
+        self.touched_devices.add(upstream.key)
+
+    def disconnect(self, device):
+        for upstream_key, port in device.uplinks:
+            upstream = self.devices.get(upstream_key)
+            if upstream is not None:
+                upstream.used_ports[port].remove(device.key)
+                self.touched_devices.add(upstream_key)
+        for port, keys in device.used_ports.items():
+            for key in keys:
+                downstream = self.devices.get(key)
+                if downstream is not None:
+                    downstream.uplinks.remove((device.key, port))
+        device.uplinks, device.used_ports = [], defaultdict(list)
+
+    def apply(self, operations):
+        """Applies `operations` in order. Raises SimulationError naming the first invalid one."""
+        for index, operation in enumerate(operations):
+            try:
+                self.apply_one(operation)
+            except SimulationError as e:
+                raise SimulationError('Operation {}: {}'.format(index, e))
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                raise SimulationError('Operation {}: malformed ({!r})'.format(index, e))
+
+    def apply_one(self, operation):
+        op = operation['op']
+        if op == 'add':
+            spec = operation['device']
+            key = spec['id']
+            if key in self.devices:
+                raise SimulationError('Device {!r} already exists'.format(key))
+            kind = spec.get('kind', 'server')
+            if kind not in DEVICE_KINDS:
+                raise SimulationError('Unknown kind {!r}'.format(kind))
+            watts = int(spec['volts']) * int(spec['amps']) if kind == 'powerdistributionunit' else 0
+            ports = int(spec['ports']) if kind != 'server' else None
+            device = SimDevice(key, kind, int(spec.get('draw') or 0), int(spec.get('rack_units') or 1), ports, watts)
+            self.devices[key] = device
+            self.touched_devices.add(key)
+            if operation.get('cabinet') is not None:
+                self.place(device, self.cabinet(operation['cabinet']), self.position(operation))
+            for connection in operation.get('connections', ()):
+                port = connection.get('port')
+                self.connect(device, self.device(connection['device']), int(port) if port is not None else None)
+        elif op == 'move':
+            device = self.device(operation['device'])
+            cabinet = self.cabinet(operation['cabinet'])
+            self.unplace(device)
+            self.place(device, cabinet, self.position(operation))
+        elif op == 'remove':
+            device = self.device(operation['device'])
+            self.unplace(device)
+            self.disconnect(device)
+            del self.devices[device.key]
+            self.touched_devices.discard(device.key)
+        else:
+            raise SimulationError('Unknown op {!r}'.format(op))
+
+    def position(self, operation):
+        position = operation.get('position')
+        return int(position) if position is not None else None
+
+    def violations(self):
+        """Power, rack unit and port violations in the cabinets and devices the operations touched."""
+        violations = []
+        for slug in sorted(self.touched_cabinets):
+            cabinet = self.cabinets[slug]
+            metrics = cabinet.metrics()
+            if metrics['power_unallocated'] < 0:
+                violations.append({
+                    'type': 'power', 'cabinet': slug, 'power': metrics['power'],
+                    'power_allocated': metrics['power_allocated'], 'power_unallocated': metrics['power_unallocated'],
+                })
+            conflicts = [unit for unit, occupants in enumerate(cabinet.units, 1) if len(occupants) > 1]
+            if conflicts or cabinet.overflow:
+                devices = set(cabinet.overflow).union(*(cabinet.units[unit - 1] for unit in conflicts))
+                violations.append({'type': 'rack_units', 'cabinet': slug, 'units': conflicts, 'devices': sorted(devices)})
+        for key in sorted(self.touched_devices):
+            device = self.devices[key]
+            if device.ports is None:
+                continue
+            used = [port for port, keys in device.used_ports.items() if keys]
+            conflicts = sorted(
+                port for port in used if len(device.used_ports[port]) > 1 or not 1 <= port <= device.ports
+            )
+            if conflicts:
+                violations.append({
+                    'type': 'ports', 'device': key, 'ports': device.ports, 'ports_used': len(used), 'conflicts': conflicts
+                })
+        return violations
+
+    def report(self):
+        return {
+            'violations': self.violations(),
+            'cabinets': {slug: self.cabinets[slug].metrics() for slug in sorted(self.touched_cabinets)},
+            'devices': {
+                key: {'ports': device.ports, 'ports_used': sum(1 for keys in device.used_ports.values() if keys)}
+                for key, device in ((key, self.devices[key]) for key in sorted(self.touched_devices))
+                if device.ports is not None
+            },
+        }
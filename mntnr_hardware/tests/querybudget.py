@@ -0,0 +1,250 @@
+"""
+Query-count budgets for the hardware API.
+
+`QueryBudgetTestCase` runs every endpoint in `ENDPOINTS` against a fixture of
+`size` devices per kind and again at ten times that size, and fails if the
+number of queries differs between the two (i.e. grows with the data) or
+exceeds the count recorded in query_budgets.json. Each recorded entry also
+keeps the normalized SQL of its queries, so a budget change shows up in review
+as a diff of the queries themselves, and the test fails when those change
+even if the count doesn't.
+
+Endpoints without an entry are skipped, with their queries in the skip
+message. Run the tests with HARDWARE_UPDATE_QUERY_BUDGETS=1 to record them and
+to rewrite entries whose queries changed, and commit the updated file.
+"""
+import difflib
+import itertools
+import json
+import os
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from mountaineer.hardware.models import *
+
+
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), 'query_budgets.json')
+UPDATE_ENV = 'HARDWARE_UPDATE_QUERY_BUDGETS'
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'IN \(\?(?:, \?)*\)')
+
+
+def fingerprint(sql):
+    """`sql` with literals replaced by `?` and IN lists collapsed, so it doesn't vary with the data."""
+    return IN_LISTS.sub('IN (...)', LITERALS.sub('?', sql))
+
+
+def url(name, **kwargs):
+    return reverse('api_v1:hardware:{}'.format(name), kwargs=kwargs or None)
+
+
+class Fixture(object):
+    """Datacenters full of cabinets, each holding a PDU, a switch and a server patched into both."""
+    def __init__(self):
+        self.counter = itertools.count()
+        self.datacenter = Datacenter.objects.create(name='dc', vendor='foo', address='123 fake st')
+        self.cabinets, self.pdus, self.switches, self.servers = [], [], [], []
+
+    def unique(self, prefix):
+        return '{}{}'.format(prefix, next(self.counter))
+
+    def grow(self, n):
+        for _ in range(n):
+            cabinet = Cabinet.objects.create(name=self.unique('cab'), datacenter=self.datacenter, rack_units=42, posts=4)
+            pdu = self.pdu()
+            switch = NetworkDevice.objects.create(
+                manufacturer='juniper', model='ex', serial=self.unique('sw'), ports=48, speed=1000, interconnect=1
+            )
+            server = self.server()
+            for position, device in enumerate((pdu, switch, server), 1):
+                CabinetAssignment.objects.create(cabinet=cabinet, device=device.device, position=position)
+            PortAssignment.objects.create(device=pdu.device, device_port=1, connected_device=server.device)
+            PortAssignment.objects.create(device=switch.device, device_port=1, connected_device=server.device)
+            DerivedMetric.objects.create(kind='cabinet', key=str(cabinet.pk), data='{}', computed=timezone.now())
+            self.cabinets.append(cabinet)
+            self.pdus.append(pdu)
+            self.switches.append(switch)
+            self.servers.append(server)
+
+    def pdu(self):
+        return PowerDistributionUnit.objects.create(
+            manufacturer='apc', model='cpa', serial=self.unique('pdu'), ports=24, volts=208, amps=30, draw=10
+        )
+
+    def server(self):
+        return Server.objects.create(manufacturer='dell', model='r640', serial=self.unique('srv'), draw=350, rack_units=1)
+
+
+# `url` and `payload` take the Fixture; `payload` is built before queries are captured.
+Endpoint = namedtuple('Endpoint', ['name', 'method', 'url', 'payload'])
+
+
+def resource_endpoints(basename, detail, create=None):
+    """list and detail endpoints for `basename`, plus create and update when `create` builds a payload."""
+    endpoints = [
+        Endpoint(basename + ' list', 'get', lambda fixture: url(basename + '-list'), None),
+        Endpoint(basename + ' detail', 'get', lambda fixture: url(basename + '-detail', **detail(fixture)), None),
+    ]
+    if create is not None:
+        endpoints += [
+            Endpoint(basename + ' create', 'post', lambda fixture: url(basename + '-list'), create),
+            Endpoint(basename + ' update', 'put', lambda fixture: url(basename + '-detail', **detail(fixture)), None),
+        ]
+    return endpoints
+
+
+def slug_of(objects):
+    return lambda fixture: {'slug': getattr(fixture, objects)[0].slug}
+
+
+def device_payload(fixture, prefix, **extra):
+    return dict(extra, manufacturer='acme', model='x1', serial=fixture.unique(prefix))
+
+
+def scan_payload(fixture):
+    """An audit scan that finds every fixture device where it's recorded, with its cables."""
+    rows = ['kind,cabinet,position,serial,port,connected_serial']
+    for cabinet, pdu, switch, server in zip(fixture.cabinets, fixture.pdus, fixture.switches, fixture.servers):
+        rows += ['device,{},{},{},,'.format(cabinet.name, position, device.serial)
+                 for position, device in enumerate((pdu, switch, server), 1)]
+        rows += ['cable,,,{},1,{}'.format(device.serial, server.serial) for device in (pdu, switch)]
+    return {'scan': '\n'.join(rows)}
+
+
+QUERY_SELECTION = {
+    'name': True,
+    'cabinets': {
+        'name': True, 'power': True,
+        'devices': {'serial': True, 'kind': True, 'position': True, 'ports': {'device_port': True, 'connected_device': {'serial': True}}},
+    },
+}
+
+
+ENDPOINTS = (
+    resource_endpoints('datacenter', lambda fixture: {'slug': fixture.datacenter.slug}, lambda fixture: {
+        'name': fixture.unique('dc'), 'vendor': 'foo', 'address': '123 fake st'
+    }) +
+    resource_endpoints('cabinet', slug_of('cabinets'), lambda fixture: {
+        'name': fixture.unique('cab'), 'rack_units': 42, 'posts': 4,
+        'datacenter': url('datacenter-detail', slug=fixture.datacenter.slug)
+    }) +
+    resource_endpoints(
+        'cabinetassignment', lambda fixture: {'slug': CabinetAssignment.objects.order_by('pk')[0].slug},
+        lambda fixture: {
+            'cabinet': url('cabinet-detail', slug=fixture.cabinets[0].slug),
+            'device_id': str(fixture.server().device_id)
+        }
+    ) +
+    resource_endpoints('server', slug_of('servers'), lambda fixture: device_payload(fixture, 'srv')) +
+    resource_endpoints('powerdistributionunit', slug_of('pdus'), lambda fixture: device_payload(
+        fixture, 'pdu', ports=24, volts=208, amps=30
+    )) +
+    resource_endpoints('networkdevice', slug_of('switches'), lambda fixture: device_payload(
+        fixture, 'sw', ports=48, speed=1000, interconnect=1
+    )) +
+    resource_endpoints(
+        'portassignment', lambda fixture: {'slug': PortAssignment.objects.order_by('pk')[0].slug},
+        lambda fixture: {
+            'device_id': str(fixture.pdu().device_id), 'device_port': 1,
+            'connected_device_id': str(fixture.servers[0].device_id)
+        }
+    ) +
+    resource_endpoints('derivedmetric', lambda fixture: {'pk': DerivedMetric.objects.order_by('pk')[0].pk}) + [
+        Endpoint('cabinet elevation', 'get', lambda fixture: url('cabinet-elevation', slug=fixture.cabinets[0].slug), None),
+        Endpoint('cabinet elevations', 'get', lambda fixture: '{}?slugs={}'.format(
+            url('cabinet-elevations'), ','.join(cabinet.slug for cabinet in fixture.cabinets)
+        ), None),
+        Endpoint('cabinet power', 'post', lambda fixture: url('cabinet-power'), lambda fixture: {
+            'slugs': [cabinet.slug for cabinet in fixture.cabinets]
+        }),
+        Endpoint('datacenter audit', 'post', lambda fixture: url('datacenter-audit', slug=fixture.datacenter.slug), scan_payload),
+        Endpoint('datacenter simulate', 'post', lambda fixture: url('datacenter-simulate', slug=fixture.datacenter.slug),
+                 lambda fixture: {'operations': [{
+                     'op': 'add', 'device': {'id': 'new', 'kind': 'server', 'draw': 350, 'rack_units': 1},
+                     'cabinet': fixture.cabinets[0].slug, 'position': 10,
+                     'connections': [{'device': fixture.pdus[0].slug, 'port': 2}],
+                 }]}),
+        Endpoint('device trace', 'get', lambda fixture: reverse(
+            'api_v1:hardware-device-trace', kwargs={'device_id': fixture.servers[0].device_id}
+        ), None),
+        Endpoint('query', 'post', lambda fixture: reverse('api_v1:hardware-query'), lambda fixture: {
+            'root': 'datacenter', 'fields': QUERY_SELECTION
+        }),
+        Endpoint('fabric report', 'get', lambda fixture: reverse('api_v1:hardware-fabric-report'), None),
+    ]
+)
+
+
+class QueryBudgetTestCase(TestCase):
+    endpoints = ENDPOINTS
+    size = 3
+    budget_file = BUDGET_FILE
+
+    @classmethod
+    def setUpClass(cls):
+        super(QueryBudgetTestCase, cls).setUpClass()
+        with open(cls.budget_file) as f:
+            cls.budgets = json.load(f)
+        cls.budgets_changed = False
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.budgets_changed:
+            with open(cls.budget_file, 'w') as f:
+                json.dump(cls.budgets, f, indent=2, sort_keys=True)
+                f.write('\n')
+        super(QueryBudgetTestCase, cls).tearDownClass()
+
+    def measure(self, endpoint, fixture):
+        path = endpoint.url(fixture)
+        if endpoint.method == 'put':
+            payload = self.client.get(path).json()
+        else:
+            payload = endpoint.payload(fixture) if endpoint.payload else None
+        kwargs = {} if payload is None else {'data': json.dumps(payload), 'content_type': 'application/json'}
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, endpoint.method)(path, **kwargs)
+            # Streamed responses (the audit) may query while they're consumed.
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        self.assertLess(response.status_code, 300, '{}: {}'.format(endpoint.name, content))
+        return [fingerprint(query['sql']) for query in queries.captured_queries]
+
+    def check_budget(self, name, queries):
+        budget = self.budgets.get(name)
+        if os.environ.get(UPDATE_ENV):
+            if budget is None or budget['fingerprints'] != queries:
+                self.budgets[name] = {'queries': len(queries), 'fingerprints': queries}
+                self.__class__.budgets_changed = True
+        elif budget is None:
+            self.skipTest('{} has no recorded budget; run with {}=1 to record it:\n{}'.format(
+                name, UPDATE_ENV, '\n'.join(queries)
+            ))
+        elif len(queries) > budget['queries']:
+            self.fail('{} ran {} queries, budget is {}:\n{}'.format(
+                name, len(queries), budget['queries'], '\n'.join(queries)
+            ))
+        elif queries != budget['fingerprints']:
+            self.fail('{} queries changed; run with {}=1 to record them:\n{}'.format(
+                name, UPDATE_ENV, '\n'.join(difflib.unified_diff(budget['fingerprints'], queries, lineterm=''))
+            ))
+
+    def test_query_budgets(self):
+        fixture = Fixture()
+        fixture.grow(self.size)
+        small = {endpoint.name: self.measure(endpoint, fixture) for endpoint in self.endpoints}
+        fixture.grow(self.size * 9)
+        large = {endpoint.name: self.measure(endpoint, fixture) for endpoint in self.endpoints}
+        for endpoint in self.endpoints:
+            with self.subTest(endpoint=endpoint.name):
+                self.assertEquals(
+                    len(small[endpoint.name]), len(large[endpoint.name]),
+                    '{} queries grow with the number of rows:\n{}'.format(endpoint.name, '\n'.join(large[endpoint.name]))
+                )
+                self.check_budget(endpoint.name, large[endpoint.name])
@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from mountaineer.hardware.models import *
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        self.datacenter = Datacenter.objects.create(name='dc', vendor='foo', address='foo')
+        self.cabinet = Cabinet.objects.create(name='cab', datacenter=self.datacenter, rack_units=48, posts=4)
+        self.sw = NetworkDevice.objects.create(manufacturer='juniper', model='srx', serial='sw', ports=48, speed=1000, interconnect=1)
+        self.servers = 0
+
+    def add_servers(self, count):
+        for _ in range(count):
+            self.servers += 1
+            server = Server.objects.create(manufacturer='dell', model='foo', serial=self.servers)
+            CabinetAssignment.objects.create(cabinet=self.cabinet, device=server.device, position=self.servers)
+            PortAssignment.objects.create(device=self.sw.device, device_port=self.servers, connected_device=server.device)
+
+    def changelist_queries(self, model_name):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:hardware_{}_changelist'.format(model_name)))
+        self.assertEquals(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, model_name):
+        self.add_servers(2)
+        small = self.changelist_queries(model_name)
+        self.add_servers(10)
+        self.assertEquals(self.changelist_queries(model_name), small)
+
+    def test_admin_portassignment_changelist(self):
+        self.assertConstantQueries('portassignment')
+
+    def test_admin_cabinetassignment_changelist(self):
+        self.assertConstantQueries('cabinetassignment')
+
+    def test_admin_server_changelist(self):
+        self.assertConstantQueries('server')
+
+    def test_admin_server_search(self):
+        self.add_servers(3)
+        response = self.client.get(reverse('admin:hardware_server_changelist'), {'q': '2'})
+        self.assertEquals(response.context['cl'].result_count, 1)
+
+    def test_admin_cabinetassignment_search(self):
+        self.add_servers(3)
+        slug = CabinetAssignment.objects.order_by('position')[0].slug
+        url = reverse('admin:hardware_cabinetassignment_changelist')
+        self.assertEquals(self.client.get(url, {'q': slug}).context['cl'].result_count, 1)
+        self.assertEquals(self.client.get(url, {'q': slug[:-1]}).context['cl'].result_count, 0)
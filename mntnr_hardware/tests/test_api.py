@@ -1,10 +1,22 @@
+import gzip
 import json
 from urllib import parse
 
 from django.test import TestCase
 from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
 
-from mountaineer.hardware.models import Cabinet, CabinetAssignment, Datacenter, Server, PowerDistributionUnit
+from mountaineer.hardware import RackDepth
+from mountaineer.hardware.api import fastpath
+from mountaineer.hardware.api.serializers import (
+    CabinetAssignmentSerializer, CabinetSerializer, DatacenterSerializer, NetworkDeviceSerializer, PduSerializer,
+    PortAssignmentSerializer, ServerSerializer
+)
+from mountaineer.hardware.models import (
+    Cabinet, CabinetAssignment, Datacenter, NetworkDevice, PortAssignment, PowerDistributionUnit, Server
+)
 
 
 class DatacenterApiTests(TestCase):
@@ -63,6 +75,10 @@ class DatacenterApiTests(TestCase):
         data = response.json()
         self.assertEquals(data['noc_phone'], '+14155551212')
 
+    def test_api_datacenter_slug_default(self):
+        field = DatacenterSerializer().fields['slug']
+        self.assertNotEquals(field.get_default(), field.get_default())
+
 
 class CabinetApiTests(TestCase):
     def setUp(self):
@@ -182,6 +198,17 @@ class CabinetAssignmentApiTests(TestCase):
         self.assertEquals(data['orientation'], 'Front-facing')
         self.assertEquals(data['position'], self.assignment_attributes['position'])
 
+    def test_api_cabinetassignment_list_urls(self):
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.server2.device, position=20)
+        response = self.client.get(self.create_read_url)
+        paths = sorted((parse.urlparse(item['device']).path, parse.urlparse(item['url']).path) for item in response.json())
+        expected = sorted(
+            (reverse('api_v1:hardware:server-detail', kwargs={'slug': assign.device.instance.slug}),
+             reverse('api_v1:hardware:cabinetassignment-detail', kwargs={'slug': assign.slug}))
+            for assign in CabinetAssignment.objects.all()
+        )
+        self.assertEquals(paths, expected)
+
     def test_api_cabinetassignment_create(self):
         create_attrs = {
             'cabinet': self.cabinet_url, 'device_id': self.server2.device.id,
@@ -197,6 +224,29 @@ class CabinetAssignmentApiTests(TestCase):
         self.assertEquals(data['depth'], 'Half depth')
         self.assertEquals(data['orientation'], 'Rear-facing')
 
+    def test_api_cabinetassignment_create_unplaced(self):
+        response = self.client.post(self.create_read_url, {'cabinet': self.cabinet_url, 'device_id': self.server2.device.id})
+        self.assertEquals(response.status_code, 201)
+        self.assertIsNone(response.json()['position'])
+
+    def test_api_cabinetassignment_create_occupied(self):
+        response = self.client.post(self.create_read_url, {
+            'cabinet': self.cabinet_url, 'device_id': self.server2.device.id, 'position': 13
+        })
+        self.assertEquals(response.status_code, 400)
+        self.assertIn('position', response.json())
+
+    def test_api_cabinetassignment_enum_inputs(self):
+        field = CabinetAssignmentSerializer().fields['depth']
+        for depth in (RackDepth.HALF, 2, '2', 'HALF', 'Half depth'):
+            self.assertIs(field.to_internal_value(depth), RackDepth.HALF)
+        self.assertEquals(field.to_representation(RackDepth.HALF), 'Half depth')
+        response = self.client.post(self.create_read_url, {
+            'cabinet': self.cabinet_url, 'device_id': self.server2.device.id, 'position': 41, 'depth': 'sideways'
+        })
+        self.assertEquals(response.status_code, 400)
+        self.assertIn('depth', response.json())
+
     def test_api_cabinetassignment_list(self):
         response = self.client.get(self.create_read_url)
         self.assertEquals(response.status_code, 200)
@@ -365,3 +415,144 @@ class PduApiTests(TestCase):
         data = response.json()
         self.assertEquals(response.status_code, 200)
         self.assertEquals(data['ports'], 12)
+
+
+class RendererApiTests(TestCase):
+    def setUp(self):
+        self.datacenter = Datacenter.objects.create(name='dc1', vendor='foo', address='123 fake st')
+        self.cabinet = Cabinet.objects.create(
+            name='cab1', datacenter=self.datacenter, rack_units=42, posts=4, attachment=1, fasteners=5
+        )
+        self.server = Server.objects.create(manufacturer='Dell', model='123', serial='456')
+        self.assignment = CabinetAssignment.objects.create(
+            cabinet=self.cabinet, device=self.server.device, position=13, depth=4, orientation=1
+        )
+
+    def test_api_ndjson_gzip(self):
+        Datacenter.objects.create(name='dc2', vendor='bar', address='321 fake st')
+        response = self.client.get(
+            reverse('api_v1:hardware:datacenter-list'), {'format': 'ndjson'}, HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(response.content).decode('utf-8').splitlines()
+        names = [json.loads(line)['name'] for line in lines]
+        self.assertEquals(sorted(names), ['dc1', 'dc2'])
+
+    def test_api_ndjson_uncompressed(self):
+        response = self.client.get(reverse('api_v1:hardware:datacenter-list'), HTTP_ACCEPT='application/x-ndjson')
+        self.assertEquals(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEquals(json.loads(response.content.decode('utf-8'))['name'], 'dc1')
+
+    def test_api_compact_cabinet(self):
+        url = reverse('api_v1:hardware:cabinet-detail', kwargs={'slug': self.cabinet.slug})
+        data = self.client.get(url, {'compact': '1'}).json()
+        self.assertEquals(data['url'], self.cabinet.slug)
+        self.assertEquals(data['datacenter'], self.datacenter.slug)
+        self.assertEquals(data['attachment'], 1)
+        self.assertEquals(data['fasteners'], 5)
+
+    def test_api_compact_cabinetassignment(self):
+        url = reverse('api_v1:hardware:cabinetassignment-detail', kwargs={'slug': self.assignment.slug})
+        data = self.client.get(url, {'compact': 'true'}).json()
+        self.assertEquals(data['device'], str(self.server.device.id))
+        self.assertEquals(data['cabinet'], self.cabinet.slug)
+        self.assertEquals(data['depth'], 4)
+        self.assertEquals(data['orientation'], 1)
+
+
+class FastListTests(TestCase):
+    def setUp(self):
+        self.datacenter = Datacenter.objects.create(name='dc1', vendor='foo', address='123 fake st')
+        self.cabinet = Cabinet.objects.create(name='cab1', datacenter=self.datacenter, rack_units=42, posts=4)
+        self.pdu = PowerDistributionUnit.objects.create(
+            manufacturer='apc', model='cpa', serial='142', ports=24, volts=208, amps=30, draw=20
+        )
+        self.switch = NetworkDevice.objects.create(
+            manufacturer='juniper', model='ex', serial='3523', ports=48, speed=10000, interconnect=2, rack_units=1
+        )
+        self.servers = [
+            Server.objects.create(manufacturer='dell', model='r640', serial='s{}'.format(i), memory=1024, cores=i)
+            for i in range(1, 4)
+        ]
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.pdu.device, position=1, depth=4)
+        CabinetAssignment.objects.create(
+            cabinet=self.cabinet, device=self.switch.device, position=42, depth=2, orientation=2
+        )
+        for position, server in enumerate(self.servers, start=10):
+            CabinetAssignment.objects.create(cabinet=self.cabinet, device=server.device, position=position)
+            PortAssignment.objects.create(device=self.pdu.device, device_port=position, connected_device=server.device)
+            PortAssignment.objects.create(device=self.switch.device, device_port=position, connected_device=server.device)
+        self.request = Request(APIRequestFactory().get('/'))
+
+    def assertFastListIdentical(self, serializer_class):
+        context = {'request': self.request, 'format': None, 'view': None}
+        queryset = serializer_class.Meta.model.objects.order_by('slug')
+        expected = JSONRenderer().render(serializer_class(queryset, many=True, context=context).data)
+        reader = fastpath.FastListSerializer(serializer_class(context=context))
+        self.assertEquals(JSONRenderer().render(reader.serialize(queryset)), expected)
+
+    def test_fastpath_datacenters(self):
+        self.assertFastListIdentical(DatacenterSerializer)
+
+    def test_fastpath_servers(self):
+        self.assertFastListIdentical(ServerSerializer)
+
+    def test_fastpath_pdus(self):
+        self.assertFastListIdentical(PduSerializer)
+
+    def test_fastpath_network_devices(self):
+        self.assertFastListIdentical(NetworkDeviceSerializer)
+
+    def test_fastpath_cabinet_assignments(self):
+        self.assertFastListIdentical(CabinetAssignmentSerializer)
+
+    def test_fastpath_port_assignments(self):
+        self.assertFastListIdentical(PortAssignmentSerializer)
+
+    def test_fastpath_unsupported(self):
+        with self.assertRaises(fastpath.Unsupported):
+            fastpath.FastListSerializer(CabinetSerializer(context={'request': self.request}))
+
+    def test_fastpath_list_endpoint(self):
+        response = self.client.get(reverse('api_v1:hardware:portassignment-list'))
+        self.assertEquals(response.status_code, 200)
+        rows = {item['slug']: item for item in response.json()}
+        self.assertEquals(len(rows), 6)
+        for assign in PortAssignment.objects.all():
+            self.assertEquals(rows[assign.slug]['connected_device_name'], assign.connected_device.instance.__str__())
+            self.assertEquals(rows[assign.slug]['device_name'], assign.device.instance.__str__())
+
+
+class CabinetPowerApiTests(TestCase):
+    def setUp(self):
+        self.datacenter = Datacenter.objects.create(name='dc1', vendor='foo', address='123 fake st')
+        self.cabinets = [
+            Cabinet.objects.create(name='cab{}'.format(i), datacenter=self.datacenter, rack_units=42, posts=4)
+            for i in range(3)
+        ]
+        for i, cabinet in enumerate(self.cabinets):
+            pdu = PowerDistributionUnit.objects.create(
+                manufacturer='apc', model='cpa', serial='p{}'.format(i), ports=24, volts=208, amps=30, draw=10
+            )
+            server = Server.objects.create(manufacturer='dell', model='foo', serial='s{}'.format(i), draw=100 * i)
+            CabinetAssignment.objects.create(cabinet=cabinet, device=pdu.device, position=1)
+            CabinetAssignment.objects.create(cabinet=cabinet, device=server.device, position=2)
+        self.empty = Cabinet.objects.create(name='empty', datacenter=self.datacenter, rack_units=42, posts=4)
+
+    def test_api_cabinet_power_batch(self):
+        slugs = [cabinet.slug for cabinet in self.cabinets[1:]] + [self.empty.slug, 'missing']
+        response = self.client.post(
+            reverse('api_v1:hardware:cabinet-power'), json.dumps({'slugs': slugs}), content_type='application/json'
+        )
+        self.assertEquals(response.status_code, 200)
+        data = response.json()
+        self.assertEquals(sorted(data), sorted(slugs[:3]))
+        self.assertEquals(data[self.cabinets[2].slug], {'power': 6240, 'power_allocated': 210, 'power_unallocated': 6030})
+        self.assertEquals(data[self.empty.slug], {'power': 0, 'power_allocated': 0, 'power_unallocated': 0})
+
+    def test_api_cabinet_list_power(self):
+        data = {item['name']: item for item in self.client.get(reverse('api_v1:hardware:cabinet-list')).json()}
+        self.assertEquals(data['cab1']['power_allocated'], 110)
+        self.assertEquals(data['cab1']['power_unallocated'], 6240 - 110)
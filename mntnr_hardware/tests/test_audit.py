@@ -0,0 +1,85 @@
+import csv
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+
+from mountaineer.hardware import audit
+from mountaineer.hardware.models import *
+
+
+SCAN = '''kind,cabinet,position,serial,port,connected_serial
+device,cab1,1,p1,,
+device,cab2,5,s1,,
+device,cab1,9,x1,,
+cable,,,p1,1,s2
+cable,,,sw1,7,s1
+'''
+
+
+class AuditTests(TestCase):
+    def setUp(self):
+        self.datacenter = Datacenter.objects.create(name='dc1', vendor='foo', address='123 fake st')
+        self.cabinet = Cabinet.objects.create(name='cab1', datacenter=self.datacenter, rack_units=42, posts=4)
+        self.cabinet2 = Cabinet.objects.create(name='cab2', datacenter=self.datacenter, rack_units=42, posts=4)
+        self.pdu = PowerDistributionUnit.objects.create(manufacturer='apc', model='cpa', serial='p1', ports=24, volts=208, amps=30)
+        self.sw = NetworkDevice.objects.create(manufacturer='juniper', model='srx', serial='sw1', ports=24, speed=1000, interconnect=1)
+        self.server = Server.objects.create(manufacturer='dell', model='foo', serial='s1')
+        self.server2 = Server.objects.create(manufacturer='dell', model='foo', serial='s2')
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.pdu.device, position=1)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.server.device, position=5)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.server2.device, position=7)
+        PortAssignment.objects.create(device=self.pdu.device, device_port=1, connected_device=self.server.device)
+        PortAssignment.objects.create(device=self.sw.device, device_port=7, connected_device=self.server.device)
+
+    def test_audit_snapshot(self):
+        with self.assertNumQueries(2):
+            snapshot = audit.take_snapshot(self.datacenter)
+        self.assertEquals(snapshot.devices, [
+            ('cab1', 1, 'p1', self.pdu.device_id),
+            ('cab1', 5, 's1', self.server.device_id),
+            ('cab1', 7, 's2', self.server2.device_id),
+        ])
+        self.assertEquals(snapshot.cables, [('p1', 1, 's1'), ('sw1', 7, 's1')])
+
+    def test_audit_diff(self):
+        scan = audit.read_scan(SCAN.splitlines())
+        results = [(row['status'], row['serial']) for row in audit.diff(audit.take_snapshot(self.datacenter), scan)]
+        self.assertEquals(results, [('moved', 's1'), ('missing', 's2'), ('unknown', 'x1'), ('mispatched', 'p1')])
+
+    def test_audit_read_scan_invalid(self):
+        with self.assertRaises(ValueError):
+            audit.read_scan(['kind,cabinet,position,serial', 'device,cab1,top,s1'])
+        with self.assertRaises(ValueError):
+            audit.read_scan(['cabinet,position', 'cab1,1'])
+
+    def test_audit_api(self):
+        url = reverse('api_v1:hardware:datacenter-audit', kwargs={'slug': self.datacenter.slug})
+        response = self.client.post(url, json.dumps({'scan': SCAN}), content_type='application/json')
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEquals(rows[0], {
+            'status': 'moved', 'serial': 's1', 'device': str(self.server.device_id),
+            'expected': {'cabinet': 'cab1', 'position': 5}, 'found': {'cabinet': 'cab2', 'position': 5},
+        })
+        self.assertEquals(rows[-1], {'status': 'mispatched', 'serial': 'p1', 'port': 1, 'expected': 's1', 'found': 's2'})
+
+    def test_audit_api_invalid(self):
+        url = reverse('api_v1:hardware:datacenter-audit', kwargs={'slug': self.datacenter.slug})
+        response = self.client.post(url, json.dumps({}), content_type='application/json')
+        self.assertEquals(response.status_code, 400)
+
+    def test_audit_api_scan_not_csv(self):
+        url = reverse('api_v1:hardware:datacenter-audit', kwargs={'slug': self.datacenter.slug})
+        for scan in (42, ['kind,serial'], {'kind': 'device'}):
+            response = self.client.post(url, json.dumps({'scan': scan}), content_type='application/json')
+            self.assertEquals(response.status_code, 400, scan)
+            self.assertIn('scan', response.json())
+
+    def test_audit_api_malformed_csv(self):
+        url = reverse('api_v1:hardware:datacenter-audit', kwargs={'slug': self.datacenter.slug})
+        scan = 'kind,serial\ndevice,' + 'x' * (csv.field_size_limit() + 1)
+        response = self.client.post(url, json.dumps({'scan': scan}), content_type='application/json')
+        self.assertEquals(response.status_code, 400)
+        self.assertIn('field limit', response.json()['scan'][0])
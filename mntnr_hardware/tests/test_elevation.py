@@ -0,0 +1,74 @@
+from urllib import parse
+
+from django.test import TestCase
+from django.urls import reverse
+
+from mountaineer.hardware import RackOrientation
+from mountaineer.hardware.elevation import build_elevations
+from mountaineer.hardware.models import *
+
+
+class ElevationTests(TestCase):
+    def setUp(self):
+        self.datacenter = Datacenter.objects.create(name='dc1', vendor='foo', address='123 fake st')
+        self.cabinet = Cabinet.objects.create(name='cab1', datacenter=self.datacenter, rack_units=10, posts=4)
+        self.cabinet2 = Cabinet.objects.create(name='cab2', datacenter=self.datacenter, rack_units=10, posts=4)
+        self.pdu = PowerDistributionUnit.objects.create(manufacturer='apc', model='cpa', serial='142', ports=24, volts=208, amps=30)
+        self.sw = NetworkDevice.objects.create(manufacturer='juniper', model='srx', serial='3523', ports=24, speed=1000, interconnect=1, rack_units=1)
+        self.server = Server.objects.create(manufacturer='dell', model='foo', serial='1233', draw=350, rack_units=2)
+        self.server2 = Server.objects.create(manufacturer='dell', model='foo', serial='1234', draw=350, rack_units=2)
+        self.server3 = Server.objects.create(manufacturer='dell', model='foo', serial='1235', draw=350)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.pdu.device)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.sw.device, position=10)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.server.device, position=3, orientation=1)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.server2.device, position=4)
+        CabinetAssignment.objects.create(cabinet=self.cabinet2, device=self.server3.device, position=1)
+        PortAssignment.objects.create(device=self.pdu.device, device_port=1, connected_device=self.server.device)
+        PortAssignment.objects.create(device=self.sw.device, device_port=7, connected_device=self.server.device)
+
+    def test_elevation_layout(self):
+        elevation = build_elevations([self.cabinet])[self.cabinet.pk]
+        occupants = [device.instance if device else None for device in elevation.units]
+        self.assertEquals(occupants, [None, None, self.server, self.server, None, None, None, None, None, self.sw])
+        self.assertEquals([device.instance for device in elevation.unplaced], [self.pdu])
+        self.assertEquals([device.instance for device in elevation.conflicts], [self.server2])
+
+    def test_elevation_negative_height(self):
+        server = Server.objects.create(manufacturer='dell', model='foo', serial='1236', draw=350, rack_units=-2)
+        CabinetAssignment.objects.create(cabinet=self.cabinet2, device=server.device, position=5)
+        elevation = build_elevations([self.cabinet2])[self.cabinet2.pk]
+        self.assertEquals([device.instance for device in elevation.conflicts], [server])
+        self.assertEquals([device.instance for device in elevation.units if device], [self.server3])
+
+    def test_elevation_connections(self):
+        elevation = build_elevations([self.cabinet])[self.cabinet.pk]
+        server = elevation.units[2]
+        self.assertEquals(server.orientation, RackOrientation.FRONT)
+        self.assertEquals(server.pdus, [(self.pdu, 1)])
+        self.assertEquals(server.uplinks, [(self.sw, 7)])
+
+    def test_elevation_queries(self):
+        with self.assertNumQueries(5):
+            elevations = build_elevations([self.cabinet, self.cabinet2])
+        self.assertEquals(len(elevations[self.cabinet2.pk].devices), 1)
+
+    def test_api_elevation(self):
+        url = reverse('api_v1:hardware:cabinet-elevation', kwargs={'slug': self.cabinet.slug})
+        response = self.client.get(url)
+        self.assertEquals(response.status_code, 200)
+        data = response.json()
+        self.assertEquals(data['slug'], self.cabinet.slug)
+        self.assertEquals(len(data['units']), 10)
+        self.assertEquals(data['units'][2]['device_id'], str(self.server.device.id))
+        server = [device for device in data['devices'] if device['device_id'] == str(self.server.device.id)][0]
+        self.assertEquals(server['type'], 'server')
+        self.assertEquals(server['orientation'], 'Front-facing')
+        self.assertEquals(parse.urlparse(server['url']).path,
+                          reverse('api_v1:hardware:server-detail', kwargs={'slug': self.server.slug}))
+        self.assertEquals([uplink['port'] for uplink in server['uplinks']], [7])
+
+    def test_api_elevations(self):
+        url = reverse('api_v1:hardware:cabinet-elevations')
+        response = self.client.get(url, {'slugs': '{},{}'.format(self.cabinet2.slug, self.cabinet.slug)})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals([item['slug'] for item in response.json()], [self.cabinet2.slug, self.cabinet.slug])
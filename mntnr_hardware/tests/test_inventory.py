@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.test import TestCase
+
+from mountaineer.hardware.inventory import Inventory
+from mountaineer.hardware.models import *
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        self.datacenter = Datacenter.objects.create(name='dc1', vendor='foo', address='123 fake st')
+        self.cabinet = Cabinet.objects.create(name='cab1', datacenter=self.datacenter, rack_units=42, posts=4)
+        self.cabinet2 = Cabinet.objects.create(name='cab2', datacenter=self.datacenter, rack_units=42, posts=4)
+        self.pdu = PowerDistributionUnit.objects.create(manufacturer='apc', model='cpa', serial='142', ports=24, volts=208, amps=30)
+        self.server = Server.objects.create(manufacturer='dell', model='foo', serial='1233', draw=350)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.pdu.device)
+        self.assignment = CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.server.device, position=3)
+        self.inventory = Inventory()
+        self.inventory.refresh()
+
+    def test_inventory_lookups(self):
+        with self.assertNumQueries(0):
+            server = self.inventory.device_by_serial('1233')
+            contents = self.inventory.cabinet_contents(self.cabinet.slug)
+            tree = self.inventory.datacenter_tree(self.datacenter.slug)
+        self.assertEquals((server.slug, server.kind, server.device_id), (self.server.slug, 'server', self.server.device_id))
+        self.assertIsNone(self.inventory.device_by_serial('1233', manufacturer='hp'))
+        self.assertEquals([(position, device.slug) for position, device in contents], [(3, self.server.slug), (None, self.pdu.slug)])
+        self.assertEquals([cabinet['name'] for cabinet in tree['cabinets']], ['cab1', 'cab2'])
+        self.assertEquals(tree['cabinets'][0]['devices'][0]['serial'], '1233')
+        self.assertIsNone(self.inventory.datacenter_tree('missing'))
+
+    def test_inventory_refresh_changes(self):
+        self.assignment.cabinet = self.cabinet2
+        self.assignment.save()
+        self.server.serial = '9999'
+        self.server.save()
+        other = Server.objects.create(manufacturer='dell', model='foo', serial='1234')
+        self.inventory.refresh()
+        self.assertEquals([device.slug for _, device in self.inventory.cabinet_contents(self.cabinet2.slug)], [self.server.slug])
+        self.assertEquals([device.slug for _, device in self.inventory.cabinet_contents(self.cabinet.slug)], [self.pdu.slug])
+        self.assertIsNone(self.inventory.device_by_serial('1233'))
+        self.assertEquals(self.inventory.device_by_serial('9999').slug, self.server.slug)
+        self.assertEquals(self.inventory.device_by_serial('1234').slug, other.slug)
+
+    def test_inventory_refresh_overlap(self):
+        # Saved "before" the last refresh by the writer's clock, but not yet visible to it.
+        Server.objects.filter(pk=self.server.pk).update(serial='5555', modified=self.inventory.loaded_at - timedelta(minutes=1))
+        self.inventory.refresh()
+        self.assertEquals(self.inventory.device_by_serial('5555').slug, self.server.slug)
+
+    def test_inventory_refresh_deletions(self):
+        self.pdu.delete()
+        self.cabinet2.delete()
+        self.inventory.refresh()
+        self.assertIsNotNone(self.inventory.device_by_serial('142'))
+        self.inventory.refresh(sweep=True)
+        self.assertIsNone(self.inventory.device_by_serial('142'))
+        self.assertIsNone(self.inventory.cabinet_contents(self.cabinet2.slug))
+        self.assertEquals([device.slug for _, device in self.inventory.cabinet_contents(self.cabinet.slug)], [self.server.slug])
@@ -0,0 +1,100 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from mountaineer.hardware import metrics
+from mountaineer.hardware.models import *
+
+
+class DerivedMetricTests(TestCase):
+    def setUp(self):
+        self.datacenter = Datacenter.objects.create(name='dc', vendor='foo', address='foo')
+        self.cabinet = Cabinet.objects.create(name='cab', datacenter=self.datacenter, rack_units=42, posts=4)
+        self.pdu = PowerDistributionUnit.objects.create(manufacturer='apc', model='cpa', serial='142', ports=24, volts=208, amps=30, rack_units=1)
+        self.server = Server.objects.create(manufacturer='dell', model='foo', serial='1233', draw=350, rack_units=2)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.pdu.device, position=1)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.server.device, position=2)
+        PortAssignment.objects.create(device=self.pdu.device, device_port=3, connected_device=self.server.device)
+
+    def drain(self):
+        while metrics.process_batch():
+            pass
+
+    def test_metrics_marked_dirty(self):
+        dirty = set(DirtyObject.objects.values_list('kind', 'key'))
+        self.assertIn(('cabinet', str(self.cabinet.pk)), dirty)
+        self.assertIn(('device', str(self.pdu.device_id)), dirty)
+        self.assertIn(('device', str(self.server.device_id)), dirty)
+
+    def test_metrics_recompute(self):
+        self.drain()
+        self.assertEquals(DirtyObject.objects.count(), 0)
+        cabinet = DerivedMetric.objects.get(kind='cabinet', key=str(self.cabinet.pk)).metrics
+        self.assertEquals(cabinet['power'], 6240)
+        self.assertEquals(cabinet['power_unallocated'], 6240 - 350)
+        self.assertEquals(cabinet['rack_units_used'], 3)
+        self.assertEquals(cabinet['devices'], 2)
+        pdu = DerivedMetric.objects.get(kind='device', key=str(self.pdu.device_id)).metrics
+        self.assertEquals(pdu['ports_used'], 1)
+        self.assertEquals(pdu['ports_free'], 23)
+        datacenter = DerivedMetric.objects.get(kind='datacenter', key=str(self.datacenter.pk)).metrics
+        self.assertEquals(datacenter['power'], 6240)
+
+    def test_metrics_fresh(self):
+        self.drain()
+        self.assertIn(str(self.cabinet.pk), DerivedMetric.objects.fresh('cabinet', [self.cabinet.pk]))
+        self.server.draw = 400
+        self.server.save()
+        self.assertEquals(DerivedMetric.objects.fresh('cabinet', [self.cabinet.pk]), {})
+        data = {item['name']: item for item in self.client.get(reverse('api_v1:hardware:cabinet-list')).json()}
+        self.assertEquals(data['cab']['power_allocated'], 400)
+
+    def test_metrics_moves_mark_previous(self):
+        other = Datacenter.objects.create(name='dc2', vendor='foo', address='foo')
+        cabinet2 = Cabinet.objects.create(name='cab2', datacenter=other, rack_units=42, posts=4)
+        self.drain()
+        assignment = CabinetAssignment.objects.get(device=self.server.device)
+        assignment.cabinet = cabinet2
+        assignment.save()
+        self.assertEquals(DerivedMetric.objects.fresh('cabinet', [self.cabinet.pk, cabinet2.pk]), {})
+        self.drain()
+        self.cabinet.datacenter = other
+        self.cabinet.save()
+        self.assertEquals(DerivedMetric.objects.fresh('datacenter', [self.datacenter.pk, other.pk]), {})
+
+    def test_metrics_moves_without_reading_previous(self):
+        cabinet2 = Cabinet.objects.create(name='cab2', datacenter=self.datacenter, rack_units=42, posts=4)
+        self.drain()
+        assignment = CabinetAssignment.objects.get(device=self.server.device)
+        assignment.cabinet = cabinet2
+        with CaptureQueriesContext(connection) as queries:
+            assignment.save()
+        self.assertFalse([query for query in queries.captured_queries
+                          if query['sql'].startswith('SELECT') and CabinetAssignment._meta.db_table in query['sql']])
+        self.assertEquals(DerivedMetric.objects.fresh('cabinet', [self.cabinet.pk, cabinet2.pk]), {})
+
+    def test_metrics_mark_dirty_again(self):
+        metrics.mark_dirty('cabinet', [self.cabinet.pk])
+        marked = DirtyObject.objects.get(kind='cabinet', key=str(self.cabinet.pk)).marked
+        metrics.mark_dirty('cabinet', [self.cabinet.pk, self.cabinet.pk + 1])
+        self.assertGreaterEqual(DirtyObject.objects.get(kind='cabinet', key=str(self.cabinet.pk)).marked, marked)
+        self.assertEquals(DirtyObject.objects.filter(kind='cabinet').count(), 2)
+
+    def test_metrics_cabinet_detail(self):
+        self.drain()
+        metric = DerivedMetric.objects.get(kind='cabinet', key=str(self.cabinet.pk))
+        metric.data = json.dumps(dict(metric.metrics, power_allocated=1))
+        metric.save()
+        url = reverse('api_v1:hardware:cabinet-detail', kwargs={'slug': self.cabinet.slug})
+        self.assertEquals(self.client.get(url).json()['power_allocated'], 1)
+        self.server.save()
+        self.assertEquals(self.client.get(url).json()['power_allocated'], 350)
+
+    def test_metrics_api(self):
+        self.drain()
+        response = self.client.get(reverse('api_v1:hardware:derivedmetric-list'), {'kind': 'cabinet'})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json()[0]['metrics']['devices'], 2)
@@ -2,6 +2,9 @@ from django.db import transaction
 from django.db.utils import IntegrityError
 from django.test import TestCase
 
+from mountaineer.hardware import identity
+from mountaineer.hardware.identity import identity_map
+from mountaineer.hardware.middleware import IdentityMapMiddleware
 from mountaineer.hardware.models import *
 
 
@@ -26,12 +29,25 @@ class CabinetTests(TestCase):
     def test_models_cabinet_power_available(self):
         self.assertEquals(self.cabinet.power_unallocated, 12480 - 350)
 
+    def test_models_cabinet_compute_power(self):
+        empty = Cabinet.objects.create(name='cab2', datacenter=self.datacenter, rack_units=48, posts=4)
+        with self.assertNumQueries(1):
+            power = Cabinet.objects.compute_power([self.cabinet.pk, empty.pk])
+        self.assertEquals(power[self.cabinet.pk], {'power': 12480, 'power_allocated': 350, 'power_unallocated': 12130})
+        self.assertEquals(power[empty.pk], {'power': 0, 'power_allocated': 0, 'power_unallocated': 0})
+
     def test_models_cabinet_devices(self):
         self.assertIn((self.pdu1, 1), self.cabinet.devices)
         self.assertIn((self.pdu2, 3), self.cabinet.devices)
         self.assertIn((self.server, 5), self.cabinet.devices)
         self.assertNotIn(self.pdu3, [device[0] for device in self.cabinet.devices])
 
+    def test_models_cabinet_unique_position(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.pdu3.device, position=3)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.pdu3.device, position=None)
+
 
 class DeviceTests(TestCase):
     def setUp(self):
@@ -48,6 +64,27 @@ class DeviceTests(TestCase):
         self.assertEquals(self.sw.device.type, NetworkDevice)
         self.assertEquals(self.sw.device.instance, self.sw)
 
+    def test_models_device_kind(self):
+        self.assertEquals(self.server.device.kind, 'server')
+        self.assertEquals(self.pdu.device.kind, 'powerdistributionunit')
+        self.assertEquals(self.sw.device.kind, 'networkdevice')
+        device = Device.objects.get(pk=self.sw.device.pk)
+        with self.assertNumQueries(0):
+            self.assertEquals(device.type, NetworkDevice)
+
+    def test_models_device_instances(self):
+        ids = [self.server.device.id, self.pdu.device.id, self.sw.device.id]
+        with self.assertNumQueries(3):
+            instances = Device.objects.instances(ids)
+        self.assertEquals(instances, {self.server.device.id: self.server, self.pdu.device.id: self.pdu,
+                                      self.sw.device.id: self.sw})
+
+    def test_models_device_without_kind(self):
+        Device.objects.filter(pk=self.server.device.pk).update(kind='')
+        device = Device.objects.get(pk=self.server.device.pk)
+        self.assertEquals(device.type, Server)
+        self.assertEquals(device.instance, self.server)
+
 
 class ServerTests(TestCase):
     def setUp(self):
@@ -84,12 +121,39 @@ class ServerTests(TestCase):
         Server.objects.create(manufacturer='dell', model='foo', serial='1234')
 
     def test_models_server_delete(self):
-        device = self.server.device
-        self.server.delete()
+        device, pk = self.server.device, self.server.pk
+        deleted, per_model = self.server.delete()
+        self.assertEquals(deleted, sum(per_model.values()))
+        self.assertEquals(per_model['hardware.Server'], 1)
+        self.assertEquals(per_model['hardware.Device'], 1)
         self.assertNotIn(device, Device.objects.all())
         self.assertEquals(0, len(CabinetAssignment.objects.filter(device=device)))
         self.assertEquals(0, len(PortAssignment.objects.filter(connected_device=device)))
         self.assertEquals(0, len(PortAssignment.objects.filter(device=device)))
+        self.assertFalse(Server.objects.filter(pk=pk).exists())
+        self.assertIsNone(self.server.pk)
+
+    def test_models_server_save_failed(self):
+        devices = Device.objects.count()
+        with self.assertRaises(IntegrityError):
+            Server.objects.create(manufacturer='dell', model='foo', serial='1233')
+        self.assertEquals(devices, Device.objects.count())
+
+    def test_models_device_decommission(self):
+        devices = [self.pdu, self.sw.device, self.server.device_id]
+        self.assertEquals(3, Device.objects.decommission(devices)[1]['hardware.Device'])
+        self.assertEquals(0, Device.objects.count())
+        self.assertEquals(0, PortAssignment.objects.count())
+        self.assertEquals(0, CabinetAssignment.objects.count())
+        self.assertEquals(0, PowerDistributionUnit.objects.count() + NetworkDevice.objects.count() + Server.objects.count())
+        self.assertTrue(DirtyObject.objects.filter(kind='cabinet', key=str(self.cabinet.pk)).exists())
+
+    def test_models_device_decommission_peers(self):
+        self.assertEquals(1, Device.objects.decommission([self.pdu])[1]['hardware.Device'])
+        self.assertEquals(1, PortAssignment.objects.count())
+        self.assertEquals([], Server.objects.get().pdus)
+        self.assertEquals([(self.sw, 5)], Server.objects.get().uplinks)
+        self.assertTrue(DirtyObject.objects.filter(kind='device', key=str(self.server.device_id)).exists())
 
 
 class PduTests(TestCase):
@@ -114,6 +178,11 @@ class PduTests(TestCase):
         self.assertNotIn(25, self.pdu.ports_available)
         self.assertNotIn(0, self.pdu.ports_available)
 
+    def test_models_pdu_unique_together(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                PowerDistributionUnit.objects.create(manufacturer='apc', model='cpa', serial=142, ports=24, volts=208, amps=30)
+
     def test_models_pdu_watts(self):
         self.assertEquals(6240, self.pdu.watts)
 
@@ -126,9 +195,50 @@ class TestPortAssignment(TestCase):
         PortAssignment.objects.create(device=self.pdu.device, device_port=6, connected_device=self.server.device)
 
     def test_models_portassignment_save_used_port(self):
-        with self.assertRaises(IntegrityError):
+        with self.assertRaises(RuntimeError):
             PortAssignment.objects.create(device=self.pdu.device, device_port=6, connected_device=self.server2.device)
 
+    def test_models_portassignment_resave(self):
+        assignment = PortAssignment.objects.get(device=self.pdu.device, device_port=6)
+        assignment.connected_device = self.server2.device
+        assignment.save()
+
     def test_models_portassignment_save_outofrange_port(self):
         with self.assertRaises(RuntimeError):
             PortAssignment.objects.create(device=self.pdu.device, device_port=0, connected_device=self.server2.device)
+
+
+class IdentityMapTests(TestCase):
+    def setUp(self):
+        self.datacenter = Datacenter.objects.create(name='foo', vendor='foo', address='foo')
+        self.cabinet = Cabinet.objects.create(name='cab', datacenter=self.datacenter, rack_units=48, posts=4)
+        self.sw = NetworkDevice.objects.create(manufacturer='juniper', model='srx', serial=3523, ports=24, speed=1000, interconnect=1)
+        for port in range(1, 4):
+            server = Server.objects.create(manufacturer='dell', model='foo', serial=port)
+            CabinetAssignment.objects.create(cabinet=self.cabinet, device=server.device, position=port)
+            PortAssignment.objects.create(device=self.sw.device, device_port=port, connected_device=server.device)
+
+    def test_models_identity_map_instance(self):
+        with identity_map():
+            assignments = list(PortAssignment.objects.select_related('device'))
+            with self.assertNumQueries(1):
+                instances = [assign.device.instance for assign in assignments]
+        self.assertEquals(instances[0], self.sw)
+        self.assertTrue(all(instance is instances[0] for instance in instances))
+
+    def test_models_identity_map_cabinet(self):
+        with identity_map():
+            servers = list(Server.objects.select_related('device__cabinetassignment'))
+            with self.assertNumQueries(1):
+                cabinets = [server.cabinet for server in servers]
+        self.assertEquals(cabinets[0], self.cabinet)
+        self.assertTrue(all(cabinet is cabinets[0] for cabinet in cabinets))
+
+    def test_models_identity_map_inactive(self):
+        instances = [assign.device.instance for assign in PortAssignment.objects.select_related('device')]
+        self.assertIsNot(instances[0], instances[1])
+
+    def test_models_identity_map_middleware(self):
+        middleware = IdentityMapMiddleware(lambda request: identity.current())
+        self.assertIsNotNone(middleware(None))
+        self.assertIsNone(identity.current())
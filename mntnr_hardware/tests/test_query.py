@@ -0,0 +1,89 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from mountaineer.hardware.api import query
+from mountaineer.hardware.models import *
+
+
+SELECTION = {
+    'name': True,
+    'cabinets': {
+        'name': True, 'power': True,
+        'devices': {
+            'serial': True, 'kind': True, 'position': True, 'orientation': True,
+            'ports': {'device_port': True, 'connected_device': {'serial': True}},
+            'connections': {'device_port': True, 'device': {'serial': True, 'kind': True}},
+        },
+    },
+}
+
+
+class NestedQueryTests(TestCase):
+    def setUp(self):
+        self.datacenter = Datacenter.objects.create(name='dc1', vendor='foo', address='123 fake st')
+        Datacenter.objects.create(name='dc2', vendor='foo', address='123 fake st')
+        self.feed = PowerDistributionUnit.objects.create(manufacturer='apc', model='cpa', serial='feed', ports=24, volts=208, amps=30)
+        self.servers = []
+        for i in range(3):
+            cabinet = Cabinet.objects.create(name='cab{}'.format(i), datacenter=self.datacenter, rack_units=42, posts=4)
+            pdu = PowerDistributionUnit.objects.create(
+                manufacturer='apc', model='cpa', serial='p{}'.format(i), ports=24, volts=208, amps=30
+            )
+            server = Server.objects.create(manufacturer='dell', model='foo', serial='s{}'.format(i), draw=100)
+            CabinetAssignment.objects.create(cabinet=cabinet, device=pdu.device, position=1)
+            CabinetAssignment.objects.create(cabinet=cabinet, device=server.device, position=2, orientation=1)
+            PortAssignment.objects.create(device=pdu.device, device_port=4, connected_device=server.device)
+            self.servers.append(server)
+
+    def test_query_datacenter(self):
+        results = query.run('datacenter', SELECTION, [self.datacenter.slug])
+        self.assertEquals(len(results), 1)
+        cabinet = results[0]['cabinets'][0]
+        self.assertEquals((cabinet['name'], cabinet['power']), ('cab0', 6240))
+        pdu, server = cabinet['devices']
+        self.assertEquals((pdu['serial'], pdu['kind'], pdu['position']), ('p0', 'powerdistributionunit', 1))
+        self.assertEquals(pdu['ports'], [{'device_port': 4, 'connected_device': {'serial': 's0'}}])
+        self.assertEquals(pdu['connections'], [])
+        self.assertEquals((server['kind'], server['orientation']), ('server', 'Front-facing'))
+        self.assertEquals(server['connections'], [
+            {'device_port': 4, 'device': {'serial': 'p0', 'kind': 'powerdistributionunit'}}
+        ])
+
+    def test_query_batched(self):
+        with CaptureQueriesContext(connection) as queries:
+            query.run('datacenter', SELECTION)
+        PortAssignment.objects.create(device=self.feed.device, device_port=1, connected_device=self.servers[0].device)
+        for i in range(3, 10):
+            cabinet = Cabinet.objects.create(name='cab{}'.format(i), datacenter=self.datacenter, rack_units=42, posts=4)
+            server = Server.objects.create(manufacturer='dell', model='foo', serial='s{}'.format(i))
+            CabinetAssignment.objects.create(cabinet=cabinet, device=server.device, position=2)
+        with self.assertNumQueries(len(queries)):
+            query.run('datacenter', SELECTION)
+
+    def test_query_cabinet_root(self):
+        results = query.run('cabinet', {'name': True, 'datacenter': {'name': True}, 'devices': {'cabinet': {'name': True}}})
+        self.assertEquals([result['name'] for result in results], ['cab0', 'cab1', 'cab2'])
+        self.assertEquals(results[0]['datacenter'], {'name': 'dc1'})
+        self.assertEquals(results[1]['devices'][0]['cabinet'], {'name': 'cab1'})
+
+    def test_query_api(self):
+        response = self.client.post(reverse('api_v1:hardware-query'), json.dumps({
+            'root': 'datacenter', 'fields': {'name': True, 'cabinets': {'name': True}}
+        }), content_type='application/json')
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json(), [
+            {'name': 'dc1', 'cabinets': [{'name': 'cab0'}, {'name': 'cab1'}, {'name': 'cab2'}]},
+            {'name': 'dc2', 'cabinets': []},
+        ])
+
+    def test_query_api_invalid(self):
+        for body in ({'root': 'server', 'fields': {'name': True}},
+                     {'root': 'datacenter', 'fields': {'cabinets': {'colour': True}}},
+                     {'root': 'datacenter', 'fields': {'cabinets': True}},
+                     {'root': 'datacenter', 'fields': {'name': True}, 'slugs': 'dc1'}):
+            response = self.client.post(reverse('api_v1:hardware-query'), json.dumps(body), content_type='application/json')
+            self.assertEquals(response.status_code, 400, body)
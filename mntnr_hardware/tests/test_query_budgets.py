@@ -0,0 +1,5 @@
+from mountaineer.hardware.tests import querybudget
+
+
+class HardwareQueryBudgetTests(querybudget.QueryBudgetTestCase):
+    pass
@@ -0,0 +1,89 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from mountaineer.hardware.models import *
+from mountaineer.hardware.reports.fabric import fabric_report
+from mountaineer.hardware.reports.inventory import inventory_report, partition_report
+
+
+class FabricReportTests(TestCase):
+    def setUp(self):
+        self.core = NetworkDevice.objects.create(manufacturer='arista', model='7050', serial='c1', ports=48, speed=10000, interconnect=2)
+        self.access1 = NetworkDevice.objects.create(manufacturer='juniper', model='ex', serial='a1', ports=24, speed=1000, interconnect=1)
+        self.access2 = NetworkDevice.objects.create(manufacturer='juniper', model='ex', serial='a2', ports=24, speed=1000, interconnect=1)
+        PortAssignment.objects.create(device=self.core.device, device_port=1, connected_device=self.access1.device)
+        PortAssignment.objects.create(device=self.core.device, device_port=2, connected_device=self.access2.device)
+        for port in range(1, 11):
+            server = Server.objects.create(manufacturer='dell', model='foo', serial=port)
+            PortAssignment.objects.create(device=self.access1.device, device_port=port, connected_device=server.device)
+
+    def test_reports_fabric_switches(self):
+        rows = {row['slug']: row for row in fabric_report()['switches']}
+        access1 = rows[self.access1.slug]
+        self.assertEquals(access1['downlink_mbps'], 10000)
+        self.assertEquals(access1['uplink_mbps'], 1000)
+        self.assertEquals(access1['oversubscription'], 10.0)
+        self.assertEquals(access1['ports_used'], 11)
+        self.assertEquals(access1['ports_free'], 13)
+        core = rows[self.core.slug]
+        self.assertEquals(core['downlink_mbps'], 2000)
+        self.assertIsNone(core['oversubscription'])
+        self.assertEquals(core['ports_free'], 46)
+
+    def test_reports_fabric_interconnects(self):
+        totals = {row['interconnect']: row for row in fabric_report()['interconnects']}
+        self.assertEquals(totals['RJ-45']['switches'], 2)
+        self.assertEquals(totals['RJ-45']['ports_free'], 13 + 23)
+        self.assertEquals(totals['Twinaxial']['free_mbps'], 46 * 10000)
+
+    def test_reports_fabric_api(self):
+        response = self.client.get(reverse('api_v1:hardware-fabric-report'))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(response.json()['switches']), 3)
+
+
+class InventoryReportTests(TestCase):
+    def setUp(self):
+        self.dc1 = Datacenter.objects.create(name='dc1', vendor='foo', address='123 fake st')
+        self.dc2 = Datacenter.objects.create(name='dc2', vendor='foo', address='123 fake st')
+        self.cabinet = Cabinet.objects.create(name='cab1', datacenter=self.dc1, rack_units=10, posts=4)
+        Cabinet.objects.create(name='cab2', datacenter=self.dc2, rack_units=42, posts=4)
+        self.pdu = PowerDistributionUnit.objects.create(manufacturer='apc', model='cpa', serial='p1', ports=2, volts=100, amps=10)
+        self.server = Server.objects.create(manufacturer='dell', model='foo', serial='s1', draw=400, rack_units=2)
+        self.switch = NetworkDevice.objects.create(manufacturer='juniper', model='ex', serial='sw1', ports=24, speed=1000, interconnect=1)
+        self.spare = Server.objects.create(manufacturer='dell', model='foo', serial='s2')
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.pdu.device, position=1)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.server.device, position=2)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.switch.device, position=5)
+        PortAssignment.objects.create(device=self.pdu.device, device_port=1, connected_device=self.server.device)
+
+    def test_reports_inventory_partition(self):
+        with self.assertNumQueries(3):
+            report = partition_report(self.dc1.pk)
+        cabinet = report['cabinets'][0]
+        self.assertEquals((cabinet['power'], cabinet['power_allocated'], cabinet['power_unallocated']), (1000, 400, 600))
+        self.assertEquals((cabinet['rack_units_used'], cabinet['rack_units_free']), (4, 6))
+        self.assertEquals(report['totals']['powerdistributionunit_ports_used'], 1)
+        self.assertEquals(report['totals']['networkdevice_ports'], 24)
+        self.assertEquals([(orphan['slug'], orphan['reason']) for orphan in report['orphans']], [(self.switch.slug, 'unconnected')])
+
+    def test_reports_inventory_merge(self):
+        report = inventory_report()
+        self.assertEquals([row['datacenter'] for row in report['datacenters']], [self.dc1.slug, self.dc2.slug, None])
+        self.assertEquals(report['totals']['cabinets'], 2)
+        self.assertEquals(report['totals']['rack_units'], 52)
+        self.assertEquals(
+            [(orphan['slug'], orphan['reason'], orphan['datacenter']) for orphan in report['orphans']],
+            [(self.switch.slug, 'unconnected', self.dc1.slug), (self.spare.slug, 'unplaced', None)]
+        )
+        report = inventory_report([self.dc2.slug])
+        self.assertEquals([row['datacenter'] for row in report['datacenters']], [self.dc2.slug])
+        self.assertEquals(report['totals']['orphans'], 0)
+
+    def test_reports_inventory_command(self):
+        out = StringIO()
+        call_command('inventory_report', '--workers', '1', stdout=out)
+        self.assertIn('orphaned server {} (unplaced) in no datacenter'.format(self.spare.slug), out.getvalue())
@@ -0,0 +1,74 @@
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+
+from mountaineer.hardware.models import *
+from mountaineer.hardware.simulation import Simulation, SimulationError
+
+
+class SimulationTests(TestCase):
+    def setUp(self):
+        self.datacenter = Datacenter.objects.create(name='dc1', vendor='foo', address='123 fake st')
+        self.cabinet = Cabinet.objects.create(name='cab1', datacenter=self.datacenter, rack_units=10, posts=4)
+        self.cabinet2 = Cabinet.objects.create(name='cab2', datacenter=self.datacenter, rack_units=10, posts=4)
+        self.pdu = PowerDistributionUnit.objects.create(manufacturer='apc', model='cpa', serial='p1', ports=2, volts=100, amps=10)
+        self.server = Server.objects.create(manufacturer='dell', model='foo', serial='s1', draw=400, rack_units=2)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.pdu.device, position=1)
+        CabinetAssignment.objects.create(cabinet=self.cabinet, device=self.server.device, position=2)
+        PortAssignment.objects.create(device=self.pdu.device, device_port=1, connected_device=self.server.device)
+
+    def add(self, key, position, draw=400, port=None):
+        return {
+            'op': 'add', 'device': {'id': key, 'kind': 'server', 'draw': draw, 'rack_units': 2},
+            'cabinet': self.cabinet.slug, 'position': position, 'connections': [{'device': self.pdu.slug, 'port': port}],
+        }
+
+    def test_simulation_load(self):
+        with self.assertNumQueries(3):
+            simulation = Simulation.load(self.datacenter)
+        metrics = simulation.cabinets[self.cabinet.slug].metrics()
+        self.assertEquals(metrics['power_unallocated'], 600)
+        self.assertEquals(metrics['rack_units_used'], 3)
+        self.assertEquals(dict(simulation.devices[self.pdu.slug].used_ports), {1: [self.server.slug]})
+        self.assertEquals(simulation.violations(), [])
+
+    def test_simulation_violations(self):
+        simulation = Simulation.load(self.datacenter)
+        with self.assertNumQueries(0):
+            simulation.apply([self.add('new-1', 4), self.add('new-2', 5), self.add('new-3', 9)])
+            violations = simulation.violations()
+        self.assertEquals([violation['type'] for violation in violations], ['power', 'rack_units', 'ports'])
+        self.assertEquals(violations[0]['power_unallocated'], -600)
+        self.assertEquals(violations[1]['units'], [5])
+        self.assertEquals(violations[1]['devices'], ['new-1', 'new-2'])
+        self.assertEquals(violations[2]['conflicts'], [0])
+        self.assertFalse(Server.objects.filter(serial='new-1').exists())
+
+    def test_simulation_move_remove(self):
+        simulation = Simulation.load(self.datacenter)
+        simulation.apply([
+            self.add('new-1', 4, port=1),
+            {'op': 'move', 'device': self.server.slug, 'cabinet': self.cabinet2.slug, 'position': 1},
+            {'op': 'remove', 'device': self.server.slug},
+        ])
+        report = simulation.report()
+        self.assertEquals(report['cabinets'][self.cabinet2.slug]['rack_units_used'], 0)
+        self.assertEquals(report['devices'][self.pdu.slug], {'ports': 2, 'ports_used': 1})
+        self.assertEquals(report['violations'], [])
+
+    def test_simulation_invalid(self):
+        simulation = Simulation.load(self.datacenter)
+        with self.assertRaises(SimulationError):
+            simulation.apply([{'op': 'move', 'device': 'missing', 'cabinet': self.cabinet.slug}])
+        with self.assertRaises(SimulationError):
+            simulation.apply([{'op': 'add', 'device': {'kind': 'server'}}])
+
+    def test_simulation_api(self):
+        url = reverse('api_v1:hardware:datacenter-simulate', kwargs={'slug': self.datacenter.slug})
+        response = self.client.post(url, json.dumps({'operations': [self.add('new-1', 4)]}), content_type='application/json')
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json()['violations'], [])
+        self.assertEquals(response.json()['cabinets'][self.cabinet.slug]['power_unallocated'], 200)
+        response = self.client.post(url, json.dumps({'operations': [{'op': 'explode'}]}), content_type='application/json')
+        self.assertEquals(response.status_code, 400)
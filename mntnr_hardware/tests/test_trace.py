@@ -0,0 +1,69 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from mountaineer.hardware import trace
+from mountaineer.hardware.models import *
+
+
+class TraceTests(TestCase):
+    def setUp(self):
+        self.pdu = PowerDistributionUnit.objects.create(manufacturer='apc', model='cpa', serial='p1', ports=24, volts=208, amps=30)
+        self.feed = PowerDistributionUnit.objects.create(manufacturer='apc', model='cpa', serial='p2', ports=8, volts=208, amps=60)
+        self.sw = NetworkDevice.objects.create(manufacturer='juniper', model='ex', serial='sw1', ports=48, speed=1000, interconnect=1)
+        self.core = NetworkDevice.objects.create(manufacturer='juniper', model='qfx', serial='core', ports=32, speed=10000, interconnect=2)
+        self.server = Server.objects.create(manufacturer='dell', model='foo', serial='1233', draw=350)
+        PortAssignment.objects.create(device=self.pdu.device, device_port=3, connected_device=self.server.device)
+        PortAssignment.objects.create(device=self.feed.device, device_port=1, connected_device=self.pdu.device)
+        PortAssignment.objects.create(device=self.sw.device, device_port=7, connected_device=self.server.device)
+        PortAssignment.objects.create(device=self.core.device, device_port=48, connected_device=self.sw.device)
+        PortAssignment.objects.create(device=self.sw.device, device_port=48, connected_device=self.core.device)
+
+    def hops(self, hops):
+        return [(hop.depth, hop.device_id, hop.port, hop.connected_device_id) for hop in hops]
+
+    def test_trace_power(self):
+        with self.assertNumQueries(1):
+            hops = trace.trace(self.server.device_id, 'power')
+        self.assertEquals(self.hops(hops), [
+            (1, self.pdu.device_id, 3, self.server.device_id),
+            (2, self.feed.device_id, 1, self.pdu.device_id),
+        ])
+
+    def test_trace_network_cycle(self):
+        expected = [
+            (1, self.sw.device_id, 7, self.server.device_id),
+            (2, self.core.device_id, 48, self.sw.device_id),
+            (3, self.sw.device_id, 48, self.core.device_id),
+        ]
+        self.assertEquals(self.hops(trace.trace(self.server.device_id, 'network')), expected)
+        self.assertEquals(self.hops(trace.trace(self.server.device_id, 'network', depth=1)), expected[:1])
+
+    def test_trace_bfs(self):
+        self.assertEquals(
+            self.hops(trace.trace_bfs(self.server.device_id, NetworkDevice, 8)),
+            self.hops(trace.trace(self.server.device_id, 'network'))
+        )
+
+    def test_trace_api(self):
+        url = reverse('api_v1:hardware-device-trace', kwargs={'device_id': self.server.device_id})
+        response = self.client.get(url, {'kind': 'power'})
+        self.assertEquals(response.status_code, 200)
+        data = response.json()
+        self.assertEquals(data['device']['name'], str(self.server))
+        self.assertEquals(
+            [(hop['depth'], hop['kind'], hop['name'], hop['port']) for hop in data['hops']],
+            [(1, 'powerdistributionunit', str(self.pdu), 3), (2, 'powerdistributionunit', str(self.feed), 1)]
+        )
+        self.assertTrue(data['hops'][0]['url'].endswith(
+            reverse('api_v1:hardware:powerdistributionunit-detail', kwargs={'slug': self.pdu.slug})
+        ))
+
+    def test_trace_api_invalid(self):
+        url = reverse('api_v1:hardware-device-trace', kwargs={'device_id': self.server.device_id})
+        self.assertEquals(self.client.get(url, {'kind': 'cooling'}).status_code, 400)
+        self.assertEquals(self.client.get(url, {'depth': 'all'}).status_code, 400)
+
+    def test_trace_api_not_uuid(self):
+        for device_id in ('-' * 36, 'a' * 33, 'a' * 35):
+            url = reverse('api_v1:hardware-device-trace', kwargs={'device_id': device_id})
+            self.assertEquals(self.client.get(url).status_code, 404, device_id)
@@ -0,0 +1,105 @@
+"""
+Cable traces: the chain of PDUs or switches a device is plugged into, followed
+upstream hop by hop. The whole trace is resolved with one recursive CTE over
+PortAssignment where the database supports it, or one query per hop otherwise,
+instead of walking `DeviceBase.pdus`/`uplinks` one device at a time.
+"""
+import sqlite3
+from collections import namedtuple
+
+from django.db import connections
+
+from mountaineer.hardware.models import Device, NetworkDevice, PortAssignment, PowerDistributionUnit
+
+
+TRACE_KINDS = {
+    'power': PowerDistributionUnit,
+    'network': NetworkDevice,
+}
+
+# One cable: `device` (a PDU or switch) has `connected_device_id` plugged into `port`,
+# `depth` hops upstream of the traced device.
+Hop = namedtuple('Hop', ['depth', 'device_id', 'port', 'connected_device_id'])
+
+TRACE_SQL = '''
+WITH RECURSIVE trace (depth, device_id, device_port, connected_device_id) AS (
+    SELECT 1, pa.{device}, pa.{port}, pa.{connected}
+    FROM {ports} pa
+    JOIN {upstream} up ON up.{upstream_device} = pa.{device}
+    WHERE pa.{connected} = %s
+  UNION
+    SELECT trace.depth + 1, pa.{device}, pa.{port}, pa.{connected}
+    FROM trace
+    JOIN {ports} pa ON pa.{connected} = trace.device_id
+    JOIN {upstream} up ON up.{upstream_device} = pa.{device}
+    WHERE trace.depth < %s
+)
+SELECT depth, device_id, device_port, connected_device_id FROM trace
+'''
+
+
+def supports_recursive_cte(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 8, 3)
+    return False
+
+
+def trace_cte(device_id, upstream, depth, connection):
+    quote = connection.ops.quote_name
+
+    def column(model, name):
+        return quote(model._meta.get_field(name).column)
+
+    sql = TRACE_SQL.format(
+        ports=quote(PortAssignment._meta.db_table),
+        device=column(PortAssignment, 'device'),
+        port=column(PortAssignment, 'device_port'),
+        connected=column(PortAssignment, 'connected_device'),
+        upstream=quote(upstream._meta.db_table),
+        upstream_device=column(upstream, 'device'),
+    )
+    pk = Device._meta.pk
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [pk.get_db_prep_value(device_id, connection), depth])
+        rows = cursor.fetchall()
+    return [Hop(row[0], pk.to_python(row[1]), row[2], pk.to_python(row[3])) for row in rows]
+
+
+def trace_bfs(device_id, upstream, depth):
+    """Breadth-first trace with one query per hop, for databases without recursive CTEs."""
+    hops, frontier, seen = [], {device_id}, {device_id}
+    for level in range(1, depth + 1):
+        if not frontier:
+            break
+        rows = PortAssignment.objects.filter(
+            connected_device_id__in=frontier, **{'device__{}__isnull'.format(upstream._meta.model_name): False}
+        ).values_list('device_id', 'device_port', 'connected_device_id')
+        level_hops = [Hop(level, *row) for row in rows]
+        hops.extend(level_hops)
+        frontier = set(hop.device_id for hop in level_hops).difference(seen)
+        seen.update(frontier)
+    return hops
+
+
+def trace(device_id, kind='network', depth=8, using='default'):
+    """
+    Returns the hops upstream of the Device `device_id` through PDUs (`kind='power'`)
+    or switches (`kind='network'`), at most `depth` hops deep, ordered by depth.
+    A device plugged into several PDUs or switches produces several branches; each
+    hop's `connected_device_id` names the device it continues from.
+    """
+    upstream = TRACE_KINDS[kind]
+    connection = connections[using]
+    if supports_recursive_cte(connection):
+        hops = trace_cte(device_id, upstream, depth, connection)
+    else:
+        hops = trace_bfs(device_id, upstream, depth)
+    # A cycle in the cabling makes the CTE revisit devices until it runs out of depth; keep the first visit.
+    seen, unique = set(), []
+    for hop in sorted(hops, key=lambda hop: (hop.depth, str(hop.connected_device_id), hop.port)):
+        if (hop.device_id, hop.port) not in seen:
+            seen.add((hop.device_id, hop.port))
+            unique.append(hop)
+    return unique